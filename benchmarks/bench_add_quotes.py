@@ -0,0 +1,59 @@
+# compares backfilling a company one add_quote call at a time against one add_quotes call
+# run with: PYTHONPATH=src python benchmarks/bench_add_quotes.py
+from datetime import datetime, timedelta
+import time
+
+import numpy as np
+
+from stockobjects.company import Company
+
+CONST_BARS_PER_TICKER = 5000
+CONST_TICKERS = 20
+
+
+def make_columns():
+    start = np.datetime64("2000-01-01", "us")
+    dates = start + np.arange(CONST_BARS_PER_TICKER) * np.timedelta64(1, "D")
+    prices = np.linspace(1.0, 2.0, CONST_BARS_PER_TICKER)
+    volumes = np.full(CONST_BARS_PER_TICKER, 1000, dtype=np.int64)
+    return dates, prices, volumes
+
+
+def one_at_a_time(dates, prices, volumes):
+    rows = list(zip(dates.tolist(), prices.tolist(), volumes.tolist()))
+    for ticker in range(CONST_TICKERS):
+        company = Company(company_name="Benchmark", company_code=f"c{ticker}")
+        for date, price, volume in rows:
+            company.add_quote(date, price, price, price, price, volume)
+
+
+def bulk(dates, prices, volumes):
+    for ticker in range(CONST_TICKERS):
+        company = Company(company_name="Benchmark", company_code=f"c{ticker}")
+        company.add_quotes(
+            date=dates,
+            open=prices,
+            high=prices,
+            low=prices,
+            close=prices,
+            volume=volumes,
+        )
+
+
+def main():
+    dates, prices, volumes = make_columns()
+    print(f"{CONST_TICKERS} tickers x {CONST_BARS_PER_TICKER} bars")
+
+    timings = []
+    for name, backfill in (("add_quote", one_at_a_time), ("add_quotes", bulk)):
+        started = time.perf_counter()
+        backfill(dates, prices, volumes)
+        timings.append((name, time.perf_counter() - started))
+
+    for name, elapsed in timings:
+        print(f"{name:<12} {elapsed:>8.3f}s")
+    print(f"speedup {timings[0][1] / timings[1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
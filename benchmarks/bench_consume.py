@@ -0,0 +1,88 @@
+# compares a blocking receive/load_sqs/ack loop against SectorCollection.consume when receiving
+# and acking each payload costs some network latency
+# run with: PYTHONPATH=src python benchmarks/bench_consume.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from bench_load_sqs import make_record
+from stockobjects.consumer import QueueSource
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_PAYLOADS = 200
+CONST_RECORDS_PER_PAYLOAD = 10
+CONST_LATENCY = 0.005
+
+
+def make_payloads() -> list:
+    start = datetime(2021, 1, 1)
+    return [
+        {
+            "Records": [
+                make_record(
+                    "stock",
+                    "stock_code",
+                    f"c{record}",
+                    start + timedelta(days=payload * 10),
+                )
+                for record in range(CONST_RECORDS_PER_PAYLOAD)
+            ]
+        }
+        for payload in range(CONST_PAYLOADS)
+    ]
+
+
+class LatencySource(QueueSource):
+    async def receive(self):
+        await asyncio.sleep(CONST_LATENCY)
+        return await super().receive()
+
+    async def ack(self, payload):
+        await asyncio.sleep(CONST_LATENCY)
+
+
+def blocking(payloads: list):
+    collection = SectorCollection("benchmark")
+    for payload in payloads:
+        time.sleep(CONST_LATENCY)
+        collection.load_sqs(payload=payload)
+        time.sleep(CONST_LATENCY)
+
+
+def consume(payloads: list, max_in_flight: int):
+    async def run():
+        source = LatencySource()
+        for payload in payloads:
+            source.put_nowait(payload)
+        await source.close()
+        await SectorCollection("benchmark").consume(source, max_in_flight=max_in_flight)
+
+    asyncio.run(run())
+
+
+def main():
+    payloads = make_payloads()
+    print(
+        f"{CONST_PAYLOADS} payloads x {CONST_RECORDS_PER_PAYLOAD} records, "
+        f"{CONST_LATENCY * 1000:.0f}ms per receive and per ack"
+    )
+
+    timings = []
+    started = time.perf_counter()
+    blocking(payloads)
+    timings.append(("blocking loop", time.perf_counter() - started))
+
+    for max_in_flight in (1, 4, 16):
+        started = time.perf_counter()
+        consume(payloads, max_in_flight)
+        timings.append((f"consume x{max_in_flight}", time.perf_counter() - started))
+
+    for name, elapsed in timings:
+        print(
+            f"{name:<14} {elapsed:>8.3f}s {CONST_PAYLOADS / elapsed:>8.0f} payloads/s "
+            f"{timings[0][1] / elapsed:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
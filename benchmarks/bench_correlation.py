@@ -0,0 +1,94 @@
+# compares pairwise return correlations worked out in pure python over get_company_quote dicts
+# against Sector.correlation
+# run with: PYTHONPATH=src python benchmarks/bench_correlation.py
+from datetime import datetime
+import math
+import time
+
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+
+CONST_BARS_PER_TICKER = 500
+CONST_TICKERS = 100
+
+
+def make_sector() -> Sector:
+    sector = Sector(sector_name="Benchmark", sector_code="bench")
+    start = np.datetime64("2000-01-01", "us")
+    dates = start + np.arange(CONST_BARS_PER_TICKER) * np.timedelta64(1, "D")
+    generator = np.random.default_rng(0)
+
+    for ticker in range(CONST_TICKERS):
+        prices = 100 * np.exp(
+            np.cumsum(generator.normal(0, 0.01, CONST_BARS_PER_TICKER))
+        )
+        company = Company(company_name="Benchmark", company_code=f"c{ticker}")
+        sector.add_company(company)
+        company.add_quotes(
+            date=dates,
+            open=prices,
+            high=prices,
+            low=prices,
+            close=prices,
+            volume=np.ones(CONST_BARS_PER_TICKER, dtype=np.int64),
+        )
+
+    return sector
+
+
+def pure_python(sector: Sector):
+    returns = {}
+    for company_code, quotes in sector.get_company_quote(
+        date_from=datetime(2000, 1, 1)
+    ).items():
+        closes = [quote.close for _, quote in sorted(quotes.items())]
+        returns[company_code] = [
+            math.log(closes[i] / closes[i - 1]) for i in range(1, len(closes))
+        ]
+
+    correlations = {}
+    for code_a, returns_a in returns.items():
+        for code_b, returns_b in returns.items():
+            mean_a = sum(returns_a) / len(returns_a)
+            mean_b = sum(returns_b) / len(returns_b)
+            covariance = sum(
+                (a - mean_a) * (b - mean_b) for a, b in zip(returns_a, returns_b)
+            )
+            variance_a = sum((a - mean_a) ** 2 for a in returns_a)
+            variance_b = sum((b - mean_b) ** 2 for b in returns_b)
+            correlations[code_a, code_b] = covariance / math.sqrt(
+                variance_a * variance_b
+            )
+
+    return correlations
+
+
+def vectorised(sector: Sector):
+    # throw away the cache so the timing is a real build
+    sector._correlations.clear()
+    return sector.correlation(date_from=datetime(2000, 1, 1))
+
+
+def main():
+    sector = make_sector()
+    print(f"{CONST_TICKERS} tickers x {CONST_BARS_PER_TICKER} bars")
+
+    timings = []
+    for name, correlate in (("pure python", pure_python), ("correlation", vectorised)):
+        started = time.perf_counter()
+        correlate(sector)
+        timings.append((name, time.perf_counter() - started))
+
+    started = time.perf_counter()
+    sector.correlation(date_from=datetime(2000, 1, 1))
+    timings.append(("cached", time.perf_counter() - started))
+
+    for name, elapsed in timings:
+        print(f"{name:<12} {elapsed:>8.3f}s")
+    print(f"speedup {timings[0][1] / timings[1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
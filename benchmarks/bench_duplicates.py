@@ -0,0 +1,80 @@
+# replays a day of quotes where most of them are already loaded - the way a redelivered or
+# overlapping feed looks.  Compares catching QuoteAlreadyExists per quote against letting the
+# collection's duplicate policy count them, both per quote and as one batch
+# run with: PYTHONPATH=src python benchmarks/bench_duplicates.py
+import time
+from datetime import datetime, timedelta
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+
+CONST_QUOTES = 50000
+CONST_DUPLICATE_SHARE = 0.9
+
+
+def make_rows() -> list:
+    start = datetime(2000, 1, 1)
+    rows = [
+        (start + timedelta(days=day), 1.0, 2.0, 0.5, 1.5, 100)
+        for day in range(CONST_QUOTES)
+    ]
+    return rows
+
+
+def loaded(on_duplicate: str, rows: list) -> Company:
+    collection = SectorCollection("benchmark", on_duplicate=on_duplicate)
+    sector = Sector(sector_name="Cutlery", sector_code="xcj")
+    collection.add_sector(sector)
+    company = Company(company_name="Knives", company_code="kni")
+    sector.add_company(company)
+    company.add_quotes(rows=rows[: int(CONST_QUOTES * CONST_DUPLICATE_SHARE)])
+    return company
+
+
+def catch_per_quote(company: Company, rows: list):
+    for row in rows:
+        try:
+            company.add_quote(*row)
+        except QuoteAlreadyExists:
+            pass
+
+
+def policy_per_quote(company: Company, rows: list):
+    for row in rows:
+        company.add_quote(*row)
+
+
+def policy_batch(company: Company, rows: list):
+    company.add_quotes(rows=rows)
+
+
+def main():
+    rows = make_rows()
+    print(f"{CONST_QUOTES} quotes, {CONST_DUPLICATE_SHARE:.0%} of them already loaded")
+
+    timings = []
+    for name, on_duplicate, load in (
+        ("raise + catch", "raise", catch_per_quote),
+        ("skip per quote", "skip", policy_per_quote),
+        ("merge per quote", "merge", policy_per_quote),
+        ("skip batch", "skip", policy_batch),
+        ("overwrite batch", "overwrite", policy_batch),
+        ("merge batch", "merge", policy_batch),
+    ):
+        company = loaded(on_duplicate, rows)
+        started = time.perf_counter()
+        load(company, rows)
+        timings.append((name, time.perf_counter() - started))
+        assert company.length == CONST_QUOTES
+
+    for name, elapsed in timings:
+        print(
+            f"{name:<16} {elapsed:>8.3f}s {CONST_QUOTES / elapsed:>10.0f} quotes/s "
+            f"{timings[0][1] / elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
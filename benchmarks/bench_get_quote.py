@@ -0,0 +1,66 @@
+# compares Company.get_quote's bisect range lookup against the old linear scan
+# run with: PYTHONPATH=src python benchmarks/bench_get_quote.py
+from datetime import datetime, timedelta
+import timeit
+
+from stockobjects.company import Company
+from stockobjects.parsing import DateParser
+
+CONST_HISTORY_LENGTHS = [250, 2500, 5000]
+CONST_WINDOW_DAYS = 5
+CONST_REPEATS = 200
+
+
+def build_company(history_length: int) -> Company:
+    company = Company(company_name="Benchmark company", company_code="bch")
+    start = datetime(2000, 1, 1)
+    for day in range(history_length):
+        company.add_quote(
+            date=start + timedelta(days=day),
+            open=1,
+            high=1,
+            low=1,
+            close=1,
+            volume=1000,
+        )
+    return company
+
+
+def linear_get_quote(company: Company, date_from: datetime, date_to: datetime):
+    # what get_quote used to do - check every stored quote against the window
+    dates = DateParser(date_from=date_from, date_to=date_to)
+    matched_quotes = {}
+    for quote_date, quote in company._quotes.items():
+        if dates.date_from <= quote_date.date() and dates.date_to >= quote_date.date():
+            matched_quotes[quote_date] = quote
+    return matched_quotes
+
+
+def main():
+    print(f"last {CONST_WINDOW_DAYS} days, {CONST_REPEATS} queries each")
+    print(f"{'quotes':>8} {'linear ms':>12} {'bisect ms':>12} {'speedup':>10}")
+    for history_length in CONST_HISTORY_LENGTHS:
+        company = build_company(history_length)
+        date_to = datetime(2000, 1, 1) + timedelta(days=history_length - 1)
+        date_from = date_to - timedelta(days=CONST_WINDOW_DAYS - 1)
+
+        assert len(linear_get_quote(company, date_from, date_to)) == CONST_WINDOW_DAYS
+        assert len(company.get_quote(date_from=date_from, date_to=date_to)) == (
+            CONST_WINDOW_DAYS
+        )
+
+        linear = timeit.timeit(
+            lambda: linear_get_quote(company, date_from, date_to), number=CONST_REPEATS
+        )
+        bisect = timeit.timeit(
+            lambda: company.get_quote(date_from=date_from, date_to=date_to),
+            number=CONST_REPEATS,
+        )
+        print(
+            f"{history_length:>8} {linear / CONST_REPEATS * 1000:>12.3f} "
+            f"{bisect / CONST_REPEATS * 1000:>12.3f} {linear / bisect:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
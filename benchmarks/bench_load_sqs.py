@@ -0,0 +1,63 @@
+# reports SectorCollection.load_sqs throughput in records and quotes per second
+# run with: PYTHONPATH=src python benchmarks/bench_load_sqs.py
+from datetime import datetime, timedelta
+import json
+import time
+
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_BATCH_SIZES = [100, 1000, 10000]
+CONST_QUOTES_PER_RECORD = 10
+
+
+def make_record(message_type: str, code_key: str, code: str, start: datetime) -> dict:
+    quotes = [
+        {
+            "quote_date": (start + timedelta(days=day)).strftime("%Y-%m-%d"),
+            code_key: code,
+            "open": 1.5,
+            "high": 2.0,
+            "low": 1.0,
+            "close": 1.75,
+            "volume": 1000,
+        }
+        for day in range(CONST_QUOTES_PER_RECORD)
+    ]
+    return {
+        "messageId": f"{code}-{start:%Y%m%d}",
+        "body": json.dumps({"quoteObject": quotes}),
+        "messageAttributes": {"QuoteType": {"stringValue": message_type}},
+    }
+
+
+def make_payload(record_count: int) -> dict:
+    # one record per company, plus a sector record every 50 companies
+    records = []
+    start = datetime(2021, 1, 1)
+    for i in range(record_count):
+        if i % 50 == 0:
+            records.append(make_record("sector", "sector_code", f"x{i}", start))
+        else:
+            records.append(make_record("stock", "stock_code", f"c{i}", start))
+    return {"Records": records}
+
+
+def main():
+    print(f"{CONST_QUOTES_PER_RECORD} quotes per record")
+    print(f"{'records':>8} {'seconds':>10} {'records/s':>12} {'quotes/s':>12}")
+    for batch_size in CONST_BATCH_SIZES:
+        payload = make_payload(batch_size)
+        collection = SectorCollection(name="benchmark")
+
+        started = time.perf_counter()
+        collection.load_sqs(payload=payload)
+        elapsed = time.perf_counter() - started
+
+        print(
+            f"{batch_size:>8} {elapsed:>10.3f} {batch_size / elapsed:>12.0f} "
+            f"{batch_size * CONST_QUOTES_PER_RECORD / elapsed:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# compares ingest throughput with the write-ahead log off, on, and on with fsync
+# run with: PYTHONPATH=src python benchmarks/bench_quote_log.py
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from bench_load_sqs import make_payload, CONST_QUOTES_PER_RECORD
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_RECORDS = 2000
+CONST_BARS_PER_TICKER = 5000
+CONST_TICKERS = 20
+
+
+def load_sqs(collection: SectorCollection, payload: dict):
+    collection.load_sqs(payload=payload)
+
+
+def add_quotes(collection: SectorCollection, columns: tuple):
+    dates, prices, volumes = columns
+    sector = Sector(sector_name="Benchmark", sector_code="bench")
+    collection.add_sector(sector)
+    for ticker in range(CONST_TICKERS):
+        company = Company(company_name="Benchmark", company_code=f"c{ticker}")
+        sector.add_company(company)
+        company.add_quotes(
+            date=dates,
+            open=prices,
+            high=prices,
+            low=prices,
+            close=prices,
+            volume=volumes,
+        )
+
+
+def run(ingest, data, logging: str, path: str) -> float:
+    collection = SectorCollection(name="benchmark")
+    if logging != "off":
+        collection.attach_log(path, fsync=logging == "fsync")
+
+    started = time.perf_counter()
+    ingest(collection, data)
+    elapsed = time.perf_counter() - started
+
+    collection.close_log()
+    return elapsed
+
+
+def main():
+    start = np.datetime64("2000-01-01", "us")
+    columns = (
+        start + np.arange(CONST_BARS_PER_TICKER) * np.timedelta64(1, "D"),
+        np.linspace(1.0, 2.0, CONST_BARS_PER_TICKER),
+        np.full(CONST_BARS_PER_TICKER, 1000, dtype=np.int64),
+    )
+    workloads = (
+        (
+            f"load_sqs ({CONST_RECORDS} records)",
+            load_sqs,
+            make_payload(CONST_RECORDS),
+            CONST_RECORDS * CONST_QUOTES_PER_RECORD,
+        ),
+        (
+            f"add_quotes ({CONST_TICKERS} x {CONST_BARS_PER_TICKER})",
+            add_quotes,
+            columns,
+            CONST_TICKERS * CONST_BARS_PER_TICKER,
+        ),
+    )
+
+    for name, ingest, data, quotes in workloads:
+        print(name)
+        baseline = None
+        for logging in ("off", "on", "fsync"):
+            with tempfile.TemporaryDirectory() as directory:
+                elapsed = run(ingest, data, logging, os.path.join(directory, "log"))
+
+            if baseline == None:
+                baseline = elapsed
+            print(
+                f"  log {logging:<6} {elapsed:>8.3f}s {quotes / elapsed:>12.0f} quotes/s "
+                f"{elapsed / baseline:>6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# reports bytes per quote for the old dict-backed quote objects, the slotted quote objects
+# and the columnar quote store
+# run with: PYTHONPATH=src python benchmarks/bench_quote_memory.py
+from datetime import datetime, timedelta
+import gc
+import tracemalloc
+
+from stockobjects.company import Company
+from stockobjects.companyquote import CompanyQuote
+
+CONST_QUOTE_COUNT = 200000
+
+
+class DictCompanyQuote:
+    # the pre-slots layout of CompanyQuote - every attribute lands in a per-instance __dict__
+    def __init__(self, company_object, date, open, high, low, close, volume):
+        self._parent = company_object
+        self._date = date
+        self._open = open
+        self._high = high
+        self._low = low
+        self._close = close
+        self._volume = volume
+
+
+def measure(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current / CONST_QUOTE_COUNT
+
+
+def build_objects(quote_class, company, dates):
+    # floats and ints are created per quote, same as when quotes are parsed off a queue
+    return [
+        quote_class(company, date, float(i), float(i), float(i), float(i), i)
+        for i, date in enumerate(dates)
+    ]
+
+
+def build_store(dates):
+    company = Company(company_name="Benchmark company", company_code="bch")
+    for i, date in enumerate(dates):
+        company.add_quote(date, float(i), float(i), float(i), float(i), i)
+    return company
+
+
+def main():
+    company = Company(company_name="Benchmark company", company_code="bch")
+    start = datetime(2000, 1, 1)
+    dates = [start + timedelta(days=day) for day in range(CONST_QUOTE_COUNT)]
+
+    results = [
+        (
+            "dict quote objects",
+            measure(lambda: build_objects(DictCompanyQuote, company, dates)),
+        ),
+        (
+            "slotted quote objects",
+            measure(lambda: build_objects(CompanyQuote, company, dates)),
+        ),
+        ("columnar quote store", measure(lambda: build_store(dates))),
+    ]
+
+    print(f"{CONST_QUOTE_COUNT} quotes, dates shared between layouts")
+    print(f"{'layout':<24} {'bytes/quote':>12}")
+    for name, bytes_per_quote in results:
+        print(f"{name:<24} {bytes_per_quote:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# scaling of an unfiltered get_company_quote across worker counts
+# run with: PYTHONPATH=src python benchmarks/bench_sharded_query.py
+import os
+import time
+
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.shardedsectorcollection import ShardedSectorCollection
+
+CONST_SECTORS = 32
+CONST_COMPANIES_PER_SECTOR = 25
+CONST_QUOTES_PER_COMPANY = 250
+CONST_WORKER_COUNTS = [1, 2, 4, 8, 16, 32]
+
+
+def populate(collection: SectorCollection) -> SectorCollection:
+    dates = np.datetime64("2020-01-01", "us") + np.arange(
+        CONST_QUOTES_PER_COMPANY
+    ) * np.timedelta64(1, "D")
+    prices = np.ones(CONST_QUOTES_PER_COMPANY)
+    volumes = np.full(CONST_QUOTES_PER_COMPANY, 1000)
+
+    for sector_number in range(CONST_SECTORS):
+        sector = Sector(sector_name="Benchmark", sector_code=f"s{sector_number}")
+        collection.add_sector(sector)
+        for company_number in range(CONST_COMPANIES_PER_SECTOR):
+            company = Company(
+                company_name="Benchmark",
+                company_code=f"s{sector_number}c{company_number}",
+            )
+            sector.add_company(company)
+            company.add_quotes(
+                date=dates,
+                open=prices,
+                high=prices,
+                low=prices,
+                close=prices,
+                volume=volumes,
+            )
+
+    return collection
+
+
+def time_query(collection: SectorCollection) -> float:
+    started = time.perf_counter()
+    collection.get_company_quote()
+    return time.perf_counter() - started
+
+
+def main():
+    total = CONST_SECTORS * CONST_COMPANIES_PER_SECTOR * CONST_QUOTES_PER_COMPANY
+    print(f"{total} quotes over {CONST_SECTORS} sectors, {os.cpu_count()} cpus")
+
+    baseline = time_query(populate(SectorCollection("plain")))
+    print(f"{'workers':>8} {'seconds':>10} {'vs plain':>10}")
+    print(f"{'plain':>8} {baseline:>10.3f} {1:>9.2f}x")
+
+    for workers in CONST_WORKER_COUNTS:
+        elapsed = time_query(
+            populate(ShardedSectorCollection("sharded", workers=workers))
+        )
+        print(f"{workers:>8} {elapsed:>10.3f} {baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# a load_sqs payload that fails on its last record, against collections of growing size.  Compares
+# the transaction rolling the payload back against rebuilding the collection from its source
+# rows, which was the only way back to a clean state before
+# run with: PYTHONPATH=src python benchmarks/bench_transaction.py
+from datetime import datetime, timedelta
+import time
+
+from bench_load_sqs import make_record
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+
+CONST_COMPANY_COUNTS = [100, 1000, 5000]
+CONST_HISTORY_DAYS = 1000
+CONST_PAYLOAD_RECORDS = 100
+CONST_START = datetime(2015, 1, 1)
+
+
+def build(company_count: int) -> SectorCollection:
+    collection = SectorCollection("benchmark")
+    sector = Sector(sector_name="Boilerplate", sector_code="Boilerplate")
+    collection.add_sector(sector)
+
+    history = [
+        (CONST_START + timedelta(days=day), 1.5, 2.0, 1.0, 1.75, 1000)
+        for day in range(CONST_HISTORY_DAYS)
+    ]
+    for number in range(company_count):
+        company = Company(company_name="benchmark", company_code=f"c{number}")
+        sector.add_company(company)
+        company.add_quotes(rows=history)
+
+    return collection
+
+
+def failing_payload(company_count: int) -> dict:
+    # new quotes for existing companies, a few new companies, then a clash at the very end
+    start = CONST_START + timedelta(days=CONST_HISTORY_DAYS)
+    records = [
+        make_record(
+            "stock", "stock_code", f"c{number * 7 % (company_count + 10)}", start
+        )
+        for number in range(CONST_PAYLOAD_RECORDS - 1)
+    ]
+    records.append(make_record("stock", "stock_code", "c0", CONST_START))
+    return {"Records": records}
+
+
+def main():
+    print(
+        f"{CONST_PAYLOAD_RECORDS} record payload failing on its last record, "
+        f"{CONST_HISTORY_DAYS} days of history per company"
+    )
+    for company_count in CONST_COMPANY_COUNTS:
+        collection = build(company_count)
+        payload = failing_payload(company_count)
+
+        started = time.perf_counter()
+        try:
+            collection.load_sqs(payload)
+        except QuoteAlreadyExists:
+            pass
+        rolled_back = time.perf_counter() - started
+        assert collection.company_quote_length == company_count * CONST_HISTORY_DAYS
+
+        started = time.perf_counter()
+        build(company_count)
+        rebuilt = time.perf_counter() - started
+
+        print(
+            f"{company_count:>6} companies  load + rollback {rolled_back * 1000:>8.1f}ms  "
+            f"rebuild {rebuilt * 1000:>8.1f}ms  {rebuilt / rolled_back:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# compares rebuilding a collection by replaying quote adds against opening a saved copy
+# run with: PYTHONPATH=src python benchmarks/bench_warm_start.py
+import tempfile
+import time
+
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_BARS_PER_TICKER = 2000
+CONST_TICKERS = 200
+CONST_SECTORS = 10
+
+
+def replay(dates, prices, volumes) -> SectorCollection:
+    collection = SectorCollection("benchmark")
+    rows = list(zip(dates.tolist(), prices.tolist(), volumes.tolist()))
+    for sector_number in range(CONST_SECTORS):
+        sector = Sector(sector_name="Benchmark", sector_code=f"s{sector_number}")
+        collection.add_sector(sector)
+        for ticker in range(sector_number, CONST_TICKERS, CONST_SECTORS):
+            company = Company(company_name="Benchmark", company_code=f"c{ticker}")
+            sector.add_company(company)
+            for date, price, volume in rows:
+                company.add_quote(date, price, price, price, price, volume)
+
+    return collection
+
+
+def main():
+    start = np.datetime64("2000-01-01", "us")
+    dates = start + np.arange(CONST_BARS_PER_TICKER) * np.timedelta64(1, "D")
+    prices = np.linspace(1.0, 2.0, CONST_BARS_PER_TICKER)
+    volumes = np.full(CONST_BARS_PER_TICKER, 1000, dtype=np.int64)
+    print(f"{CONST_TICKERS} tickers x {CONST_BARS_PER_TICKER} bars")
+
+    timings = []
+    started = time.perf_counter()
+    collection = replay(dates, prices, volumes)
+    timings.append(("replay", time.perf_counter() - started))
+
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        collection.save(path)
+        timings.append(("save", time.perf_counter() - started))
+
+        for name, mmap in (("open", False), ("open mmap", True)):
+            started = time.perf_counter()
+            SectorCollection.open(path, mmap=mmap)
+            timings.append((name, time.perf_counter() - started))
+
+    for name, elapsed in timings:
+        print(f"{name:<12} {elapsed:>8.3f}s")
+    print(f"speedup {timings[0][1] / timings[-1][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import json
+
+import numpy as np
+
+from stockobjects.quotestore import QuoteStore
+
+# Apache Arrow import/export for Company, Sector and SectorCollection
+# everything goes into one table with the six quote columns.  Each company and sector gets its own
+# contiguous run of rows (its own record batch on export), and the schema metadata says whose
+# rows are whose along with the names, codes and sector memberships - the same index
+# SectorCollection.save writes
+# export wraps the quote store's numpy columns without copying them, so the table shares memory
+# with the store - an out-of-order insert afterwards shows through, take a copy if that matters.
+# Import goes the other way: columns from a memory mapped IPC file end up in the quote stores
+# without being copied either, until something is added to them
+# pyarrow is optional - pip install ctf-stockobjects[arrow]
+CONST_ARROW_FORMAT = 1
+CONST_ARROW_METADATA_KEY = b"stockobjects"
+CONST_ARROW_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Arrow support needs pyarrow - install it with pip install ctf-stockobjects[arrow]"
+        )
+
+    return pyarrow
+
+
+def _schema(pyarrow, index: dict = None):
+    metadata = None
+    if index != None:
+        metadata = {CONST_ARROW_METADATA_KEY: json.dumps(index).encode()}
+
+    return pyarrow.schema(
+        [
+            pyarrow.field("date", pyarrow.timestamp("us"), nullable=False),
+            pyarrow.field("open", pyarrow.float64(), nullable=False),
+            pyarrow.field("high", pyarrow.float64(), nullable=False),
+            pyarrow.field("low", pyarrow.float64(), nullable=False),
+            pyarrow.field("close", pyarrow.float64(), nullable=False),
+            pyarrow.field("volume", pyarrow.int64(), nullable=False),
+        ],
+        metadata=metadata,
+    )
+
+
+def to_arrow_table(name: str, sectors, companies):
+    # sectors are written with their companies, companies are ones that aren't in any sector
+    # being exported (eg Company.to_arrow)
+    pyarrow = _pyarrow()
+
+    index = {
+        "format": CONST_ARROW_FORMAT,
+        "name": name,
+        "companies": [],
+        "sectors": [],
+        "rows": [],
+    }
+    stores = []
+    company_positions = {}
+
+    def add_company(company) -> int:
+        if id(company) not in company_positions:
+            company_positions[id(company)] = len(index["companies"])
+            index["companies"].append(
+                {"code": company.company_code, "name": company.company_name}
+            )
+            index["rows"].append(["company", company_positions[id(company)]])
+            stores.append(company._quotes)
+        return company_positions[id(company)]
+
+    for sector in sectors:
+        index["rows"].append(["sector", len(index["sectors"])])
+        stores.append(sector._quotes)
+        index["sectors"].append(
+            {
+                "code": sector.sector_code,
+                "name": sector.sector_name,
+                "companies": [
+                    add_company(company) for company in sector._company_list()
+                ],
+            }
+        )
+
+    for company in companies:
+        add_company(company)
+
+    # each store's row count goes with its entry, so import doesn't depend on batch boundaries
+    # the count and the columns are read under the store's lock, so they agree
+    arrays = []
+    for entry, store in zip(index["rows"], stores):
+        with store._lock.read():
+            entry.append(len(store))
+            arrays.append(
+                [
+                    pyarrow.array(store.dates),
+                    pyarrow.array(store.open),
+                    pyarrow.array(store.high),
+                    pyarrow.array(store.low),
+                    pyarrow.array(store.close),
+                    pyarrow.array(store.volume),
+                ]
+            )
+
+    schema = _schema(pyarrow, index)
+    batches = [
+        pyarrow.RecordBatch.from_arrays(columns, schema=schema) for columns in arrays
+    ]
+    return pyarrow.Table.from_batches(batches, schema=schema)
+
+
+def _to_numpy(column) -> np.ndarray:
+    if column.null_count > 0:
+        raise ValueError("Arrow quote columns can't have nulls")
+
+    # a single chunk converts without copying, several have to be joined up first
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=False)
+    return column.to_numpy()
+
+
+def from_arrow_table(table, company_class, sector_class=None) -> tuple:
+    # the other way - returns (name, [sectors], [companies not in any sector])
+    # Company can't hand over the Sector class, so tables with sectors in them need it passed
+    pyarrow = _pyarrow()
+
+    if isinstance(table, (list, tuple)):
+        table = pyarrow.Table.from_batches(table)
+
+    metadata = table.schema.metadata or {}
+    if CONST_ARROW_METADATA_KEY not in metadata:
+        raise ValueError("Arrow table wasn't written by stockobjects - no index found")
+
+    index = json.loads(metadata[CONST_ARROW_METADATA_KEY])
+    if index.get("format") != CONST_ARROW_FORMAT:
+        raise ValueError(
+            f"Unsupported Arrow format {index.get('format')}, expected {CONST_ARROW_FORMAT}"
+        )
+
+    expected = _schema(pyarrow)
+    if not table.schema.remove_metadata().equals(expected):
+        table = table.select(list(CONST_ARROW_COLUMNS)).cast(expected)
+
+    if len(index["sectors"]) > 0 and sector_class == None:
+        raise ValueError(
+            "Arrow table holds sectors, open it with Sector or SectorCollection instead"
+        )
+
+    companies = [
+        company_class(company_name=entry["name"], company_code=entry["code"])
+        for entry in index["companies"]
+    ]
+    sectors = [
+        sector_class(sector_name=entry["name"], sector_code=entry["code"])
+        for entry in index["sectors"]
+    ]
+
+    offset = 0
+    for kind, position, length in index["rows"]:
+        owner = companies[position] if kind == "company" else sectors[position]
+        rows = table.slice(offset, length)
+        owner._quotes = QuoteStore.from_columns(
+            parent=owner,
+            quote_class=owner._quotes._quote_class,
+            dates=_to_numpy(rows.column("date")),
+            open=_to_numpy(rows.column("open")),
+            high=_to_numpy(rows.column("high")),
+            low=_to_numpy(rows.column("low")),
+            close=_to_numpy(rows.column("close")),
+            volume=_to_numpy(rows.column("volume")),
+        )
+        offset += length
+
+    if offset != table.num_rows:
+        raise ValueError(
+            f"Arrow table has {table.num_rows} rows but its index covers {offset}"
+        )
+
+    members = set()
+    for sector, entry in zip(sectors, index["sectors"]):
+        for company_position in entry["companies"]:
+            sector.add_company(companies[company_position])
+            members.add(company_position)
+
+    loose_companies = [
+        company for position, company in enumerate(companies) if position not in members
+    ]
+    return index["name"], sectors, loose_companies
+
+
+def write_arrow_file(table, path: str):
+    pyarrow = _pyarrow()
+    with pyarrow.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_arrow_file(path: str, mmap: bool = True):
+    # with mmap the table's buffers point straight into the file, nothing is read up front
+    pyarrow = _pyarrow()
+    if mmap:
+        source = pyarrow.memory_map(path, "r")
+    else:
+        source = pyarrow.OSFile(path, "rb")
+
+    return pyarrow.ipc.open_file(source).read_all()
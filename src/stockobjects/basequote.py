@@ -2,6 +2,9 @@ from datetime import datetime
 
 
 class BaseQuote:
+    # slots instead of a per-instance __dict__ - there can be millions of these
+    __slots__ = ("_parent", "_date", "_open", "_high", "_low", "_close", "_volume")
+
     _date: datetime
     _open: float
     _high: float
@@ -27,6 +30,31 @@ class BaseQuote:
         self._close = close
         self._volume = volume
 
+    # quotes are rebuilt from the quote store on demand, so two quotes are the same quote if
+    # they belong to the same parent and carry the same values - not if they're the same object
+    def __eq__(self, other) -> bool:
+        if type(self) is not type(other):
+            return NotImplemented
+
+        return self._parent is other._parent and (
+            self._date,
+            self._open,
+            self._high,
+            self._low,
+            self._close,
+            self._volume,
+        ) == (
+            other._date,
+            other._open,
+            other._high,
+            other._low,
+            other._close,
+            other._volume,
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._parent), self._date))
+
     @property
     def name(self) -> str:
         return self._parent.name
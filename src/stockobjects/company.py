@@ -1,8 +1,22 @@
 from datetime import datetime
 from typing import Dict
+from contextlib import nullcontext
 from stockobjects.companyquote import CompanyQuote
-from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+from stockobjects.stockobjectsexceptions import (
+    QuoteAlreadyExists,
+    IndicatorAlreadyExists,
+    IndicatorDoesNotExist,
+)
 from stockobjects.parsing import DateParser
+from stockobjects.quotestore import QuoteStore
+from stockobjects.resample import resample_store
+from stockobjects.indicators import Indicator
+from stockobjects.arrowio import (
+    to_arrow_table,
+    from_arrow_table,
+    write_arrow_file,
+    read_arrow_file,
+)
 
 
 class Company:
@@ -10,7 +24,8 @@ class Company:
     _company_code: str
     _sector_name: set
     _sector_code: str
-    _quotes: Dict[datetime, CompanyQuote]
+    # behaves like Dict[datetime, CompanyQuote] but stores the quotes as columns
+    _quotes: QuoteStore
 
     def __init__(self, company_name: str, company_code: str, sector_object=None):
         self._company_name = company_name
@@ -25,7 +40,11 @@ class Company:
             self._sector_name = None
             self._sector_code = None
 
-        self._quotes = {}
+        self._quotes = QuoteStore(parent=self, quote_class=CompanyQuote)
+        # resampled bars by freq, thrown away whenever quotes are added
+        self._resampled = {}
+        # named indicators, brought up to date every time quotes are added
+        self._indicators = {}
 
     @property
     def sector_code(self) -> str:
@@ -73,38 +92,202 @@ class Company:
         low: float,
         close: float,
         volume: int,
+        on_duplicate: str = None,
     ) -> bool:
-        # self._quotes[date] = CompanyQuote
-        # try to turn the incoming parameters into a CompanyQuote
-        try:
-            new_quote = CompanyQuote(
-                self,
+        # write straight into the quote store - no need to build a CompanyQuote just to throw it away
+        # on_duplicate is "raise", "skip", "overwrite" or "merge" (see QuoteStore), and defaults to
+        # whatever the collection this company is in uses.  Returns False for a handled duplicate
+        # the quotes stay locked until everything listening has caught up, so nobody reading
+        # them sees a quote that the sector or collection doesn't know about yet
+        with self._write_gate(), self._quotes._lock.write():
+            if not self._quotes.add(
                 date=date,
                 open=open,
                 high=high,
                 low=low,
                 close=close,
                 volume=volume,
+                on_duplicate=self._prepare_write(on_duplicate),
+            ):
+                if self._quotes._rewritten_from != None:
+                    self._quotes_changed(
+                        quotes_added=0, rewritten_from=self._quotes._rewritten_from
+                    )
+                return False
+
+            self._quotes_changed(
+                quotes_added=1, new_quote=(date, open, high, low, close, volume)
             )
-        except Exception as e:
-            raise
+            return True
 
-        # and then use the add_quote_object method to add it - avoids duplicating code
-        # try except will catch if there's already a duplicate quote
-        try:
-            add_quote_result = self.add_quote_object(new_quote)
-        except Exception as e:
-            raise
+    def _collection(self):
+        if self._sector_object != None:
+            return self._sector_object._collection
+
+        return None
+
+    def _write_gate(self):
+        # writes share the collection's write gate, so it can shut them all out while it saves
+        # or snapshots itself.  See SectorCollection._write_gate
+        collection = self._collection()
+        if collection != None:
+            return collection._write_gate.read()
+
+        return nullcontext()
 
-        return add_quote_result
+    def _prepare_write(self, on_duplicate: str) -> str:
+        # works out the duplicate policy, and if the collection has a transaction open makes sure
+        # it's journalling this company's quotes before anything gets written to them
+        collection = self._collection()
+        if collection != None:
+            # read once - another thread's transaction can finish at any moment
+            transaction = collection._transaction
+            if transaction != None:
+                transaction.watch(self._quotes)
 
-    def add_quote_object(self, new_quote: CompanyQuote) -> bool:
-        if new_quote.date in self._quotes:
-            raise QuoteAlreadyExists(code=self._company_code, date=new_quote)
+        if on_duplicate != None:
+            return on_duplicate
+
+        if collection != None:
+            return collection.on_duplicate
+
+        return "raise"
+
+    @property
+    def duplicate_counts(self) -> dict:
+        return self._quotes.duplicate_counts
+
+    def _quotes_changed(
+        self, quotes_added: int, new_quote: tuple = None, rewritten_from: int = None
+    ):
+        # new_quote is the (date, open, high, low, close, volume) row when exactly one quote was
+        # added, so whoever's listening can update incrementally.  Bulk adds leave it as None
+        # rewritten_from is set when quotes already here were overwritten or merged
+        self._resampled.clear()
+        for indicator in self._indicators.values():
+            indicator.sync(self._quotes, rewritten_from=rewritten_from)
+
+        # let the sector (and through it, the collection) know this company's quotes changed
+        if self._sector_object != None:
+            self._sector_object._company_changed(
+                self, quotes_added=quotes_added, new_quote=new_quote
+            )
+
+    def add_quote_object(
+        self, new_quote: CompanyQuote, on_duplicate: str = None
+    ) -> bool:
+        return self.add_quote(
+            date=new_quote.date,
+            open=new_quote.open,
+            high=new_quote.high,
+            low=new_quote.low,
+            close=new_quote.close,
+            volume=new_quote.volume,
+            on_duplicate=on_duplicate,
+        )
+
+    def add_quotes(
+        self,
+        rows=None,
+        date=None,
+        open=None,
+        high=None,
+        low=None,
+        close=None,
+        volume=None,
+        on_duplicate: str = None,
+    ) -> int:
+        # bulk version of add_quote - pass either an iterable of
+        # (date, open, high, low, close, volume) rows, or one array/list per column
+        # duplicates are checked for the whole batch before anything is inserted
+        with self._write_gate(), self._quotes._lock.write():
+            on_duplicate = self._prepare_write(on_duplicate)
+            if rows is not None:
+                added = self._quotes.extend_rows(rows=rows, on_duplicate=on_duplicate)
+            else:
+                added = self._quotes.extend(
+                    date=date,
+                    open=open,
+                    high=high,
+                    low=low,
+                    close=close,
+                    volume=volume,
+                    on_duplicate=on_duplicate,
+                )
 
-        self._quotes[new_quote.date] = new_quote
+            rewritten_from = self._quotes._rewritten_from
+            if added > 0 or rewritten_from != None:
+                self._quotes_changed(quotes_added=added, rewritten_from=rewritten_from)
+
+            return added
+
+    def resample(self, freq: str) -> QuoteStore:
+        # weekly ("W"), monthly ("M") or yearly ("Y") bars built from the daily company quotes
+        # behaves like get_quote's dict and has the columns as arrays too.  Cached until new
+        # quotes arrive, so treat it as read only
+        with self._quotes._lock.read():
+            if freq not in self._resampled:
+                self._resampled[freq] = resample_store(self._quotes, freq=freq)
+
+            return self._resampled[freq]
+
+    def add_indicator(self, name: str, indicator: Indicator) -> Indicator:
+        # eg add_indicator("sma20", SMA(20)).  Works out the indicator over the quotes already here,
+        # then keeps it up to date as more arrive
+        if not isinstance(indicator, Indicator):
+            raise TypeError(
+                f"indicator must be an Indicator, instead of {type(indicator)}"
+            )
+
+        with self._quotes._lock.write():
+            if name in self._indicators:
+                raise IndicatorAlreadyExists(code=self._company_code, name=name)
+
+            indicator.sync(self._quotes)
+            self._indicators[name] = indicator
+            return indicator
+
+    def get_indicator(self, name: str) -> Indicator:
+        if name not in self._indicators:
+            raise IndicatorDoesNotExist(code=self._company_code, name=name)
+
+        return self._indicators[name]
+
+    def remove_indicator(self, name: str) -> bool:
+        with self._quotes._lock.write():
+            if name not in self._indicators:
+                raise IndicatorDoesNotExist(code=self._company_code, name=name)
+
+            del self._indicators[name]
+            return True
+
+    @property
+    def indicators(self) -> Dict[str, Indicator]:
+        return dict(self._indicators)
+
+    def to_arrow(self):
+        # this company's quotes as a pyarrow Table - shares memory with the quote store
+        return to_arrow_table(name=None, sectors=[], companies=[self])
+
+    def write_arrow(self, path: str) -> bool:
+        write_arrow_file(self.to_arrow(), path)
         return True
 
+    @classmethod
+    def from_arrow(cls, table) -> "Company":
+        # table (or list of record batches) from Company.to_arrow
+        _, _, companies = from_arrow_table(table, company_class=cls)
+        if len(companies) != 1:
+            raise ValueError(
+                f"Arrow table holds {len(companies)} companies, expected exactly 1"
+            )
+
+        return companies[0]
+
+    @classmethod
+    def read_arrow(cls, path: str, mmap: bool = True) -> "Company":
+        return cls.from_arrow(read_arrow_file(path, mmap=mmap))
+
     def get_company_quote_length(self):
         return self.length
 
@@ -119,14 +302,10 @@ class Company:
         except Exception as e:
             raise
 
-        matched_quotes = {}
-
-        for quote_date in self._quotes:
-            if (
-                dates.date_from <= quote_date.date()
-                and dates.date_to >= quote_date.date()
-            ):
-                matched_quotes[quote_date] = self._quotes[quote_date]
+        # the quote store is sorted by date, so bisect for the window instead of checking every quote
+        matched_quotes = self._quotes.get_range(
+            date_from=dates.date_from, date_to=dates.date_to
+        )
 
         # not checking for zero returns since zero is a valid response, doesn't mean exception/error
         return matched_quotes
@@ -3,6 +3,8 @@ from datetime import datetime
 
 
 class CompanyQuote(BaseQuote):
+    __slots__ = ()
+
     date: datetime
     open: float
     high: float
@@ -24,7 +26,6 @@ class CompanyQuote(BaseQuote):
         close: float,
         volume: int,
     ):
-        self._parent = company_object
         super().__init__(
             parent=company_object,
             date=date,
@@ -0,0 +1,137 @@
+import asyncio
+import inspect
+
+# async consumer loop for SectorCollection.consume
+# a source is anything with an async receive() that returns the next payload - the same
+# {"Records": [...]} event load_sqs takes - or None once there's nothing more coming.  It can also
+# have async (or plain) ack(payload) and nack(payload, error) methods, which get called once a
+# payload has been applied or has failed to
+# receiving runs in its own task, so the next payload is already on its way while the current
+# one is being applied, and acks go out in the background.  A payload counts as in flight from
+# when it's asked for until its ack or nack has finished - once max_in_flight are, receiving
+# waits, so a slow collection or slow acks hold the source back instead of piling up in memory
+# payloads are applied one at a time, in the order they were received
+
+CONST_CONSUMER_IN_FLIGHT = 4
+
+
+class QueueSource:
+    # in memory source for tests and benchmarks.  put payloads in, close() when there are no more
+    # acked and nacked keep everything that was acknowledged, in order
+    def __init__(self, maxsize: int = 0):
+        self._queue = asyncio.Queue(maxsize)
+        self.acked = []
+        self.nacked = []
+
+    async def put(self, payload: dict):
+        await self._queue.put(payload)
+
+    def put_nowait(self, payload: dict):
+        self._queue.put_nowait(payload)
+
+    async def close(self):
+        await self._queue.put(None)
+
+    async def receive(self) -> dict:
+        payload = await self._queue.get()
+        if payload == None:
+            # leave it there for anyone else still receiving
+            self._queue.put_nowait(None)
+
+        return payload
+
+    async def ack(self, payload: dict):
+        self.acked.append(payload)
+
+    async def nack(self, payload: dict, error: Exception):
+        self.nacked.append((payload, error))
+
+
+async def _call(callback, *arguments):
+    if callback == None:
+        return
+
+    result = callback(*arguments)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def consume_source(
+    collection,
+    source,
+    max_in_flight: int = CONST_CONSUMER_IN_FLIGHT,
+    on_ack=None,
+    on_nack=None,
+) -> int:
+    if not isinstance(max_in_flight, int) or max_in_flight < 1:
+        raise ValueError(
+            f"max_in_flight must be a positive int, instead of {max_in_flight}"
+        )
+
+    if on_ack == None:
+        on_ack = getattr(source, "ack", None)
+    if on_nack == None:
+        on_nack = getattr(source, "nack", None)
+
+    slots = asyncio.Semaphore(max_in_flight)
+    received = asyncio.Queue()
+
+    async def receive():
+        try:
+            while True:
+                await slots.acquire()
+                payload = await source.receive()
+                received.put_nowait(payload)
+                if payload == None:
+                    return
+        except Exception as e:
+            # hand it over to be raised from consume
+            received.put_nowait(e)
+
+    async def acknowledge(callback, *arguments):
+        try:
+            await _call(callback, *arguments)
+        finally:
+            slots.release()
+
+    def acknowledged(task):
+        pending.discard(task)
+        if not task.cancelled() and task.exception() != None:
+            ack_errors.append(task.exception())
+
+    receiver = asyncio.ensure_future(receive())
+    pending = set()
+    ack_errors = []
+    applied = 0
+    try:
+        while True:
+            payload = await received.get()
+            if payload == None:
+                break
+            if isinstance(payload, Exception):
+                raise payload
+
+            try:
+                collection.load_sqs(payload=payload)
+            except Exception as e:
+                task = asyncio.ensure_future(acknowledge(on_nack, payload, e))
+            else:
+                applied += 1
+                task = asyncio.ensure_future(acknowledge(on_ack, payload))
+
+            pending.add(task)
+            task.add_done_callback(acknowledged)
+
+            # let the receiver and the acks have a go before the next payload
+            await asyncio.sleep(0)
+            if len(ack_errors) > 0:
+                raise ack_errors[0]
+    finally:
+        receiver.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    # an ack that failed right at the end
+    if len(ack_errors) > 0:
+        raise ack_errors[0]
+
+    return applied
@@ -0,0 +1,95 @@
+import numpy as np
+
+from stockobjects.panel import Panel
+
+# how many companies' returns go into each block of the correlation - intermediates are
+# block x block instead of companies x companies
+CONST_CORRELATION_BLOCK_SIZE = 256
+
+
+# pairwise correlation of daily log returns, one row and column per company
+# read only, since Sector and SectorCollection cache and share them
+class Correlation:
+    _codes: np.ndarray
+    _values: np.ndarray
+
+    def __init__(self, codes: np.ndarray, values: np.ndarray):
+        self._codes = codes
+        self._values = values
+        self._positions = {code: position for position, code in enumerate(codes)}
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def shape(self) -> tuple:
+        return self._values.shape
+
+    def get(self, code_a: str, code_b: str) -> float:
+        return float(self._values[self._positions[code_a], self._positions[code_b]])
+
+
+def log_returns(closes: np.ndarray) -> np.ndarray:
+    # companies x (dates - 1), NaN wherever either day is missing
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(closes), axis=1)
+
+
+def correlate(
+    panel: Panel, block_size: int = CONST_CORRELATION_BLOCK_SIZE
+) -> Correlation:
+    # pearson correlation of every pair of companies in a close panel, using just the days both
+    # of them have a return for.  With a mask of which returns are there, every sum the formula
+    # needs is a matrix product over one block of rows against another, so there's no loop over
+    # pairs and nothing bigger than a block x block matrix is built on the way
+    if not isinstance(block_size, int) or block_size < 1:
+        raise ValueError(f"block_size must be a positive int, instead of {block_size}")
+
+    returns = log_returns(panel.values)
+    present = (~np.isnan(returns)).astype(np.float64)
+    returns = np.where(present > 0, returns, 0.0)
+    squares = returns * returns
+
+    company_count = len(returns)
+    values = np.full((company_count, company_count), np.nan)
+    blocks = [
+        slice(start, min(start + block_size, company_count))
+        for start in range(0, company_count, block_size)
+    ]
+
+    for row, block_a in enumerate(blocks):
+        for block_b in blocks[row:]:
+            x, x_present, x_squares = (
+                returns[block_a],
+                present[block_a],
+                squares[block_a],
+            )
+            y, y_present, y_squares = (
+                returns[block_b],
+                present[block_b],
+                squares[block_b],
+            )
+
+            count = x_present @ y_present.T
+            sum_x = x @ y_present.T
+            sum_y = x_present @ y.T
+            with np.errstate(divide="ignore", invalid="ignore"):
+                covariance = x @ y.T - sum_x * sum_y / count
+                variance_x = x_squares @ y_present.T - sum_x * sum_x / count
+                variance_y = x_present @ y_squares.T - sum_y * sum_y / count
+                block = covariance / np.sqrt(variance_x * variance_y)
+
+            # need at least two shared days and some movement in both to say anything
+            block[(count < 2) | ~(variance_x > 0) | ~(variance_y > 0)] = np.nan
+            block = np.clip(block, -1, 1)
+
+            values[block_a, block_b] = block
+            values[block_b, block_a] = block.T
+
+    values.flags.writeable = False
+    return Correlation(codes=panel.codes, values=values)
@@ -0,0 +1,201 @@
+import numpy as np
+
+# technical indicators that a Company keeps up to date as quotes arrive
+# each one keeps a small running state (a sum, the previous value...) so a quote appended to the
+# end costs O(1).  If a quote lands in the middle of the history, the indicator rewinds its state
+# to just before that date and recomputes from there on - everything earlier is left alone
+# values line up one-to-one with the company's quotes, NaN until there's enough history
+
+
+class Indicator:
+    _dates: np.ndarray
+    _values: np.ndarray
+    _length: int
+
+    def __init__(self):
+        self._length = 0
+        self._dates = np.empty(16, dtype="datetime64[us]")
+        self._values = np.empty(16, dtype=np.float64)
+
+    @property
+    def length(self) -> int:
+        return self._length
+
+    @property
+    def value(self) -> float:
+        # the latest value
+        if self._length == 0:
+            return np.nan
+        return float(self._values[self._length - 1])
+
+    @property
+    def history(self) -> np.ndarray:
+        return self._values[: self._length]
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[: self._length]
+
+    def _seed(self, store, start: int):
+        # set the running state up as it was just before position start
+        raise NotImplementedError
+
+    def _next(self, store, position: int) -> float:
+        # the value at position, moving the running state on by one quote
+        raise NotImplementedError
+
+    def sync(self, store, rewritten_from: int = None):
+        # catch up with the quote store.  If the last date seen is still in the same position then
+        # nothing before it moved and this is a plain append.  rewritten_from is the first
+        # position whose quote was overwritten in place (or taken out by a rollback), which
+        # dates alone can't show
+        dates = store.dates
+        length = min(self._length, len(dates))
+        if length == 0 or dates[length - 1] == self._dates[length - 1]:
+            start = length
+        else:
+            # something was inserted earlier on - start from the first date that moved
+            start = int(np.flatnonzero(dates[:length] != self._dates[:length])[0])
+
+        if rewritten_from != None:
+            start = min(start, rewritten_from)
+
+        if start < self._length:
+            self._seed(store, start)
+
+        if len(dates) > len(self._values):
+            capacity = len(self._values)
+            while capacity < len(dates):
+                capacity *= 2
+            self._dates = np.concatenate(
+                (self._dates, np.empty(capacity - len(self._dates), "datetime64[us]"))
+            )
+            self._values = np.concatenate(
+                (self._values, np.empty(capacity - len(self._values), np.float64))
+            )
+
+        for position in range(start, len(dates)):
+            self._dates[position] = dates[position]
+            self._values[position] = self._next(store, position)
+
+        self._length = len(dates)
+
+
+class SMA(Indicator):
+    # simple moving average of the close over the last window quotes
+    def __init__(self, window: int):
+        if not isinstance(window, int) or window < 1:
+            raise ValueError(f"window must be a positive int, instead of {window}")
+
+        super().__init__()
+        self._window = window
+        self._sum = 0.0
+
+    def _seed(self, store, start: int):
+        self._sum = float(store.close[max(start - self._window, 0) : start].sum())
+
+    def _next(self, store, position: int) -> float:
+        close = store.close
+        self._sum += close[position]
+        if position >= self._window:
+            self._sum -= close[position - self._window]
+
+        if position < self._window - 1:
+            return np.nan
+        return self._sum / self._window
+
+
+class EMA(Indicator):
+    # exponential moving average of the close, starting from the first close
+    def __init__(self, window: int):
+        if not isinstance(window, int) or window < 1:
+            raise ValueError(f"window must be a positive int, instead of {window}")
+
+        super().__init__()
+        self._alpha = 2 / (window + 1)
+        self._previous = np.nan
+
+    def _seed(self, store, start: int):
+        self._previous = self._values[start - 1] if start > 0 else np.nan
+
+    def _next(self, store, position: int) -> float:
+        close = store.close[position]
+        if position == 0:
+            self._previous = close
+        else:
+            self._previous = self._alpha * close + (1 - self._alpha) * self._previous
+
+        return self._previous
+
+
+class VWAP(Indicator):
+    # volume weighted average of the typical price (high + low + close) / 3, over all quotes so far
+    def __init__(self):
+        super().__init__()
+        self._price_volume = 0.0
+        self._volume = 0
+
+    def _seed(self, store, start: int):
+        typical = (store.high[:start] + store.low[:start] + store.close[:start]) / 3
+        self._price_volume = float((typical * store.volume[:start]).sum())
+        self._volume = int(store.volume[:start].sum())
+
+    def _next(self, store, position: int) -> float:
+        typical = (
+            store.high[position] + store.low[position] + store.close[position]
+        ) / 3
+        self._price_volume += typical * store.volume[position]
+        self._volume += int(store.volume[position])
+
+        if self._volume == 0:
+            return np.nan
+        return self._price_volume / self._volume
+
+
+class ATR(Indicator):
+    # average true range with Wilder's smoothing - the first value is the plain average of the
+    # first window true ranges, after that each one is (previous * (window - 1) + tr) / window
+    def __init__(self, window: int = 14):
+        if not isinstance(window, int) or window < 1:
+            raise ValueError(f"window must be a positive int, instead of {window}")
+
+        super().__init__()
+        self._window = window
+        self._previous = np.nan
+        self._warmup_sum = 0.0
+
+    @staticmethod
+    def _true_range(store, position: int) -> float:
+        high = store.high[position]
+        low = store.low[position]
+        if position == 0:
+            return high - low
+
+        previous_close = store.close[position - 1]
+        return max(high - low, abs(high - previous_close), abs(low - previous_close))
+
+    def _seed(self, store, start: int):
+        if start >= self._window:
+            self._previous = self._values[start - 1]
+        else:
+            self._previous = np.nan
+            self._warmup_sum = sum(
+                self._true_range(store, position) for position in range(start)
+            )
+
+    def _next(self, store, position: int) -> float:
+        true_range = self._true_range(store, position)
+        if position < self._window:
+            if position == 0:
+                self._warmup_sum = 0.0
+            self._warmup_sum += true_range
+            if position < self._window - 1:
+                return np.nan
+
+            self._previous = self._warmup_sum / self._window
+        else:
+            self._previous = (
+                self._previous * (self._window - 1) + true_range
+            ) / self._window
+
+        return self._previous
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import Iterable
+import numpy as np
+
+from stockobjects.parsing import DateParser
+from stockobjects.snapshot import check_fields
+
+
+# a dense companies x dates matrix of one quote field, with NaN where a company has no quote
+# Sector and SectorCollection build the full-history panel once and cache it until a company
+# changes, then hand out date range slices of it - so the axes get reused and the slices are
+# numpy views, not copies.  Everything is read only since it's shared between callers
+class Panel:
+    _codes: np.ndarray
+    _dates: np.ndarray
+    _values: np.ndarray
+    _field: str
+
+    def __init__(
+        self, field: str, codes: np.ndarray, dates: np.ndarray, values: np.ndarray
+    ):
+        self._field = field
+        self._codes = codes
+        self._dates = dates
+        self._values = values
+
+    @property
+    def field(self) -> str:
+        return self._field
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._codes
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def shape(self) -> tuple:
+        return self._values.shape
+
+    def slice(
+        self,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ):
+        # same rules as get_quote for which dates are in, returns views of this panel
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+        start = int(np.searchsorted(self._dates, np.datetime64(dates.date_from, "D")))
+        end = int(
+            np.searchsorted(self._dates, np.datetime64(dates.date_to, "D"), "right")
+        )
+
+        return Panel(
+            field=self._field,
+            codes=self._codes,
+            dates=self._dates[start:end],
+            values=self._values[:, start:end],
+        )
+
+
+def build_panel(companies: Iterable, field: str = "close") -> Panel:
+    # full history panel for these companies, one row per company in the order given
+    check_fields([field])
+    companies = list(companies)
+
+    # dates and values are copied out of each company together, so they still line up if quotes
+    # are going in at the same time
+    company_columns = [company._quotes.columns("dates", field) for company in companies]
+
+    # quotes are lined up by day, whatever time of day they were stamped with
+    company_days = [dates.astype("datetime64[D]") for dates, _ in company_columns]
+    if len(company_days) > 0:
+        dates = np.unique(np.concatenate(company_days))
+    else:
+        dates = np.empty(0, dtype="datetime64[D]")
+
+    values = np.full((len(companies), len(dates)), np.nan)
+    for row, ((_, field_values), days) in enumerate(zip(company_columns, company_days)):
+        values[row, np.searchsorted(dates, days)] = field_values
+
+    codes = np.array([company.company_code for company in companies], dtype=str)
+    for axis in (codes, dates, values):
+        axis.flags.writeable = False
+
+    return Panel(field=field, codes=codes, dates=dates, values=values)
@@ -1,6 +1,49 @@
 from datetime import datetime
+from functools import lru_cache
+import numpy as np
 from stockobjects.stockobjectsexceptions import InvalidDateOptions
 
+# a batch of quotes only ever carries a handful of distinct dates, so cache the parse of each string
+CONST_QUOTE_DATE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CONST_QUOTE_DATE_CACHE_SIZE)
+def _parse_quote_date_string(quote_date: str) -> np.datetime64:
+    return np.datetime64(quote_date, "us")
+
+
+def parse_quote_date(quote_date) -> np.datetime64:
+    # turns a quote date into the key the quote store sorts on
+    # accepts datetime, date, iso strings (eg "2021-03-30") or datetime64
+    try:
+        if isinstance(quote_date, str):
+            return _parse_quote_date_string(quote_date)
+
+        return np.datetime64(quote_date, "us")
+    except Exception:
+        raise TypeError(
+            f"Unable to convert {quote_date} of type {type(quote_date)} into a date"
+        )
+
+
+def parse_quote_dates(quote_dates) -> np.ndarray:
+    # vectorised parse_quote_date for a whole column of dates
+    try:
+        quote_dates = np.asarray(quote_dates)
+
+        if quote_dates.dtype.kind in ("U", "S"):
+            # parse each distinct string once and then fan the results back out
+            distinct_dates, positions = np.unique(quote_dates, return_inverse=True)
+            parsed_dates = np.array(
+                [_parse_quote_date_string(str(date)) for date in distinct_dates],
+                dtype="datetime64[us]",
+            )
+            return parsed_dates[positions.reshape(-1)]
+
+        return quote_dates.astype("datetime64[us]")
+    except Exception:
+        raise TypeError("Unable to convert dates into an array of dates")
+
 
 class DateParser:
     date_from: datetime
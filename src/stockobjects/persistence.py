@@ -0,0 +1,139 @@
+import json
+import os
+
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.quotestore import QuoteStore, CONST_STORE_COLUMNS
+from stockobjects.companyquote import CompanyQuote
+from stockobjects.sectorquote import SectorQuote
+
+# on disk layout for SectorCollection.save/open
+#   <path>/index.json                   names, codes and which companies are in which sector
+#   <path>/quotes/<file>.<column>.npy   one flat column per file, for every company and sector
+# the columns are plain .npy files, so opening them memory maps them and nothing is read until a
+# query touches it.  Maps are copy on write - changes stay in memory and never reach the files
+CONST_STORE_FORMAT = 1
+CONST_STORE_INDEX = "index.json"
+CONST_STORE_QUOTES = "quotes"
+
+
+def _replace(path: str, write):
+    # write next to the real file then swap it in, so anything still mapping the old file keeps
+    # seeing the old file instead of having it truncated underneath it
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        write(file)
+    os.replace(temporary_path, path)
+
+
+def _save_store(quotes_path: str, file_name: str, store: QuoteStore):
+    with store._lock.read():
+        for column in CONST_STORE_COLUMNS:
+            _replace(
+                os.path.join(quotes_path, f"{file_name}.{column}.npy"),
+                lambda file: np.save(file, getattr(store, column)),
+            )
+
+
+def _open_store(
+    quotes_path: str, file_name: str, parent, quote_class, mmap: bool
+) -> QuoteStore:
+    columns = {
+        column: np.load(
+            os.path.join(quotes_path, f"{file_name}.{column}.npy"),
+            mmap_mode="c" if mmap else None,
+        )
+        for column in CONST_STORE_COLUMNS
+    }
+    return QuoteStore.from_columns(parent=parent, quote_class=quote_class, **columns)
+
+
+def save_collection(collection, path: str):
+    quotes_path = os.path.join(path, CONST_STORE_QUOTES)
+    os.makedirs(quotes_path, exist_ok=True)
+
+    # a company can be in more than one sector, so companies get written once and sectors
+    # refer to them by position
+    companies = []
+    company_positions = {}
+    sectors = []
+    for sector_position, sector in enumerate(collection._sectors.values()):
+        sector_file = f"s{sector_position}"
+        _save_store(quotes_path, sector_file, sector._quotes)
+
+        members = []
+        for company in sector._companies.values():
+            if id(company) not in company_positions:
+                company_file = f"c{len(companies)}"
+                _save_store(quotes_path, company_file, company._quotes)
+                company_positions[id(company)] = len(companies)
+                companies.append(
+                    {
+                        "code": company.company_code,
+                        "name": company.company_name,
+                        "file": company_file,
+                    }
+                )
+            members.append(company_positions[id(company)])
+
+        sectors.append(
+            {
+                "code": sector.sector_code,
+                "name": sector.sector_name,
+                "file": sector_file,
+                "companies": members,
+            }
+        )
+
+    index = {
+        "format": CONST_STORE_FORMAT,
+        "name": collection.name,
+        "companies": companies,
+        "sectors": sectors,
+    }
+    _replace(
+        os.path.join(path, CONST_STORE_INDEX),
+        lambda file: file.write(json.dumps(index).encode()),
+    )
+
+    # tidy up columns left behind by an earlier, bigger save
+    wanted = {entry["file"] for entry in companies + sectors}
+    for file_name in os.listdir(quotes_path):
+        if file_name.split(".")[0] not in wanted:
+            os.remove(os.path.join(quotes_path, file_name))
+
+
+def open_collection(collection_class, path: str, mmap: bool = True):
+    with open(os.path.join(path, CONST_STORE_INDEX)) as file:
+        index = json.load(file)
+
+    if index.get("format") != CONST_STORE_FORMAT:
+        raise ValueError(
+            f"Unsupported store format {index.get('format')} in {path}, expected {CONST_STORE_FORMAT}"
+        )
+
+    quotes_path = os.path.join(path, CONST_STORE_QUOTES)
+    collection = collection_class(name=index["name"])
+
+    companies = []
+    for entry in index["companies"]:
+        company = Company(company_name=entry["name"], company_code=entry["code"])
+        company._quotes = _open_store(
+            quotes_path, entry["file"], company, CompanyQuote, mmap=mmap
+        )
+        companies.append(company)
+
+    # quotes are already in place, so the usual add_company/add_sector calls just have to count
+    # them rather than replay them
+    for entry in index["sectors"]:
+        sector = Sector(sector_name=entry["name"], sector_code=entry["code"])
+        sector._quotes = _open_store(
+            quotes_path, entry["file"], sector, SectorQuote, mmap=mmap
+        )
+        for company_position in entry["companies"]:
+            sector.add_company(companies[company_position])
+        collection.add_sector(sector)
+
+    return collection
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Set
+
+
+# LRU cache of query results for Sector and SectorCollection
+# every entry records the codes it was built from (its tags), so a write only throws away the
+# entries that could have seen it.  A tag of (kind, None) means "every code of that kind" - eg
+# a get_company_quote with no company_codes - and is dropped whenever any code of that kind changes
+class QueryCache:
+    _entries: OrderedDict
+    _tags: Dict[tuple, Set[tuple]]
+    _maxsize: int
+
+    def __init__(self, maxsize: int = 128):
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError(f"maxsize must be a positive int, instead of {maxsize}")
+
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key: tuple):
+        # returns None on a miss - results are always dicts, so None is never a cached value
+        if key not in self._entries:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key: tuple, result, tags: Iterable[tuple]):
+        if key in self._entries:
+            self._forget(key)
+
+        tags = tuple(tags)
+        self._entries[key] = (result, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        # evict the least recently used entry
+        if len(self._entries) > self._maxsize:
+            self._forget(next(iter(self._entries)))
+
+    def _forget(self, key: tuple):
+        _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys != None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self._tags[tag]
+
+    def invalidate(self, kind: str, code: str):
+        # drop everything built from this code, plus everything built from all codes of this kind
+        for tag in ((kind, code), (kind, None)):
+            for key in list(self._tags.get(tag, ())):
+                self._forget(key)
+                self._invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    @property
+    def length(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+        }
+
+
+def company_query_key(company_codes, dates) -> tuple:
+    # normalised cache key and tags for a get_company_quote - the order codes were asked for in
+    # doesn't change the answer
+    if company_codes == None:
+        return ("company_quote", None, dates.date_from, dates.date_to), [
+            ("company", None)
+        ]
+
+    company_codes = tuple(sorted(set(company_codes)))
+    return ("company_quote", company_codes, dates.date_from, dates.date_to), [
+        ("company", company_code) for company_code in company_codes
+    ]
+
+
+def sector_query_key(sector_codes, dates) -> tuple:
+    # same again for a collection level get_sector_quote
+    if sector_codes == None:
+        return ("sector_quote", None, dates.date_from, dates.date_to), [
+            ("sector", None)
+        ]
+
+    sector_codes = tuple(sorted(set(sector_codes)))
+    return ("sector_quote", sector_codes, dates.date_from, dates.date_to), [
+        ("sector", sector_code) for sector_code in sector_codes
+    ]
+
+
+def copy_quote_result(result: dict) -> dict:
+    # results are handed out as fresh dicts so callers can't change what's in the cache.  Quote
+    # objects themselves are shared, they're read only
+    return {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in result.items()
+    }
@@ -0,0 +1,338 @@
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorquote import SectorQuote
+from stockobjects.persistence import save_collection, open_collection
+
+# append only write-ahead log of everything added to a SectorCollection
+# a log directory holds
+#   <path>/CURRENT          name of the snapshot to start from
+#   <path>/snapshot-<n>/    a SectorCollection.save of the state when the log was last compacted
+#   <path>/quotes.log       every sector, company and quote added since then
+# each record is a 9 byte header - type, payload length, crc32 of the payload - then the payload.
+# Strings are a 2 byte length then utf-8, quotes are a count then the six columns as raw arrays
+# a worker dying mid-write leaves at most one torn record at the end, which fails its length or
+# crc check and gets dropped.  Replaying is idempotent (anything already there is skipped, and
+# replaced quotes are logged with their final values), so a crash partway through a compaction
+# just replays a few records that are already in the snapshot
+# everything done inside a SectorCollection.transaction is held back until it commits, then written
+# as one transaction record wrapping the lot - so it replays all or nothing
+# records can come from any thread, each one is written whole before the next
+CONST_LOG_SECTOR = 1
+CONST_LOG_COMPANY = 2
+CONST_LOG_COMPANY_QUOTES = 3
+CONST_LOG_SECTOR_QUOTES = 4
+# quotes that were overwritten or merged into ones already there
+CONST_LOG_COMPANY_REPLACED = 5
+CONST_LOG_SECTOR_REPLACED = 6
+# the records of one committed transaction, one after the other in the usual format
+CONST_LOG_TRANSACTION = 7
+
+CONST_LOG_FILE = "quotes.log"
+CONST_LOG_CURRENT = "CURRENT"
+CONST_LOG_SNAPSHOT = "snapshot-"
+
+_HEADER = struct.Struct("<BII")
+_QUOTE_COLUMN_TYPES = (
+    "datetime64[us]",
+    np.float64,
+    np.float64,
+    np.float64,
+    np.float64,
+    np.int64,
+)
+
+
+def _pack_string(value: str) -> bytes:
+    encoded = value.encode()
+    return struct.pack("<H", len(encoded)) + encoded
+
+
+def _unpack_string(payload: bytes, offset: int) -> tuple:
+    (length,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    return payload[offset : offset + length].decode(), offset + length
+
+
+def _unpack_quotes(payload: bytes, offset: int) -> tuple:
+    (count,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+
+    columns = []
+    for column_type in _QUOTE_COLUMN_TYPES:
+        columns.append(
+            np.frombuffer(payload, dtype=column_type, count=count, offset=offset)
+        )
+        offset += count * 8
+
+    return tuple(columns)
+
+
+def read_log(path: str):
+    # yields (type, fields...) for every intact record, in order:
+    #   (CONST_LOG_SECTOR, sector_code, sector_name)
+    #   (CONST_LOG_COMPANY, sector_code, company_code, company_name)
+    #   (CONST_LOG_COMPANY_QUOTES / CONST_LOG_SECTOR_QUOTES, code, columns)
+    #   (CONST_LOG_COMPANY_REPLACED / CONST_LOG_SECTOR_REPLACED, code, columns)
+    # transaction records are unwrapped into the records they hold
+    for record_type, payload in _read_records(path):
+        if record_type == CONST_LOG_TRANSACTION:
+            for record_type, payload in _parse_records(payload):
+                yield _unpack_record(record_type, payload)
+        else:
+            yield _unpack_record(record_type, payload)
+
+
+def _unpack_record(record_type: int, payload: bytes) -> tuple:
+    code, offset = _unpack_string(payload, 0)
+    if record_type == CONST_LOG_SECTOR:
+        name, _ = _unpack_string(payload, offset)
+        return record_type, code, name
+    if record_type == CONST_LOG_COMPANY:
+        company_code, offset = _unpack_string(payload, offset)
+        name, _ = _unpack_string(payload, offset)
+        return record_type, code, company_code, name
+
+    return record_type, code, _unpack_quotes(payload, offset)
+
+
+def _pack_record(record_type: int, payload: bytes) -> bytes:
+    return _HEADER.pack(record_type, len(payload), zlib.crc32(payload)) + payload
+
+
+def _read_records(path: str):
+    with open(path, "rb") as file:
+        data = file.read()
+
+    return _parse_records(data)
+
+
+def _parse_records(data: bytes):
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        record_type, length, checksum = _HEADER.unpack_from(data, offset)
+        payload = data[offset + _HEADER.size : offset + _HEADER.size + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            # torn write at the end of the log - nothing after it can be trusted
+            return
+
+        yield record_type, payload
+        offset += _HEADER.size + length
+
+
+def _valid_length(path: str) -> int:
+    # how many bytes of the log are whole records
+    length = 0
+    for _, payload in _read_records(path):
+        length += _HEADER.size + len(payload)
+    return length
+
+
+class QuoteLog:
+    _path: str
+    _fsync: bool
+
+    def __init__(self, path: str, fsync: bool = False):
+        self._path = path
+        self._fsync = fsync
+
+        # chop off any torn record so new ones follow on from a good one
+        if os.path.exists(path):
+            self._file = open(path, "r+b")
+            self._file.truncate(_valid_length(path))
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, "wb")
+
+        # records held back by an open transaction, see hold
+        self._pending = None
+        self._holder = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def size(self) -> int:
+        return self._file.tell()
+
+    def _write(self, record_type: int, payload: bytes):
+        record = _pack_record(record_type, payload)
+        if self._pending != None and self._holder == threading.get_ident():
+            self._pending.append(record)
+            return
+
+        with self._lock:
+            self._file.write(record)
+
+            # always get it out of this process, so a worker dying doesn't lose it.  fsync as well
+            # to survive the machine going down
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+
+    def hold(self):
+        # keep this thread's records in memory from now on, until release or discard.  Other
+        # threads' records still go straight out
+        self._holder = threading.get_ident()
+        self._pending = []
+
+    @property
+    def pending_length(self) -> int:
+        return len(self._pending)
+
+    def discard(self, pending_length: int = 0):
+        # forget held records back to pending_length, eg a rolled back nested transaction
+        del self._pending[pending_length:]
+
+    def release(self):
+        # write everything held as one transaction record and go back to writing straight away
+        pending, self._pending = self._pending, None
+        self._holder = None
+        if len(pending) > 0:
+            self._write(CONST_LOG_TRANSACTION, b"".join(pending))
+
+    def log_sector(self, sector: Sector):
+        self._write(
+            CONST_LOG_SECTOR,
+            _pack_string(sector.sector_code) + _pack_string(sector.sector_name),
+        )
+
+    def log_company(self, sector_code: str, company: Company):
+        self._write(
+            CONST_LOG_COMPANY,
+            _pack_string(sector_code)
+            + _pack_string(company.company_code)
+            + _pack_string(company.company_name),
+        )
+
+    def log_store(self, store, batch: tuple, previous: tuple = None):
+        # QuoteStore listener - batch is the columns of the rows that just went in, or the new
+        # values of rows that were replaced if previous is set
+        if store._quote_class is SectorQuote:
+            record_type = CONST_LOG_SECTOR_QUOTES
+            if previous != None:
+                record_type = CONST_LOG_SECTOR_REPLACED
+        else:
+            record_type = CONST_LOG_COMPANY_QUOTES
+            if previous != None:
+                record_type = CONST_LOG_COMPANY_REPLACED
+
+        payload = [_pack_string(store._parent.code), struct.pack("<I", len(batch[0]))]
+        for column, column_type in zip(batch, _QUOTE_COLUMN_TYPES):
+            payload.append(np.ascontiguousarray(column, dtype=column_type).tobytes())
+
+        self._write(record_type, b"".join(payload))
+
+    def restart(self):
+        # empty the log once everything in it is safely in a snapshot
+        with self._lock:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _current_snapshot(path: str) -> str:
+    current_path = os.path.join(path, CONST_LOG_CURRENT)
+    if not os.path.exists(current_path):
+        return None
+
+    with open(current_path) as file:
+        return file.read().strip()
+
+
+def write_snapshot(collection, path: str):
+    # save a fresh snapshot, point CURRENT at it, then empty the log.  Until CURRENT is swapped
+    # the old snapshot plus the log is still the complete picture
+    previous = _current_snapshot(path)
+    generation = 1
+    if previous != None:
+        generation = int(previous[len(CONST_LOG_SNAPSHOT) :]) + 1
+
+    snapshot = f"{CONST_LOG_SNAPSHOT}{generation}"
+    save_collection(collection, os.path.join(path, snapshot))
+
+    current_path = os.path.join(path, CONST_LOG_CURRENT)
+    with open(current_path + ".tmp", "w") as file:
+        file.write(snapshot)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(current_path + ".tmp", current_path)
+
+    if collection._log != None:
+        collection._log.restart()
+
+    if previous != None:
+        shutil.rmtree(os.path.join(path, previous), ignore_errors=True)
+
+
+def replay_log(collection, path: str) -> int:
+    # apply every record in the log to collection, skipping anything it already has
+    # returns how many records were read
+    records = 0
+    for record in read_log(path):
+        records += 1
+        record_type, code = record[0], record[1]
+
+        if record_type == CONST_LOG_SECTOR:
+            if code not in collection._sectors:
+                collection.add_sector(Sector(sector_name=record[2], sector_code=code))
+
+        elif record_type == CONST_LOG_COMPANY:
+            sector = collection._sectors[code]
+            company_code = record[2]
+            if company_code not in sector._companies:
+                # the same company can be registered in more than one sector
+                company = collection._companies.get(company_code)
+                if company == None:
+                    company = Company(company_name=record[3], company_code=company_code)
+                sector.add_company(company)
+
+        else:
+            date, open, high, low, close, volume = record[2]
+            if record_type in (CONST_LOG_SECTOR_QUOTES, CONST_LOG_SECTOR_REPLACED):
+                add_quotes = collection._sectors[code].add_sector_quotes
+            else:
+                add_quotes = collection._companies[code].add_quotes
+
+            on_duplicate = "skip"
+            if record_type in (CONST_LOG_COMPANY_REPLACED, CONST_LOG_SECTOR_REPLACED):
+                on_duplicate = "overwrite"
+
+            add_quotes(
+                date=date,
+                open=open,
+                high=high,
+                low=low,
+                close=close,
+                volume=volume,
+                on_duplicate=on_duplicate,
+            )
+
+    return records
+
+
+def recover_collection(collection_class, path: str, mmap: bool = True):
+    snapshot = _current_snapshot(path)
+    if snapshot == None:
+        raise ValueError(f"No write-ahead log found in {path}")
+
+    collection = open_collection(
+        collection_class, os.path.join(path, snapshot), mmap=mmap
+    )
+    replay_log(collection, os.path.join(path, CONST_LOG_FILE))
+    return collection
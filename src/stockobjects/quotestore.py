@@ -0,0 +1,628 @@
+from collections.abc import Mapping
+import threading
+import numpy as np
+
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+from stockobjects.parsing import parse_quote_date, parse_quote_dates
+from stockobjects.rwlock import RWLock
+
+# columnar storage for a Company or Sector's quotes
+# each field lives in its own contiguous numpy array, kept sorted by date, so a quote costs
+# 48 bytes instead of a python object plus a dict entry.  Quote objects are only built when
+# somebody actually asks for one
+# it still behaves like the old Dict[datetime, Quote] so existing callers keep working
+# safe to query from many threads while quotes are going in: lookups and ranges share a read lock,
+# anything that changes the columns takes it exclusively.  The dates/open/.../volume properties
+# are views straight into the columns though - take _lock.read() around them, or use columns()
+# for a copy, if quotes might be going in at the same time
+
+# what to do with a quote for a date that's already here:
+#   raise     - QuoteAlreadyExists
+#   skip      - keep the quote that's already here
+#   overwrite - replace it with the new one
+#   merge     - fold the new one into it: keep the open, widen the high/low, take the new close and
+#               the bigger volume.  Built for bars that get re-sent as they fill in
+# skip, overwrite and merge are counted rather than raised, see duplicate_counts
+CONST_DUPLICATE_POLICIES = ("raise", "skip", "overwrite", "merge")
+CONST_STORE_COLUMNS = ("dates", "open", "high", "low", "close", "volume")
+CONST_DUPLICATE_COUNTERS = {
+    "skip": "skipped",
+    "overwrite": "overwritten",
+    "merge": "merged",
+}
+
+
+def check_duplicate_policy(on_duplicate: str):
+    if on_duplicate not in CONST_DUPLICATE_POLICIES:
+        raise ValueError(
+            f"on_duplicate must be one of {CONST_DUPLICATE_POLICIES}, instead of {on_duplicate}"
+        )
+
+
+class QuoteStore(Mapping):
+    _dates: np.ndarray
+    _open: np.ndarray
+    _high: np.ndarray
+    _low: np.ndarray
+    _close: np.ndarray
+    _volume: np.ndarray
+    _length: int
+
+    def __init__(self, parent, quote_class, capacity: int = 16):
+        self._parent = parent
+        self._quote_class = quote_class
+        self._length = 0
+        # callables told about every row that gets inserted or replaced, see listen
+        self._listeners = None
+        # duplicates handled without raising, by what happened to them
+        self._duplicates = {"skipped": 0, "overwritten": 0, "merged": 0}
+        # first position whose values were replaced in place by the last add/extend, or None -
+        # lets the owner recompute anything that depends on the old values from there on
+        self._rewritten_from = None
+        # while a transaction is watching this store, the undo journal every change is appended
+        # to as (store, dates, previous) - previous is None for inserted rows, or the replaced
+        # row(s) as they were.  Only changes made by the thread running the transaction are
+        # journalled.  See transaction.py
+        self._journal = None
+        self._journal_thread = None
+        # Company and Sector hold this for writing across an add and everything it sets off
+        self._lock = RWLock()
+
+        self._dates = np.empty(capacity, dtype="datetime64[us]")
+        self._open = np.empty(capacity, dtype=np.float64)
+        self._high = np.empty(capacity, dtype=np.float64)
+        self._low = np.empty(capacity, dtype=np.float64)
+        self._close = np.empty(capacity, dtype=np.float64)
+        self._volume = np.empty(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_columns(
+        cls, parent, quote_class, dates, open, high, low, close, volume
+    ) -> "QuoteStore":
+        # wrap columns that are already sorted and duplicate free - eg memory mapped from a save -
+        # without copying them.  They're full, so the first quote added copies them into memory
+        store = cls(parent=parent, quote_class=quote_class)
+        if len(dates) == 0:
+            return store
+
+        store._dates = dates
+        store._open = open
+        store._high = high
+        store._low = low
+        store._close = close
+        store._volume = volume
+        store._length = len(dates)
+        return store
+
+    def listen(self, listener):
+        # listener(store, (dates, open, high, low, close, volume), previous) is called after every
+        # add or extend with just the rows that actually changed, as columns.  previous is None for
+        # rows that were inserted, or the columns as they were for rows that were overwritten or
+        # merged.  Used for journalling
+        # the list is replaced rather than changed, so a write notifying from another thread
+        # never sees it change under it
+        if self._listeners == None:
+            self._listeners = []
+        if listener not in self._listeners:
+            self._listeners = self._listeners + [listener]
+
+    def unlisten(self, listener):
+        if self._listeners != None and listener in self._listeners:
+            self._listeners = [other for other in self._listeners if other != listener]
+
+    def _journalling(self) -> bool:
+        return self._journal != None and self._journal_thread == threading.get_ident()
+
+    def _notify(self, batch: tuple, previous: tuple = None):
+        for listener in self._listeners:
+            listener(self, batch, previous)
+
+    @property
+    def duplicate_counts(self) -> dict:
+        return dict(self._duplicates)
+
+    def _columns(self):
+        return (
+            self._dates,
+            self._open,
+            self._high,
+            self._low,
+            self._close,
+            self._volume,
+        )
+
+    def _grow(self, needed: int):
+        capacity = len(self._dates)
+        if needed <= capacity:
+            return
+
+        # double so that appends stay amortised O(1)
+        while capacity < needed:
+            capacity *= 2
+
+        self._dates, self._open, self._high, self._low, self._close, self._volume = (
+            np.concatenate((column, np.empty(capacity - len(column), column.dtype)))
+            for column in self._columns()
+        )
+
+    def _find(self, date) -> int:
+        key = parse_quote_date(date)
+        position = int(np.searchsorted(self._dates[: self._length], key, "left"))
+        if position < self._length and self._dates[position] == key:
+            return position
+        return -1
+
+    def add(
+        self,
+        date,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: int,
+        on_duplicate: str = "skip",
+    ) -> bool:
+        # returns True if it went in as a new quote.  If there's already a quote for this date,
+        # on_duplicate says what happens to it and this returns False
+        check_duplicate_policy(on_duplicate)
+        key = parse_quote_date(date)
+        with self._lock.write():
+            length = self._length
+            self._rewritten_from = None
+
+            # quotes almost always arrive in date order, so check the end first
+            if length == 0 or self._dates[length - 1] < key:
+                position = length
+            else:
+                position = int(np.searchsorted(self._dates[:length], key, "left"))
+                if position < length and self._dates[position] == key:
+                    # already have a quote for this date
+                    if on_duplicate == "raise":
+                        raise QuoteAlreadyExists(code=self._parent.code, date=date)
+
+                    if on_duplicate == "skip":
+                        self._duplicates["skipped"] += 1
+                    else:
+                        self._replace_one(
+                            position,
+                            (key, open, high, low, close, volume),
+                            on_duplicate,
+                        )
+                    return False
+
+            row = (key, open, high, low, close, volume)
+            self._grow(length + 1)
+
+            for column, value in zip(self._columns(), row):
+                if position < length:
+                    # shuffle everything after the insertion point along by one
+                    column[position + 1 : length + 1] = column[position:length]
+                column[position] = value
+
+            self._length = length + 1
+
+            if self._journalling():
+                self._journal.append((self, key, None))
+            if self._listeners != None:
+                self._notify(
+                    (
+                        np.array([key]),
+                        np.array([open], dtype=np.float64),
+                        np.array([high], dtype=np.float64),
+                        np.array([low], dtype=np.float64),
+                        np.array([close], dtype=np.float64),
+                        np.array([volume], dtype=np.int64),
+                    )
+                )
+            return True
+
+    def extend(
+        self,
+        date,
+        open,
+        high,
+        low,
+        close,
+        volume,
+        on_duplicate: str = "raise",
+    ) -> int:
+        # bulk insert whole columns at once.  Duplicates are found for the whole batch up front:
+        # on_duplicate="raise" raises QuoteAlreadyExists before anything is inserted, the other
+        # policies are applied to every duplicate at once.  Inside the batch, skip keeps the
+        # first row for a date, overwrite the last one and merge folds them together in order
+        # returns how many quotes were inserted - duplicates aren't counted in that
+        check_duplicate_policy(on_duplicate)
+
+        try:
+            batch = (
+                parse_quote_dates(date),
+                np.asarray(open, dtype=np.float64),
+                np.asarray(high, dtype=np.float64),
+                np.asarray(low, dtype=np.float64),
+                np.asarray(close, dtype=np.float64),
+                np.asarray(volume, dtype=np.int64),
+            )
+        except ValueError as e:
+            raise TypeError(f"Unable to convert quote columns: {e}")
+
+        if len({len(column) for column in batch}) != 1:
+            raise ValueError("All quote columns must be the same length")
+
+        # sort the batch so duplicates inside it sit next to each other
+        order = np.argsort(batch[0], kind="stable")
+        batch = tuple(column[order] for column in batch)
+        dates = batch[0]
+
+        with self._lock.write():
+            self._rewritten_from = None
+
+            # boil duplicates inside the batch down to one row per date
+            first = np.ones(len(dates), dtype=bool)
+            first[1:] = dates[1:] != dates[:-1]
+            if not first.all():
+                if on_duplicate == "raise":
+                    raise QuoteAlreadyExists(
+                        code=self._parent.code, date=dates[~first][0].item()
+                    )
+
+                batch = self._collapse(batch, np.flatnonzero(first), on_duplicate)
+                self._duplicates[CONST_DUPLICATE_COUNTERS[on_duplicate]] += len(
+                    dates
+                ) - len(batch[0])
+                dates = batch[0]
+
+            # and then check the batch against what we've already got
+            existing = self.dates
+            positions = np.searchsorted(existing, dates, "left")
+            in_range = positions < len(existing)
+            duplicated = np.zeros(len(dates), dtype=bool)
+            duplicated[in_range] = existing[positions[in_range]] == dates[in_range]
+
+            if duplicated.any():
+                if on_duplicate == "raise":
+                    raise QuoteAlreadyExists(
+                        code=self._parent.code, date=dates[duplicated][0].item()
+                    )
+
+                if on_duplicate == "skip":
+                    self._duplicates["skipped"] += int(duplicated.sum())
+                else:
+                    self._replace(
+                        positions[duplicated],
+                        tuple(column[duplicated] for column in batch),
+                        on_duplicate,
+                    )
+
+                batch = tuple(column[~duplicated] for column in batch)
+                dates = batch[0]
+
+            count = len(dates)
+            if count == 0:
+                return 0
+
+            length = self._length
+            self._grow(length + count)
+
+            if length == 0 or dates[0] > self._dates[length - 1]:
+                # whole batch is newer than everything we have - just tack it on the end
+                for column, values in zip(self._columns(), batch):
+                    column[length : length + count] = values
+            else:
+                merged_order = np.argsort(
+                    np.concatenate((self._dates[:length], dates)), kind="stable"
+                )
+                for column, values in zip(self._columns(), batch):
+                    column[: length + count] = np.concatenate(
+                        (column[:length], values)
+                    )[merged_order]
+
+            self._length = length + count
+
+            if self._journalling():
+                self._journal.append((self, dates, None))
+            if self._listeners != None:
+                self._notify(batch)
+            return count
+
+    def _collapse(self, batch: tuple, starts: np.ndarray, on_duplicate: str) -> tuple:
+        # one row per run of equal dates in a sorted batch, starts being where each run begins
+        ends = np.concatenate((starts[1:], [len(batch[0])])) - 1
+        if on_duplicate == "skip":
+            return tuple(column[starts] for column in batch)
+        if on_duplicate == "overwrite":
+            return tuple(column[ends] for column in batch)
+
+        dates, open, high, low, close, volume = batch
+        return (
+            dates[starts],
+            open[starts],
+            np.maximum.reduceat(high, starts),
+            np.minimum.reduceat(low, starts),
+            close[ends],
+            np.maximum.reduceat(volume, starts),
+        )
+
+    def _replace(self, positions: np.ndarray, incoming: tuple, on_duplicate: str):
+        # overwrite or merge incoming rows into the quotes already at positions (sorted)
+        self._writable()
+        previous = tuple(column[positions] for column in self._columns())
+
+        if on_duplicate == "merge":
+            incoming = (
+                incoming[0],
+                previous[1],
+                np.maximum(previous[2], incoming[2]),
+                np.minimum(previous[3], incoming[3]),
+                incoming[4],
+                np.maximum(previous[5], incoming[5]),
+            )
+
+        for column, values in zip(self._columns()[1:], incoming[1:]):
+            column[positions] = values
+
+        self._duplicates[CONST_DUPLICATE_COUNTERS[on_duplicate]] += len(positions)
+        self._rewritten_from = int(positions[0])
+
+        if self._journalling():
+            self._journal.append((self, previous[0], previous))
+
+        if self._listeners != None:
+            self._notify(incoming, previous=previous)
+
+    def _replace_one(self, position: int, row: tuple, on_duplicate: str):
+        # _replace for a single row, in plain scalars - numpy fancy indexing costs more than the
+        # write itself at this size
+        self._writable()
+        columns = self._columns()
+        previous = tuple(column[position] for column in columns)
+
+        if on_duplicate == "merge":
+            row = (
+                row[0],
+                previous[1],
+                max(previous[2], row[2]),
+                min(previous[3], row[3]),
+                row[4],
+                max(previous[5], row[5]),
+            )
+
+        for column, value in zip(columns[1:], row[1:]):
+            column[position] = value
+
+        self._duplicates[CONST_DUPLICATE_COUNTERS[on_duplicate]] += 1
+        self._rewritten_from = position
+
+        if self._journalling():
+            self._journal.append((self, previous[0], previous))
+
+        if self._listeners != None:
+            self._notify(
+                tuple(column[position : position + 1] for column in columns),
+                previous=tuple(
+                    np.array([value], dtype=column.dtype)
+                    for value, column in zip(previous, columns)
+                ),
+            )
+
+    def _restore(self, previous: tuple) -> int:
+        # undo a _replace - put rows back the way they were.  Returns the first position restored
+        self._writable()
+        positions = np.searchsorted(self.dates, previous[0])
+        for column, values in zip(self._columns()[1:], previous[1:]):
+            column[positions] = values
+
+        return int(np.min(positions))
+
+    def _remove(self, dates) -> int:
+        # take rows back out by date, eg undoing inserts.  Every date has to be here
+        # returns the first position removed
+        length = self._length
+        positions = np.searchsorted(self.dates, dates)
+        keep = np.ones(length, dtype=bool)
+        keep[positions] = False
+
+        self._writable()
+        for column in self._columns():
+            kept = column[:length][keep]
+            column[: len(kept)] = kept
+
+        self._length = int(keep.sum())
+        return int(np.min(positions))
+
+    def _writable(self):
+        # columns handed to from_columns can be read only (eg straight out of Arrow) - take a
+        # copy before changing anything in place
+        if not all(column.flags.writeable for column in self._columns()):
+            (
+                self._dates,
+                self._open,
+                self._high,
+                self._low,
+                self._close,
+                self._volume,
+            ) = (np.array(column) for column in self._columns())
+
+    def extend_rows(self, rows, on_duplicate: str = "raise") -> int:
+        # same as extend, but for an iterable of (date, open, high, low, close, volume) rows
+        # or dicts with those keys
+        rows = [
+            (
+                (
+                    row["date"],
+                    row["open"],
+                    row["high"],
+                    row["low"],
+                    row["close"],
+                    row["volume"],
+                )
+                if isinstance(row, dict)
+                else row
+            )
+            for row in rows
+        ]
+        if len(rows) == 0:
+            return 0
+
+        date, open, high, low, close, volume = zip(*rows)
+        return self.extend(
+            date=date,
+            open=open,
+            high=high,
+            low=low,
+            close=close,
+            volume=volume,
+            on_duplicate=on_duplicate,
+        )
+
+    def set_position(
+        self,
+        position: int,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: int,
+    ):
+        # overwrite the values of an existing quote, its date stays where it is
+        with self._lock.write():
+            if position < 0 or position >= self._length:
+                raise IndexError(f"position {position} is out of range")
+
+            self._open[position] = open
+            self._high[position] = high
+            self._low[position] = low
+            self._close[position] = close
+            self._volume[position] = volume
+
+    def index_range(self, date_from, date_to) -> tuple:
+        # bisect the sorted date column for the positions covering date_from..date_to inclusive
+        # dates are compared by day, the same way DateParser trims the time off
+        # positions can move as soon as the lock is let go - get_range and iter_range look up
+        # and read under the one lock
+        with self._lock.read():
+            return self._index_range(date_from=date_from, date_to=date_to)
+
+    def _index_range(self, date_from, date_to) -> tuple:
+        # index_range for callers already holding the lock (or forked off with a copy of it all)
+        dates = self._dates[: self._length]
+        day_from = np.datetime64(date_from, "D")
+        day_after = np.datetime64(date_to, "D") + np.timedelta64(1, "D")
+
+        start = int(np.searchsorted(dates, day_from.astype("datetime64[us]"), "left"))
+        end = int(np.searchsorted(dates, day_after.astype("datetime64[us]"), "left"))
+        return start, end
+
+    def get_range(self, date_from, date_to) -> dict:
+        with self._lock.read():
+            start, end = self._index_range(date_from=date_from, date_to=date_to)
+            return self.get_positions(start=start, end=end)
+
+    def iter_range(self, date_from, date_to):
+        # generator version of get_range.  The range is copied out straight away, so quotes
+        # going in while it's being walked don't shift it about
+        with self._lock.read():
+            start, end = self._index_range(date_from=date_from, date_to=date_to)
+            columns = self._columns_between(start, end)
+
+        return self._iter_columns(columns)
+
+    def iter_positions(self, start: int, end: int):
+        # yields (date, quote) for each position in turn, building each quote as it goes
+        return self._iter_columns(self._columns_between(start, end))
+
+    def _iter_columns(self, columns: tuple):
+        for position in range(len(columns[0])):
+            yield columns[0][position].item(), self._materialise(position, columns)
+
+    def get_positions(self, start: int, end: int) -> dict:
+        with self._lock.read():
+            return {
+                self._dates[position].item(): self._materialise(position)
+                for position in range(start, end)
+            }
+
+    def _columns_between(self, start: int, end: int) -> tuple:
+        # copies of the six columns from start to end, read together
+        with self._lock.read():
+            end = min(end, self._length)
+            return tuple(column[start:end].copy() for column in self._columns())
+
+    def columns(self, *fields) -> tuple:
+        # copies of the named columns ("dates", "open", ... "volume"), or all six if none are
+        # named, read together - safe to hold on to while quotes keep going in
+        if len(fields) == 0:
+            fields = CONST_STORE_COLUMNS
+
+        with self._lock.read():
+            return tuple(getattr(self, field).copy() for field in fields)
+
+    def _materialise(self, position: int, columns: tuple = None):
+        # columns defaults to this store's own
+        if columns == None:
+            columns = self._columns()
+
+        dates, open, high, low, close, volume = columns
+        return self._quote_class(
+            self._parent,
+            date=dates[position].item(),
+            open=float(open[position]),
+            high=float(high[position]),
+            low=float(low[position]),
+            close=float(close[position]),
+            volume=int(volume[position]),
+        )
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[: self._length]
+
+    @property
+    def open(self) -> np.ndarray:
+        return self._open[: self._length]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self._high[: self._length]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self._low[: self._length]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self._close[: self._length]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self._volume[: self._length]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        return (date.item() for date in self.columns("dates")[0])
+
+    def __contains__(self, date) -> bool:
+        try:
+            with self._lock.read():
+                return self._find(date) >= 0
+        except TypeError:
+            return False
+
+    def __getitem__(self, date):
+        with self._lock.read():
+            try:
+                position = self._find(date)
+            except TypeError:
+                raise KeyError(date)
+
+            if position < 0:
+                raise KeyError(date)
+
+            return self._materialise(position)
+
+    def items(self):
+        return self._iter_columns(self.columns())
+
+    def values(self):
+        return (quote for _, quote in self.items())
@@ -0,0 +1,58 @@
+import numpy as np
+
+from stockobjects.quotestore import QuoteStore
+
+# 1970-01-01 was a Thursday, shifting by 3 days makes weeks run Monday to Sunday
+CONST_EPOCH_WEEKDAY = 3
+CONST_RESAMPLE_FREQS = ("W", "M", "Y")
+
+
+def period_starts(dates: np.ndarray, freq: str) -> np.ndarray:
+    # the first day of the week/month/year each date falls in
+    days = dates.astype("datetime64[D]")
+    if freq == "W":
+        weeks = (days.astype(np.int64) + CONST_EPOCH_WEEKDAY) // 7
+        return (weeks * 7 - CONST_EPOCH_WEEKDAY).astype("datetime64[D]")
+    if freq == "M":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if freq == "Y":
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+
+    raise ValueError(
+        f"freq must be one of {CONST_RESAMPLE_FREQS}, instead found {freq}"
+    )
+
+
+def resample_store(store: QuoteStore, freq: str) -> QuoteStore:
+    # roll daily bars up into weekly/monthly/yearly bars:
+    # open is the first open, high the highest high, low the lowest low, close the last close
+    # and volume the total.  Each bar is dated with the first day of its period
+    # the store is already sorted by date, so every period is one contiguous run of rows and
+    # the whole thing is a handful of numpy reduceat calls
+    with store._lock.read():
+        return _resample_columns(store, freq)
+
+
+def _resample_columns(store: QuoteStore, freq: str) -> QuoteStore:
+    periods = period_starts(store.dates, freq)
+    resampled = QuoteStore(
+        parent=store._parent,
+        quote_class=store._quote_class,
+        capacity=max(len(periods), 1),
+    )
+
+    if len(periods) == 0:
+        return resampled
+
+    starts = np.concatenate(([0], np.flatnonzero(periods[1:] != periods[:-1]) + 1))
+    ends = np.concatenate((starts[1:], [len(periods)])) - 1
+
+    resampled.extend(
+        date=periods[starts],
+        open=store.open[starts],
+        high=np.maximum.reduceat(store.high, starts),
+        low=np.minimum.reduceat(store.low, starts),
+        close=store.close[ends],
+        volume=np.add.reduceat(store.volume, starts),
+    )
+    return resampled
@@ -0,0 +1,142 @@
+from contextlib import contextmanager, ExitStack
+import threading
+from threading import get_ident
+
+
+# many readers at once, or one writer
+# writers go first - once one is waiting, new readers queue up behind it, so a steady stream of
+# queries can't starve ingestion.  Reentrant: a thread can take it again in the mode it already
+# holds, and a writer can read as well.  A reader can't upgrade to writing (two readers trying
+# that together would wait on each other forever), so that raises instead
+# use as `with lock.read():` / `with lock.write():`
+class RWLock:
+    def __init__(self):
+        self._mutex = threading.Lock()
+        # there's one of these on every quote store, and most never get waited on - so the
+        # condition is only made the first time somebody has to
+        self._condition = None
+        # read depth by thread id
+        self._readers = {}
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        # threads asleep in _condition - letting go only bothers waking anyone if there are some
+        self._waiting = 0
+        self._read_lock = _ReadLock(self)
+        self._write_lock = _WriteLock(self)
+
+    def read(self) -> "_ReadLock":
+        return self._read_lock
+
+    def write(self) -> "_WriteLock":
+        return self._write_lock
+
+    def _wait(self):
+        # with the mutex held
+        if self._condition == None:
+            self._condition = threading.Condition(self._mutex)
+
+        self._waiting += 1
+        try:
+            self._condition.wait()
+        finally:
+            self._waiting -= 1
+
+
+# the two ways into an RWLock.  These are on every quote written and read, so the work is done
+# right in __enter__/__exit__ rather than handed off again
+# a writer keeps hold of the mutex until it lets go of the lock, so writing costs one acquire and
+# release, and readers turning up meanwhile just block on the mutex.  It only gets let go early
+# to wait for readers already inside to finish
+# taking it again when this thread already holds it skips the mutex - nothing but this thread can
+# change whether it holds it, and the GIL keeps the dict and depth updates whole
+class _ReadLock:
+    def __init__(self, lock: RWLock):
+        self._lock = lock
+
+    def __enter__(self):
+        lock = self._lock
+        me = get_ident()
+        if lock._writer == me:
+            # reading inside our own write - just another level of it, as the writer holds the
+            # mutex until the outermost level lets go
+            lock._write_depth += 1
+            return
+
+        if me in lock._readers:
+            lock._readers[me] += 1
+            return
+
+        with lock._mutex:
+            while lock._writers_waiting > 0:
+                lock._wait()
+            lock._readers[me] = 1
+
+    def __exit__(self, *exc_info):
+        lock = self._lock
+        me = get_ident()
+        if lock._writer == me:
+            lock._write_depth -= 1
+            return
+
+        depth = lock._readers[me]
+        if depth > 1:
+            lock._readers[me] = depth - 1
+            return
+
+        with lock._mutex:
+            del lock._readers[me]
+            if len(lock._readers) == 0 and lock._waiting > 0:
+                lock._condition.notify_all()
+
+
+class _WriteLock:
+    def __init__(self, lock: RWLock):
+        self._lock = lock
+
+    def __enter__(self):
+        lock = self._lock
+        me = get_ident()
+        if lock._writer == me:
+            lock._write_depth += 1
+            return
+
+        if me in lock._readers:
+            raise RuntimeError("Can't take a write lock while holding a read lock")
+
+        lock._mutex.acquire()
+        if len(lock._readers) > 0:
+            lock._writers_waiting += 1
+            try:
+                while len(lock._readers) > 0:
+                    lock._wait()
+            except BaseException:
+                lock._writers_waiting -= 1
+                lock._mutex.release()
+                raise
+            lock._writers_waiting -= 1
+
+        lock._writer = me
+        lock._write_depth = 1
+
+    def __exit__(self, *exc_info):
+        lock = self._lock
+        if lock._write_depth > 1:
+            lock._write_depth -= 1
+            return
+
+        lock._write_depth = 0
+        lock._writer = None
+        if lock._waiting > 0:
+            lock._condition.notify_all()
+        lock._mutex.release()
+
+
+@contextmanager
+def read_all(locks):
+    # read locks on a whole set of things at once.  Always taken in the same order, so two threads
+    # doing this can't each end up holding what the other is waiting for
+    with ExitStack() as stack:
+        for lock in sorted(set(locks), key=id):
+            stack.enter_context(lock.read())
+        yield
@@ -1,5 +1,7 @@
 from datetime import datetime
 from typing import Dict, List
+from contextlib import nullcontext
+import numpy as np
 
 # from quotecollection import QuoteCollection
 from stockobjects.stockobjectsexceptions import (
@@ -11,6 +13,20 @@ from stockobjects.sectorquote import SectorQuote
 from stockobjects.companyquote import CompanyQuote
 from stockobjects.company import Company
 from stockobjects.parsing import DateParser
+from stockobjects.quotestore import QuoteStore
+from stockobjects.resample import resample_store
+from stockobjects.querycache import QueryCache, company_query_key, copy_quote_result
+from stockobjects.snapshot import CONST_QUOTE_FIELDS, build_snapshot
+from stockobjects.panel import Panel, build_panel
+from stockobjects.correlation import Correlation, correlate
+from stockobjects.sectorindex import SectorIndex
+from stockobjects.rwlock import RWLock
+from stockobjects.arrowio import (
+    to_arrow_table,
+    from_arrow_table,
+    write_arrow_file,
+    read_arrow_file,
+)
 
 
 # DONE
@@ -31,15 +47,41 @@ from stockobjects.parsing import DateParser
 class Sector:
     _sector_name: str
     _sector_code: str
-    # _quotes: QuoteCollection
-    _quotes: Dict[datetime, SectorQuote]
+    # behaves like Dict[datetime, SectorQuote] but stores the quotes as columns
+    _quotes: QuoteStore
     _companies: Dict[str, Company]
 
-    def __init__(self, sector_name: str, sector_code: str):
+    def __init__(self, sector_name: str, sector_code: str, cache_size: int = 0):
         self._sector_name = sector_name
         self._sector_code = sector_code
-        self._quotes = {}
+        self._quotes = QuoteStore(parent=self, quote_class=SectorQuote)
+        # resampled bars by freq, thrown away whenever sector quotes are added
+        self._resampled = {}
         self._companies = {}
+        # kept up to date as quotes arrive so company_quote_length doesn't walk every company
+        self._company_quote_length = 0
+        # set by SectorCollection.add_sector so new companies land in its company index
+        self._collection = None
+
+        # optional LRU cache of get_sector_quote/get_company_quote results
+        self._cache = None
+        if cache_size > 0:
+            self._cache = QueryCache(maxsize=cache_size)
+
+        # full history panels by field, thrown away whenever a company changes
+        self._panels = {}
+        # correlations by (date_from, date_to), thrown away along with the panels
+        self._correlations = {}
+
+        # index series built from the companies, built on first use then kept up to date
+        self._index = None
+
+        # guards _companies, the counters and everything cached above.  Only ever held briefly -
+        # queries take a copy of the companies under it and read their quotes after letting go,
+        # and the quote locks are never taken while holding it.  _generation goes up with every
+        # change, so a result built without the lock is only cached if nothing moved meanwhile
+        self._lock = RWLock()
+        self._generation = 0
 
     @property
     def sector_code(self) -> str:
@@ -58,17 +100,121 @@ class Sector:
         return self._sector_name
 
     def add_company(self, new_company: Company):
-        if new_company in self._companies.keys():
-            raise CompanyAlreadyExists(company_code=new_company.company_code)
+        # the company's quotes are held still while it joins, so a quote going in at the same
+        # time is counted either here or by _company_changed, never both
+        with self._write_gate(), new_company._quotes._lock.read():
+            with self._lock.write():
+                if new_company.company_code in self._companies:
+                    raise CompanyAlreadyExists(company_code=new_company.company_code)
+
+                # hold on to it in this sector's companies dict
+                self._companies[new_company.company_code] = new_company
+                previous_sector = new_company._sector_object
+
+                # but also tell the company about the sector it belongs to
+                new_company.sector_object = self
+                self._company_quote_length += new_company.length
+                self._companies_changed()
 
-        # hold on to it in this sector's companies dict
-        self._companies[new_company.company_code] = new_company
+                if self._cache != None:
+                    self._cache.invalidate("company", new_company.company_code)
 
-        # but also tell the company about the sector it belongs to
-        new_company.sector_object = self
+                collection = self._collection
+
+            # and if this sector is part of a collection, tell the collection about the company too
+            if collection != None:
+                collection._company_added(new_company, previous_sector)
 
         return True
 
+    def _write_gate(self):
+        # same as Company._write_gate
+        if self._collection != None:
+            return self._collection._write_gate.read()
+
+        return nullcontext()
+
+    def _companies_changed(self):
+        # with the lock held for writing - throw away everything built from the companies
+        self._generation += 1
+        self._panels.clear()
+        self._correlations.clear()
+        self._index = None
+
+    def _remove_company(self, company: Company, previous_sector):
+        # undoes add_company, when a transaction is rolled back
+        with self._lock.write():
+            del self._companies[company.company_code]
+            if previous_sector != None:
+                company.sector_object = previous_sector
+            else:
+                company._sector_object = None
+                company._sector_name = None
+                company._sector_code = None
+
+            self._company_quote_length -= company.length
+            self._companies_changed()
+
+            if self._cache != None:
+                self._cache.invalidate("company", company.company_code)
+
+            collection = self._collection
+
+        if collection != None:
+            collection._company_removed(company)
+
+    def _company_changed(
+        self, company: Company, quotes_added: int = 0, new_quote: tuple = None
+    ):
+        # a company in this sector got new quotes - keep count and drop any cached results it's in
+        # companies can point at a sector they were never added to, those don't count
+        # called with the company's quotes locked for writing
+        with self._lock.write():
+            if self._companies.get(company.company_code) is not company:
+                return
+
+            self._generation += 1
+            self._company_quote_length += quotes_added
+            self._panels.clear()
+            self._correlations.clear()
+
+            # a single new quote just gets added to the index totals, anything else means rebuild
+            if self._index != None:
+                if new_quote != None:
+                    self._index.add_quote(*new_quote)
+                else:
+                    self._index = None
+
+            if self._cache != None:
+                self._cache.invalidate("company", company.company_code)
+
+            collection = self._collection
+
+        # the collection is told after letting go - nothing takes its lock while holding this one
+        if collection != None:
+            collection._company_changed(company.company_code, quotes_added=quotes_added)
+
+    def _sector_changed(self, quotes_added: int = 0):
+        # called with the sector's quotes locked for writing
+        self._resampled.clear()
+
+        with self._lock.write():
+            self._generation += 1
+            if self._cache != None:
+                self._cache.invalidate("sector", self._sector_code)
+
+            collection = self._collection
+
+        if collection != None:
+            collection._sector_changed(self._sector_code, quotes_added=quotes_added)
+
+    @property
+    def cache_stats(self) -> dict:
+        if self._cache == None:
+            return None
+
+        return self._cache.stats
+
     def add_sector_quote(
         self,
         date: datetime,
@@ -77,37 +223,176 @@ class Sector:
         low: float,
         close: float,
         volume: int,
+        on_duplicate: str = None,
     ) -> bool:
-        # try to turn the incoming parameters into a CompanyQuote
-        try:
-            new_quote = SectorQuote(
-                self,
+        # write straight into the quote store - no need to build a SectorQuote just to throw it away
+        # on_duplicate works like Company.add_quote
+        with self._write_gate(), self._quotes._lock.write():
+            if not self._quotes.add(
                 date=date,
                 open=open,
                 high=high,
                 low=low,
                 close=close,
                 volume=volume,
-            )
-        except Exception as e:
-            raise
+                on_duplicate=self._prepare_write(on_duplicate),
+            ):
+                if self._quotes._rewritten_from != None:
+                    self._sector_changed(quotes_added=0)
+                return False
 
-        # and then use the add_quote_object method to add it - avoids duplicating code
-        # try except will catch if there's already a duplicate quote
-        try:
-            add_quote_result = self.add_sector_quote_object(new_quote)
-        except Exception as e:
-            raise
+            self._sector_changed(quotes_added=1)
+            return True
+
+    def _prepare_write(self, on_duplicate: str) -> str:
+        # same as Company._prepare_write
+        if self._collection != None:
+            transaction = self._collection._transaction
+            if transaction != None:
+                transaction.watch(self._quotes)
+
+        if on_duplicate != None:
+            return on_duplicate
+
+        if self._collection != None:
+            return self._collection.on_duplicate
+
+        return "raise"
 
-        return add_quote_result
+    @property
+    def duplicate_counts(self) -> dict:
+        # just the sector's own quotes - each company keeps its own counts
+        return self._quotes.duplicate_counts
 
-    def add_sector_quote_object(self, new_quote: SectorQuote) -> bool:
-        if new_quote.date in self._quotes:
-            raise QuoteAlreadyExists(code=self._sector_code, date=new_quote)
+    def add_sector_quote_object(
+        self, new_quote: SectorQuote, on_duplicate: str = None
+    ) -> bool:
+        return self.add_sector_quote(
+            date=new_quote.date,
+            open=new_quote.open,
+            high=new_quote.high,
+            low=new_quote.low,
+            close=new_quote.close,
+            volume=new_quote.volume,
+            on_duplicate=on_duplicate,
+        )
+
+    def add_sector_quotes(
+        self,
+        rows=None,
+        date=None,
+        open=None,
+        high=None,
+        low=None,
+        close=None,
+        volume=None,
+        on_duplicate: str = None,
+    ) -> int:
+        # bulk version of add_sector_quote - pass either an iterable of
+        # (date, open, high, low, close, volume) rows, or one array/list per column
+        # duplicates are checked for the whole batch before anything is inserted
+        with self._write_gate(), self._quotes._lock.write():
+            on_duplicate = self._prepare_write(on_duplicate)
+            if rows is not None:
+                added = self._quotes.extend_rows(rows=rows, on_duplicate=on_duplicate)
+            else:
+                added = self._quotes.extend(
+                    date=date,
+                    open=open,
+                    high=high,
+                    low=low,
+                    close=close,
+                    volume=volume,
+                    on_duplicate=on_duplicate,
+                )
 
-        self._quotes[new_quote.date] = new_quote
+            if added > 0 or self._quotes._rewritten_from != None:
+                self._sector_changed(quotes_added=added)
+
+            return added
+
+    def resample(self, freq: str) -> QuoteStore:
+        # weekly ("W"), monthly ("M") or yearly ("Y") bars built from the daily sector quotes
+        # behaves like get_quote's dict and has the columns as arrays too.  Cached until new
+        # quotes arrive, so treat it as read only
+        with self._quotes._lock.read():
+            if freq not in self._resampled:
+                self._resampled[freq] = resample_store(self._quotes, freq=freq)
+
+            return self._resampled[freq]
+
+    def get_index(self, weighting: str = "equal") -> QuoteStore:
+        # this sector's own daily bars, made from its companies' quotes instead of the quotes
+        # pushed in with add_sector_quote.  weighting is "equal" or "volume".  Read only
+        with self._lock.read():
+            index = self._index
+            generation = self._generation
+
+        if index == None:
+            index = SectorIndex(self, self._company_list())
+
+        # new quotes patch the index under the lock, so its stores are built under it too
+        with self._lock.write():
+            if self._index == None and self._generation == generation:
+                self._index = index
+
+            return index.store(weighting)
+
+    def _company_list(self) -> List[Company]:
+        # the companies as they are right now, to work through without holding the lock
+        with self._lock.read():
+            return list(self._companies.values())
+
+    def _derived(self, cache: dict, key, build):
+        # key from _panels or _correlations, built without holding the lock if it isn't there
+        # yet.  It's only kept if no company changed while it was being built
+        with self._lock.read():
+            if key in cache:
+                return cache[key]
+            generation = self._generation
+
+        value = build()
+        with self._lock.write():
+            if self._generation == generation:
+                cache[key] = value
+
+        return value
+
+    def _cache_get(self, cache_key: tuple) -> tuple:
+        # (cached result or None, generation to hand to _cache_put).  A hit moves the entry in the
+        # LRU order, so this takes the lock for writing
+        with self._lock.write():
+            return self._cache.get(cache_key), self._generation
+
+    def _cache_put(self, cache_key: tuple, result, tags, generation: int):
+        # a result built from quotes that changed after _cache_get isn't kept
+        with self._lock.write():
+            if self._generation == generation:
+                self._cache.put(cache_key, result, tags=tags)
+
+    def to_arrow(self):
+        # this sector's quotes and its companies' quotes as one pyarrow Table, a record batch
+        # each.  Shares memory with the quote stores
+        return to_arrow_table(name=None, sectors=[self], companies=[])
+
+    def write_arrow(self, path: str) -> bool:
+        write_arrow_file(self.to_arrow(), path)
         return True
 
+    @classmethod
+    def from_arrow(cls, table) -> "Sector":
+        _, sectors, companies = from_arrow_table(
+            table, company_class=Company, sector_class=cls
+        )
+        if len(sectors) != 1 or len(companies) != 0:
+            raise ValueError("Arrow table doesn't hold exactly one sector")
+
+        return sectors[0]
+
+    @classmethod
+    def read_arrow(cls, path: str, mmap: bool = True) -> "Sector":
+        return cls.from_arrow(read_arrow_file(path, mmap=mmap))
+
     def get_company(self, company_code: str) -> Company:
         # iterate through sectors, looking for the company
         if company_code in self._companies:
@@ -127,19 +412,82 @@ class Sector:
         except Exception as e:
             raise
 
-        matched_quotes = {}
+        if self._cache != None:
+            cache_key = ("sector_quote", dates.date_from, dates.date_to)
+            cached_quotes, generation = self._cache_get(cache_key)
+            if cached_quotes != None:
+                return copy_quote_result(cached_quotes)
 
-        for quote_date in self._quotes:
-            date_match = False
-            if (
-                dates.date_from <= quote_date.date()
-                and dates.date_to >= quote_date.date()
-            ):
-                matched_quotes[quote_date] = self._quotes[quote_date]
+        # the quote store is sorted by date, so bisect for the window instead of checking every quote
+        matched_quotes = self._quotes.get_range(
+            date_from=dates.date_from, date_to=dates.date_to
+        )
+
+        if self._cache != None:
+            self._cache_put(
+                cache_key, matched_quotes, [("sector", self._sector_code)], generation
+            )
+            matched_quotes = copy_quote_result(matched_quotes)
 
         # not checking for zero returns since zero is a valid response, doesn't mean exception/error
         return matched_quotes
 
+    def iter_sector_quotes(
+        self,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ):
+        # generator version of get_sector_quote - yields (sector_code, date, SectorQuote) one at a
+        # time instead of building a dict.  Dates are checked straight away, not on first next()
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+        return self._iter_sector_quotes(dates)
+
+    def _iter_sector_quotes(self, dates: DateParser):
+        for quote_date, quote in self._quotes.iter_range(
+            date_from=dates.date_from, date_to=dates.date_to
+        ):
+            yield self._sector_code, quote_date, quote
+
+    def _check_company_codes(self, company_codes: List[str]):
+        # if company_codes is set, check that its a list
+        # then check the requested companies are valid
+        if company_codes != None:
+            if not isinstance(company_codes, list):
+                raise TypeError(
+                    f"company_codes must be either None or List[str], instead of {type(company_codes)}"
+                )
+
+            with self._lock.read():
+                for company_code in company_codes:
+                    if company_code not in self._companies:
+                        raise CompanyDoesNotExist(company_code=company_code)
+
+    def iter_company_quotes(
+        self,
+        company_codes: List[str] = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ):
+        # generator version of get_company_quote - yields (company_code, date, CompanyQuote)
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+        self._check_company_codes(company_codes)
+
+        if company_codes != None:
+            company_codes = set(company_codes)
+
+        return self._iter_company_quotes(company_codes, dates)
+
+    def _iter_company_quotes(self, company_codes: set, dates: DateParser):
+        for company in self._company_list():
+            company_code = company.company_code
+            if company_codes == None or company_code in company_codes:
+                for quote_date, quote in company._quotes.iter_range(
+                    date_from=dates.date_from, date_to=dates.date_to
+                ):
+                    yield company_code, quote_date, quote
+
     def get_company_quote(
         self,
         company_codes: List[str] = None,
@@ -153,34 +501,68 @@ class Sector:
         except Exception as e:
             raise
 
-        # if company_codes is set, check that its a list
-        # then check the requested companies are valid
-        if company_codes != None:
-            if not isinstance(company_codes, list):
-                raise TypeError(
-                    f"company_codes must be either None or List[str], instead of {type(company_codes)}"
-                )
+        self._check_company_codes(company_codes)
 
-            for company_code in company_codes:
-                if company_code not in self._companies:
-                    raise CompanyDoesNotExist(company_code=company_code)
+        if self._cache != None:
+            cache_key, cache_tags = company_query_key(company_codes, dates)
+            cached_quotes, generation = self._cache_get(cache_key)
+            if cached_quotes != None:
+                return copy_quote_result(cached_quotes)
 
         matched_quotes = {}
 
-        for company in self._companies:
+        for company in self._company_list():
             company_match = False
             if company_codes == None:
                 company_match = True
-            elif company in company_codes:
+            elif company.company_code in company_codes:
                 company_match = True
 
             if company_match:
-                matched_quotes[company] = self._companies[company].get_quote(
+                matched_quotes[company.company_code] = company.get_quote(
                     date_from=date_from, date_to=date_to, date=date
                 )
 
+        if self._cache != None:
+            self._cache_put(cache_key, matched_quotes, cache_tags, generation)
+            matched_quotes = copy_quote_result(matched_quotes)
+
         return matched_quotes
 
+    def get_snapshot(
+        self, date: datetime, fields=CONST_QUOTE_FIELDS
+    ) -> Dict[str, np.ndarray]:
+        # every company in this sector on one date, as aligned numpy arrays keyed by field
+        return build_snapshot(self._company_list(), date=date, fields=fields)
+
+    def get_panel(
+        self,
+        field: str = "close",
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ) -> Panel:
+        # companies x dates matrix of one field, NaN where a company has no quote that day
+        # the full panel is built once and reused until a company changes, date ranges are views
+        panel = self._derived(
+            self._panels, field, lambda: build_panel(self._company_list(), field=field)
+        )
+        return panel.slice(date_from=date_from, date_to=date_to, date=date)
+
+    def correlation(
+        self, date_from: datetime = None, date_to: datetime = None
+    ) -> Correlation:
+        # correlation of daily log returns between every pair of companies in this sector, over the
+        # closes from date_from to date_to.  Cached by range until a company changes
+        dates = DateParser(date_from=date_from, date_to=date_to)
+        return self._derived(
+            self._correlations,
+            (dates.date_from, dates.date_to),
+            lambda: correlate(
+                self.get_panel(field="close", date_from=date_from, date_to=date_to)
+            ),
+        )
+
     def add_company_quote(
         self,
         company_object: Company,
@@ -190,36 +572,36 @@ class Sector:
         low: float,
         close: float,
         volume: int,
+        on_duplicate: str = None,
     ) -> bool:
         # look up whether we have this company
         if company_object.company_code not in self._companies.keys():
             raise CompanyDoesNotExist(company_code=company_object.company_code)
 
         # don't need to worry about checking if its a duplicate quote - that's the responsibility of Company
-        # then add it
-        self._companies[company_object.company_code].add_quote(
-            date=date, open=open, high=high, low=low, close=close, volume=volume
+        # then add it.  Either raises, returns True, or False for a duplicate that was handled
+        return self._companies[company_object.company_code].add_quote(
+            date=date,
+            open=open,
+            high=high,
+            low=low,
+            close=close,
+            volume=volume,
+            on_duplicate=on_duplicate,
         )
 
-        # either raise an Exception or return True
-        return True
-
     def add_company_quote_object(
-        self, company_object: Company, new_quote: CompanyQuote
+        self, company_object: Company, new_quote: CompanyQuote, on_duplicate: str = None
     ) -> bool:
         # look up whether we have this company
         if company_object.company_code not in self._companies.keys():
             raise CompanyDoesNotExist(company_code=company_object.company_code)
 
         # don't need to worry about checking if its a duplicate quote - that's the responsibility of Company
-        # then add it
-        self._companies[company_object.company_code].add_quote_object(
-            new_quote=new_quote
+        return self._companies[company_object.company_code].add_quote_object(
+            new_quote=new_quote, on_duplicate=on_duplicate
         )
 
-        # either raise an Exception or return True
-        return True
-
     @property
     def sector_quote_length(self) -> int:
         return len(self._quotes)
@@ -230,9 +612,4 @@ class Sector:
 
     @property
     def company_quote_length(self) -> int:
-        collected_quotes = 0
-        # loop through companies to get quote length
-        for company in self._companies:
-            collected_quotes += len(self._companies[company]._quotes)
-
-        return collected_quotes
+        return self._company_quote_length
@@ -1,5 +1,9 @@
 from typing import Dict, List
 from datetime import datetime
+from contextlib import contextmanager
+import os
+import threading
+import numpy as np
 
 from stockobjects.sector import Sector
 from stockobjects.company import Company
@@ -9,9 +13,37 @@ from stockobjects.stockobjectsexceptions import (
     SectorAlreadyExists,
     SectorDoesNotExist,
     CompanyDoesNotExist,
+    QuoteAlreadyExists,
 )
 from stockobjects.company import Company
-from stockobjects.parsing import DateParser
+from stockobjects.parsing import DateParser, parse_quote_date
+from stockobjects.quotestore import check_duplicate_policy
+from stockobjects.querycache import (
+    QueryCache,
+    company_query_key,
+    sector_query_key,
+    copy_quote_result,
+)
+from stockobjects.snapshot import CONST_QUOTE_FIELDS, build_snapshot
+from stockobjects.panel import Panel, build_panel
+from stockobjects.correlation import Correlation, correlate
+from stockobjects.persistence import save_collection, open_collection
+from stockobjects.consumer import CONST_CONSUMER_IN_FLIGHT, consume_source
+from stockobjects.transaction import Transaction
+from stockobjects.rwlock import RWLock
+from stockobjects.arrowio import (
+    to_arrow_table,
+    from_arrow_table,
+    write_arrow_file,
+    read_arrow_file,
+)
+from stockobjects.quotelog import (
+    QuoteLog,
+    CONST_LOG_FILE,
+    CONST_LOG_CURRENT,
+    write_snapshot,
+    recover_collection,
+)
 import json
 
 
@@ -19,23 +51,275 @@ class SectorCollection:
     # dict with sector_code as key, Sector object as value
     _sectors: Dict[str, Sector]
     _quotes: Dict[datetime, SectorQuote]
+    # dict with company_code as key, Company object as value - across every sector
+    _companies: Dict[str, Company]
     _name: str
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, cache_size: int = 0, on_duplicate: str = "raise"):
         self._name = name
         self._sectors = {}
         self._quotes = {}
+        self._companies = {}
+
+        # running totals across every sector, kept up to date by the sectors as things are added
+        self._sector_quote_length = 0
+        self._company_length = 0
+        self._company_quote_length = 0
+
+        # optional LRU cache of get_sector_quote/get_company_quote results
+        self._cache = None
+        if cache_size > 0:
+            self._cache = QueryCache(maxsize=cache_size)
+
+        # full history panels by field, thrown away whenever a company changes
+        self._panels = {}
+        # correlations by (date_from, date_to), thrown away along with the panels
+        self._correlations = {}
+
+        # optional write-ahead log, see attach_log
+        self._log = None
+        self._log_path = None
+
+        # what every add in this collection does with a quote for a date that's already there,
+        # unless the call says otherwise - "raise", "skip", "overwrite" or "merge"
+        check_duplicate_policy(on_duplicate)
+        self._on_duplicate = on_duplicate
+
+        # undo journal while a transaction is open, see transaction
+        self._transaction = None
+        # held by whichever thread has a transaction open, for as long as it's open
+        self._transaction_lock = threading.RLock()
+
+        # guards _sectors, _companies, the counters and everything cached, the same way Sector's
+        # lock does - see Sector.__init__.  Taken on its own or with a sector's lock inside it,
+        # never the other way round
+        self._lock = RWLock()
+        self._generation = 0
+        # every add in the collection shares this for reading.  save, attach_log and compact take
+        # it for writing, so they see the whole collection standing still - queries carry on
+        self._write_gate = RWLock()
 
     def add_sector(self, new_sector: Sector) -> bool:
         if not isinstance(new_sector, Sector):
             raise TypeError("new_sector must be of type Sector")
 
-        if new_sector.sector_code in self._sectors:
-            raise SectorAlreadyExists(new_sector.sector_code)
+        with self._write_gate.read():
+            # the sector's own quotes are held still while it joins, so one going in at the same
+            # time is counted either here or by _sector_changed, never both
+            with new_sector._quotes._lock.read(), self._lock.write():
+                if new_sector.sector_code in self._sectors:
+                    raise SectorAlreadyExists(new_sector.sector_code)
+
+                self._sectors[new_sector.sector_code] = new_sector
+                self._record(("sector", new_sector))
+
+                # the sector might already have companies in it, and it'll tell us about any new
+                # ones.  Same goes for their quotes - see Sector._company_changed
+                with new_sector._lock.write():
+                    new_sector._collection = self
+                    companies = list(new_sector._companies.values())
+                    self._sector_quote_length += new_sector.sector_quote_length
+                    self._company_length += len(companies)
+                    self._company_quote_length += new_sector.company_quote_length
+
+                for company in companies:
+                    self._index_company(company)
+                    self._company_changed(company.company_code)
+
+                self._sector_changed(new_sector.sector_code)
+
+                # logged before anyone else can see the sector, so nothing added to it can beat
+                # it into the log
+                if self._log != None:
+                    self._log.log_sector(new_sector)
+                    self._log_store(new_sector._quotes)
+
+            if self._log != None:
+                for company in companies:
+                    self._log_company(new_sector.sector_code, company)
 
-        self._sectors[new_sector.sector_code] = new_sector
         return True
 
+    def _record(self, entry: tuple):
+        # journal a registration, if this thread has a transaction open
+        transaction = self._transaction
+        if transaction != None:
+            transaction.record(entry)
+
+    def _index_company(self, company: Company):
+        # first sector to claim a company code wins, same as the old sector by sector search
+        with self._lock.write():
+            if company.company_code not in self._companies:
+                self._companies[company.company_code] = company
+                self._record(("index", company.company_code))
+
+    def _unindex_company(self, company_code: str):
+        # undoes _index_company, when a transaction is rolled back
+        with self._lock.write():
+            del self._companies[company_code]
+
+    def _company_added(self, company: Company, previous_sector: Sector = None):
+        # called by sectors when a company joins them, with the company's quotes held still
+        with self._lock.write():
+            self._record(("company", company.sector_object, company, previous_sector))
+            self._index_company(company)
+            self._company_length += 1
+            self._company_changed(company.company_code, quotes_added=company.length)
+
+        if self._log != None:
+            self._log_company(company.sector_code, company)
+
+    def _remove_sector(self, sector: Sector):
+        # undoes add_sector, when a transaction is rolled back
+        with self._lock.write():
+            del self._sectors[sector.sector_code]
+
+            with sector._lock.write():
+                sector._collection = None
+                companies = list(sector._companies.values())
+                self._sector_quote_length -= sector.sector_quote_length
+                self._company_length -= len(companies)
+                self._company_quote_length -= sector.company_quote_length
+
+            for company in companies:
+                self._company_changed(company.company_code)
+            self._sector_changed(sector.sector_code)
+
+        if self._log != None:
+            for company in companies:
+                self._stop_logging(company)
+            sector._quotes.unlisten(self._log.log_store)
+
+    def _company_removed(self, company: Company):
+        # undoes _company_added - the sector has already let go of it
+        with self._lock.write():
+            self._company_length -= 1
+            self._company_changed(company.company_code, quotes_added=-company.length)
+
+        self._stop_logging(company)
+
+    def _stop_logging(self, company: Company):
+        # unless it's still in another of our sectors
+        if self._log == None:
+            return
+
+        for sector in self._sector_list():
+            if sector.get_company(company.company_code) is company:
+                return
+
+        company._quotes.unlisten(self._log.log_store)
+
+    def _sector_list(self) -> List[Sector]:
+        # the sectors as they are right now, to work through without holding the lock
+        with self._lock.read():
+            return list(self._sectors.values())
+
+    def _company_list(self) -> List[Company]:
+        with self._lock.read():
+            return list(self._companies.values())
+
+    def _derived(self, cache: dict, key, build):
+        # same as Sector._derived
+        with self._lock.read():
+            if key in cache:
+                return cache[key]
+            generation = self._generation
+
+        value = build()
+        with self._lock.write():
+            if self._generation == generation:
+                cache[key] = value
+
+        return value
+
+    def _cache_get(self, cache_key: tuple) -> tuple:
+        # same as Sector._cache_get
+        with self._lock.write():
+            return self._cache.get(cache_key), self._generation
+
+    def _cache_put(self, cache_key: tuple, result, tags, generation: int):
+        with self._lock.write():
+            if self._generation == generation:
+                self._cache.put(cache_key, result, tags=tags)
+
+    @contextmanager
+    def transaction(self):
+        # with collection.transaction(): ... - if the block raises, everything it added to the
+        # collection (sectors, companies, quotes, overwrites and merges) is taken back out before
+        # the exception carries on, in time proportional to what it changed.  Transactions nest,
+        # a failing inner one only takes back its own changes
+        # one thread at a time - another thread's transaction waits for this one to finish, while
+        # plain adds from other threads carry on and aren't part of it
+        with self._transaction_lock:
+            if self._transaction == None:
+                self._transaction = Transaction(self)
+
+            transaction = self._transaction
+            transaction.begin()
+            try:
+                yield self
+            except BaseException:
+                transaction.rollback()
+                raise
+
+            transaction.commit()
+
+    def _check_no_transaction(self):
+        # called holding _transaction_lock, so an open transaction can only be this thread's own
+        if self._transaction != None:
+            raise ValueError("Can't do that while a transaction is open")
+
+    def _company_changed(self, company_code: str, quotes_added: int = 0):
+        # called by sectors whenever one of their companies gets quotes or joins
+        with self._lock.write():
+            self._generation += 1
+            self._company_quote_length += quotes_added
+            self._panels.clear()
+            self._correlations.clear()
+
+            if self._cache != None:
+                self._cache.invalidate("company", company_code)
+
+    def _sector_changed(self, sector_code: str, quotes_added: int = 0):
+        with self._lock.write():
+            self._generation += 1
+            self._sector_quote_length += quotes_added
+
+            if self._cache != None:
+                self._cache.invalidate("sector", sector_code)
+
+    @property
+    def on_duplicate(self) -> str:
+        return self._on_duplicate
+
+    @on_duplicate.setter
+    def on_duplicate(self, on_duplicate: str):
+        check_duplicate_policy(on_duplicate)
+        self._on_duplicate = on_duplicate
+
+    @property
+    def duplicate_counts(self) -> dict:
+        # skipped/overwritten/merged quotes summed over every sector and company
+        counts = {"skipped": 0, "overwritten": 0, "merged": 0}
+        stores = {}
+        for sector in self._sector_list():
+            stores[id(sector)] = sector._quotes
+            for company in sector._company_list():
+                stores[id(company)] = company._quotes
+
+        for store in stores.values():
+            for counter, count in store.duplicate_counts.items():
+                counts[counter] += count
+
+        return counts
+
+    @property
+    def cache_stats(self) -> dict:
+        if self._cache == None:
+            return None
+
+        return self._cache.stats
+
     def get_sector(self, sector_code: str) -> Sector:
         if not isinstance(sector_code, str):
             raise TypeError("sector_code must be of type string")
@@ -46,21 +330,165 @@ class SectorCollection:
         return self._sectors[sector_code]
 
     def get_company(self, company_code: str) -> Company:
-        # iterate through sectors, looking for the company
-        for this_sector in self._sectors:
-            if company_code in self._sectors[this_sector]._companies:
-                return self._sectors[this_sector]._companies[company_code]
+        if company_code not in self._companies:
+            raise CompanyDoesNotExist(company_code=company_code)
 
-        raise CompanyDoesNotExist(company_code=company_code)
+        return self._companies[company_code]
 
     @property
     def length(self) -> int:
         return len(self._sectors)
 
+    @property
+    def sector_length(self) -> int:
+        return len(self._sectors)
+
+    @property
+    def sector_quote_length(self) -> int:
+        return self._sector_quote_length
+
+    @property
+    def company_length(self) -> int:
+        return self._company_length
+
+    @property
+    def company_quote_length(self) -> int:
+        return self._company_quote_length
+
     @property
     def name(self) -> str:
         return self._name
 
+    def save(self, path: str):
+        # write the whole collection under path - see persistence.py for the layout
+        # adds wait for it to finish, so what's saved is one consistent moment
+        with self._transaction_lock, self._write_gate.write():
+            save_collection(self, path)
+
+        return True
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True) -> "SectorCollection":
+        # load a collection written by save.  With mmap the quote columns are memory mapped, so
+        # this only reads the index and quotes get paged in as they're queried
+        return open_collection(cls, path, mmap=mmap)
+
+    def to_arrow(self):
+        # every sector and company as one pyarrow Table, a record batch each.  Shares memory with
+        # the quote stores
+        return to_arrow_table(
+            name=self._name, sectors=self._sector_list(), companies=[]
+        )
+
+    def write_arrow(self, path: str) -> bool:
+        write_arrow_file(self.to_arrow(), path)
+        return True
+
+    @classmethod
+    def from_arrow(cls, table) -> "SectorCollection":
+        name, sectors, companies = from_arrow_table(
+            table, company_class=Company, sector_class=Sector
+        )
+        if len(companies) != 0:
+            raise ValueError("Arrow table has companies that aren't in a sector")
+
+        collection = cls(name=name)
+        for sector in sectors:
+            collection.add_sector(sector)
+
+        return collection
+
+    @classmethod
+    def read_arrow(cls, path: str, mmap: bool = True) -> "SectorCollection":
+        # with mmap the quote columns point straight into the IPC file
+        return cls.from_arrow(read_arrow_file(path, mmap=mmap))
+
+    def attach_log(self, path: str, fsync: bool = False) -> bool:
+        # from now on, every sector, company and quote added gets written to a log under path
+        # before this returns the current state is snapshotted there, so the log only has to
+        # hold what comes next.  Pick it back up after a restart with SectorCollection.recover
+        with self._transaction_lock, self._write_gate.write():
+            self._check_no_transaction()
+            if self._log != None:
+                raise ValueError(f"Already logging to {self._log_path}")
+
+            if os.path.exists(os.path.join(path, CONST_LOG_CURRENT)):
+                raise ValueError(
+                    f"{path} already has a log, use SectorCollection.recover to pick it up"
+                )
+
+            os.makedirs(path, exist_ok=True)
+            self._log_path = path
+            self._log = QuoteLog(os.path.join(path, CONST_LOG_FILE), fsync=fsync)
+            write_snapshot(self, path)
+            self._listen_all()
+            return True
+
+    @classmethod
+    def recover(
+        cls, path: str, mmap: bool = True, fsync: bool = False
+    ) -> "SectorCollection":
+        # open the last snapshot under path, replay the log on top of it, then keep logging
+        collection = recover_collection(cls, path, mmap=mmap)
+        collection._log_path = path
+        collection._log = QuoteLog(os.path.join(path, CONST_LOG_FILE), fsync=fsync)
+        collection._listen_all()
+        return collection
+
+    def compact(self) -> bool:
+        # fold the log into a new snapshot and start the log again empty
+        with self._transaction_lock, self._write_gate.write():
+            self._check_no_transaction()
+            if self._log == None:
+                raise ValueError("No log attached, see attach_log")
+
+            write_snapshot(self, self._log_path)
+            return True
+
+    def close_log(self) -> bool:
+        with self._transaction_lock, self._write_gate.write():
+            self._check_no_transaction()
+            if self._log == None:
+                return False
+
+            for sector in self._sectors.values():
+                sector._quotes.unlisten(self._log.log_store)
+                for company in sector._companies.values():
+                    company._quotes.unlisten(self._log.log_store)
+
+            self._log.close()
+            self._log = None
+            self._log_path = None
+            return True
+
+    def _listen_all(self):
+        for sector in self._sectors.values():
+            sector._quotes.listen(self._log.log_store)
+            for company in sector._companies.values():
+                company._quotes.listen(self._log.log_store)
+
+    def _log_company(self, sector_code: str, company: Company):
+        self._log.log_company(sector_code, company)
+        self._log_store(company._quotes)
+
+    def _log_store(self, store):
+        # log the quotes a store already has, then every one after that as it goes in - under
+        # its lock, so nothing can go in between the two and be missed
+        with store._lock.read():
+            if len(store) > 0:
+                self._log.log_store(
+                    store,
+                    (
+                        store.dates,
+                        store.open,
+                        store.high,
+                        store.low,
+                        store.close,
+                        store.volume,
+                    ),
+                )
+            store.listen(self._log.log_store)
+
     def get_sector_quote(
         self,
         sector_codes: List[str] = None,
@@ -74,28 +502,49 @@ class SectorCollection:
             raise
 
         # if a sector is specified, make sure it exists
-        if sector_codes != None:
-            for sector in sector_codes:
-                if sector not in self._sectors:
-                    raise SectorDoesNotExist(sector)
+        self._check_sector_codes(sector_codes)
+
+        if self._cache != None:
+            cache_key, cache_tags = sector_query_key(sector_codes, dates)
+            cached_quotes, generation = self._cache_get(cache_key)
+            if cached_quotes != None:
+                return copy_quote_result(cached_quotes)
 
         matched_quotes = {}
-        for sector in self._sectors:
-            # if I want all sectors
-            if sector_codes == None:
-                matched_quotes[sector] = self._sectors[sector].get_sector_quote(
+        for sector in self._sector_list():
+            # if I want all sectors, or if I only want the sectors in the sector_codes List
+            if sector_codes == None or sector.sector_code in sector_codes:
+                matched_quotes[sector.sector_code] = sector.get_sector_quote(
                     date_from=date_from, date_to=date_to, date=date
                 )
 
-            # if I only want the sectors in the sector_codes List
-            elif sector in sector_codes:
-                matched_quotes[sector] = self._sectors[sector].get_sector_quote(
-                    date_from=date_from, date_to=date_to, date=date
-                )
+        if self._cache != None:
+            self._cache_put(cache_key, matched_quotes, cache_tags, generation)
+            matched_quotes = copy_quote_result(matched_quotes)
 
         # not checking for zero returns since zero is a valid response, doesn't mean exception/error
         return matched_quotes
 
+    def _check_company_codes(self, company_codes: List[str]):
+        # validate that the company codes is a list
+        # todo: be clever and allow a string?
+        if company_codes != None:
+            if not isinstance(company_codes, list):
+                raise TypeError(
+                    f"company_codes must be either None or List[str], instead of {type(company_codes)}"
+                )
+
+            # check we know about every company before doing any work
+            with self._lock.read():
+                invalid_company_codes = [
+                    company_code
+                    for company_code in company_codes
+                    if company_code not in self._companies
+                ]
+
+            if len(invalid_company_codes) > 0:
+                raise CompanyDoesNotExist(invalid_company_codes)
+
     def get_company_quote(
         self,
         company_codes: List[str] = None,
@@ -109,208 +558,382 @@ class SectorCollection:
         except Exception as e:
             raise
 
-        # validate that the company codes is a list
-        # todo: be clever and allow a string?
-        if company_codes != None:
-            if not isinstance(company_codes, list):
-                raise TypeError(
-                    f"company_codes must be either None or List[str], instead of {type(company_codes)}"
-                )
+        self._check_company_codes(company_codes)
+
+        if self._cache != None:
+            cache_key, cache_tags = company_query_key(company_codes, dates)
+            cached_quotes, generation = self._cache_get(cache_key)
+            if cached_quotes != None:
+                return copy_quote_result(cached_quotes)
 
         matched_quotes = {}
-        found_company_codes = []
+        if company_codes != None:
+            wanted_company_codes = set(company_codes)
 
         # loop through all sectors
-        for sector in self._sectors:
+        for sector in self._sector_list():
             # either get all companies
             if company_codes == None:
                 this_sector_company_quotes = None
             # or just the companies that belong to this specific sector
             else:
-                this_sector_company_quotes = list(
-                    set(self._sectors[sector]._companies) & set(company_codes)
-                )
+                this_sector_company_quotes = [
+                    company.company_code
+                    for company in sector._company_list()
+                    if company.company_code in wanted_company_codes
+                ]
 
             # get the companies we care about
-            this_sector_matches = self._sectors[sector].get_company_quote(
+            this_sector_matches = sector.get_company_quote(
                 company_codes=this_sector_company_quotes,
                 date_from=date_from,
                 date_to=date_to,
                 date=date,
             )
 
-            # merge the existing matches with the new matches
-            matched_quotes = {**matched_quotes, **this_sector_matches}
+            # merge the new matches in place - rebuilding the dict every sector copies everything
+            matched_quotes.update(this_sector_matches)
 
-            # keep record of the company codes we found
-            found_company_codes = found_company_codes + list(this_sector_matches.keys())
+        if self._cache != None:
+            self._cache_put(cache_key, matched_quotes, cache_tags, generation)
+            matched_quotes = copy_quote_result(matched_quotes)
 
-        # before returning matched_quotes, we need to see if we weren't able to find any company codes
-        if company_codes != None:
-            # diff the codes we were asked to search for vs the ones we actually found
-            invalid_company_codes = list(set(company_codes) - set(found_company_codes))
+        return matched_quotes
 
-            # if there are any invalid quotes
-            if len(invalid_company_codes) > 0:
-                # raise an exception
-                raise CompanyDoesNotExist(invalid_company_codes)
+    def get_snapshot(
+        self, date: datetime, fields=CONST_QUOTE_FIELDS
+    ) -> Dict[str, np.ndarray]:
+        # what every company did on one date, as aligned numpy arrays:
+        # {"code": [...], "close": [...], ...} - companies with no quote that day are left out
+        return build_snapshot(self._company_list(), date=date, fields=fields)
 
-        # otherwise return what we found
-        return matched_quotes
+    def get_panel(
+        self,
+        field: str = "close",
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ) -> Panel:
+        # companies x dates matrix of one field, NaN where a company has no quote that day
+        # the full panel is built once and reused until a company changes, date ranges are views
+        panel = self._derived(
+            self._panels, field, lambda: build_panel(self._company_list(), field=field)
+        )
+        return panel.slice(date_from=date_from, date_to=date_to, date=date)
+
+    def correlation(
+        self, date_from: datetime = None, date_to: datetime = None
+    ) -> Correlation:
+        # correlation of daily log returns between every pair of companies in the collection, over the
+        # closes from date_from to date_to.  Cached by range until a company changes
+        dates = DateParser(date_from=date_from, date_to=date_to)
+        return self._derived(
+            self._correlations,
+            (dates.date_from, dates.date_to),
+            lambda: correlate(
+                self.get_panel(field="close", date_from=date_from, date_to=date_to)
+            ),
+        )
+
+    def iter_sector_quotes(
+        self,
+        sector_codes: List[str] = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ):
+        # generator version of get_sector_quote - yields (sector_code, date, SectorQuote) one at a
+        # time, so nothing is held onto and the first quote doesn't wait for the whole scan
+        # arguments are checked straight away, not on first next()
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
 
-    def _validate_sqs(self, payload: dict) -> bool:
+        # if a sector is specified, make sure it exists
+        self._check_sector_codes(sector_codes)
+
+        return self._iter_sector_quotes(sector_codes, dates)
+
+    def _check_sector_codes(self, sector_codes: List[str]):
+        if sector_codes != None:
+            with self._lock.read():
+                for sector in sector_codes:
+                    if sector not in self._sectors:
+                        raise SectorDoesNotExist(sector)
+
+    def _iter_sector_quotes(self, sector_codes: List[str], dates: DateParser):
+        with self._lock.read():
+            if sector_codes == None:
+                sectors = list(self._sectors.values())
+            else:
+                sectors = [
+                    self._sectors[sector_code]
+                    for sector_code in dict.fromkeys(sector_codes)
+                ]
+
+        for sector in sectors:
+            yield from sector._iter_sector_quotes(dates)
+
+    def iter_company_quotes(
+        self,
+        company_codes: List[str] = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ):
+        # generator version of get_company_quote - yields (company_code, date, CompanyQuote)
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+        self._check_company_codes(company_codes)
+        return self._iter_company_quotes(company_codes, dates)
+
+    def _iter_company_quotes(self, company_codes: List[str], dates: DateParser):
+        if company_codes == None:
+            for sector in self._sector_list():
+                yield from sector._iter_company_quotes(None, dates)
+            return
+
+        # straight to the companies we want via the company index
+        for company_code in dict.fromkeys(company_codes):
+            company = self._companies[company_code]
+            for quote_date, quote in company._quotes.iter_range(
+                date_from=dates.date_from, date_to=dates.date_to
+            ):
+                yield company_code, quote_date, quote
+
+    def _parse_sqs_quote(self, this_quote: dict, code_key: str) -> tuple:
+        # turn one quoteObject entry into a typed row: (code, date, open, high, low, close, volume)
+        try:
+            return (
+                this_quote[code_key],
+                # normalised into the quote store's date key - repeat dates come out of a cache
+                parse_quote_date(this_quote["quote_date"]),
+                float(this_quote["open"]),
+                float(this_quote["high"]),
+                float(this_quote["low"]),
+                float(this_quote["close"]),
+                int(this_quote["volume"]),
+            )
+        except KeyError as e:
+            raise Exception(f"Quote is missing {e} in quoteObject")
+        except (TypeError, ValueError) as e:
+            raise Exception(f"Quote has a bad value in quoteObject: {e}")
+
+    def _parse_sqs(self, payload: dict) -> List[tuple]:
+        # decode and validate every record in a single pass.  Nothing is applied until the whole
+        # payload has parsed, so a bad record still fails the batch before anything changes
+        # returns a list of (messageType, [typed rows]) - one entry per record
         if not "Records" in payload.keys():
             raise Exception("No Records key in event.  Failing")
 
         # for each recrord
-        for record in payload["Records"]:
-            try:
-                # does this key exist?
-                messageType = record["messageAttributes"]["QuoteType"]["stringValue"]
-            except Exception as e:
-                raise Exception("Unable to find quoteType in message.  Failing")
-
-            # and if it does, is it a valid value?
-            if messageType != "stock" and messageType != "sector":
-                raise Exception(
-                    f"quoteType is invalid.  Expected either 'sector' or 'stock', instead found {messageType}.  Failing"
-                )
-
-            # is it valid json?
-            try:
-                listOfQuotes = json.loads(record["body"])
-            except:
-                raise
+        return [self._parse_sqs_record(record) for record in payload["Records"]]
 
-            # and if it is, is there a key for quoteObject?
-            if not "quoteObject" in listOfQuotes.keys():
-                raise Exception("Unable to find quoteObject in payload")
+    def _parse_sqs_record(self, record: dict) -> tuple:
+        # one record into (messageType, [typed rows]), or raise saying what's wrong with it
+        try:
+            # does this key exist?
+            messageType = record["messageAttributes"]["QuoteType"]["stringValue"]
+        except Exception as e:
+            raise Exception("Unable to find quoteType in message.  Failing")
 
-            # and are there any quotes?
-            if not isinstance(listOfQuotes["quoteObject"], list):
-                raise Exception("No quotes in quoteObject")
+        # and if it does, is it a valid value?
+        if messageType != "stock" and messageType != "sector":
+            raise Exception(
+                f"quoteType is invalid.  Expected either 'sector' or 'stock', instead found {messageType}.  Failing"
+            )
 
-            if len(listOfQuotes["quoteObject"]) == 0:
-                raise Exception("No quotes in quoteObject")
+        # is it valid json?  this is the only time the body gets decoded
+        listOfQuotes = json.loads(record["body"])
+
+        # and if it is, is there a key for quoteObject?
+        if not "quoteObject" in listOfQuotes.keys():
+            raise Exception("Unable to find quoteObject in payload")
+
+        # and are there any quotes?
+        if not isinstance(listOfQuotes["quoteObject"], list):
+            raise Exception("No quotes in quoteObject")
+
+        if len(listOfQuotes["quoteObject"]) == 0:
+            raise Exception("No quotes in quoteObject")
+
+        # company - stock is an old name I used at the beginning of this whole palava
+        code_key = "sector_code" if messageType == "sector" else "stock_code"
+        return (
+            messageType,
+            [
+                self._parse_sqs_quote(this_quote, code_key)
+                for this_quote in listOfQuotes["quoteObject"]
+            ],
+        )
+
+    def load_sqs(self, payload: str, partial: bool = False, on_duplicate: str = None):
+        # partial=False raises on the first bad record and returns True
+        # partial=True loads every good record, skips the bad ones and returns
+        # {"batchItemFailures": [{"itemIdentifier": messageId, "reason": why}]} - hand it straight
+        # back from the Lambda so SQS only redelivers the failures
+        # on_duplicate defaults to the collection's policy
+        if on_duplicate == None:
+            on_duplicate = self._on_duplicate
+        check_duplicate_policy(on_duplicate)
+
+        if partial:
+            return self._load_sqs_partial(payload, on_duplicate)
+
+        # decode and validate the payload per my custom formatting
+        parsed_records = self._parse_sqs(payload=payload)
+
+        # all or nothing - a record that fails partway doesn't leave the ones before it behind
+        with self.transaction():
+            self._apply_sqs(parsed_records, on_duplicate)
 
-        # got here without raising an Exception so the input is good
+        # if we got here, it was successful
         return True
 
-    def load_sqs(self, payload: str) -> bool:
-        # validate the payload per my custom formatting
-        try:
-            self._validate_sqs(payload=payload)
-        except:
-            raise
-
-        # todo hacky
-        boilerplate_sector = Sector("Boilerplate", "Boilerplate")
-        self.add_sector(new_sector=boilerplate_sector)
+    def _load_sqs_partial(self, payload: dict, on_duplicate: str) -> dict:
+        if not "Records" in payload.keys():
+            raise Exception("No Records key in event.  Failing")
 
-        # okay so its valid. now you need to loop through
+        failures = []
         for record in payload["Records"]:
-            # hold on to the message type
-            messageType = record["messageAttributes"]["QuoteType"]["stringValue"]
+            try:
+                messageType, rows = self._parse_sqs_record(record)
+                # any other policy deals with duplicates itself, without failing the record
+                if on_duplicate == "raise":
+                    rows = self._new_sqs_rows(messageType, rows)
+                with self.transaction():
+                    self._apply_sqs([(messageType, rows)], on_duplicate)
+            except Exception as e:
+                failures.append(
+                    {
+                        "itemIdentifier": record.get("messageId"),
+                        # this module's exceptions put the message last in args
+                        "reason": str(e.args[-1]) if len(e.args) > 0 else repr(e),
+                    }
+                )
 
-            # read the embedded json in the body key
-            this_quote_collection = json.loads(record["body"])
+        return {"batchItemFailures": failures}
+
+    def _new_sqs_rows(self, messageType: str, rows: List[tuple]) -> List[tuple]:
+        # rows that are already here with exactly the same values get dropped, so a redelivered
+        # record goes through again without changing anything.  A row that clashes with a
+        # different quote for the same date fails the whole record before any of it is applied
+        new_rows = []
+        seen = {}
+        for row in rows:
+            code, date = row[0], row[1]
+            if (code, date) in seen:
+                if seen[(code, date)] != row:
+                    raise QuoteAlreadyExists(code=code, date=date)
+                continue
+            seen[(code, date)] = row
 
             if messageType == "sector":
-                # there can be more than one quote object per record
-                for this_quote in this_quote_collection["quoteObject"]:
-                    # do we already have this sector?
-                    try:
-                        this_sector = self.get_sector(sector_code=this_quote["sector_code"])
-                    except:
-                        # new sector, so instantiate it as an object and add it to the collection
-                        this_sector = Sector(
-                            "boilerplate sector name", this_quote["sector_code"]
+                owner = self._sectors.get(code)
+            else:
+                owner = self._companies.get(code)
+
+            if owner != None:
+                store = owner._quotes
+                with store._lock.read():
+                    position = store._find(date)
+                    if position >= 0:
+                        existing = (
+                            store._open[position],
+                            store._high[position],
+                            store._low[position],
+                            store._close[position],
+                            store._volume[position],
                         )
-                        self.add_sector(new_sector=this_sector)
-
-                    # create a quote object
-                    try:
-                        date = this_quote["quote_date"]
-                        open = this_quote["open"]
-                        high = this_quote["high"]
-                        low = this_quote["low"]
-                        close = this_quote["close"]
-                        volume = this_quote["volume"]
-
-                        new_quote = SectorQuote(
-                            sector_object=this_sector,
+                if position >= 0:
+                    if existing != row[2:]:
+                        raise QuoteAlreadyExists(code=code, date=date)
+                    continue
+
+            new_rows.append(row)
+
+        return new_rows
+
+    async def consume(
+        self,
+        source,
+        max_in_flight: int = CONST_CONSUMER_IN_FLIGHT,
+        on_ack=None,
+        on_nack=None,
+    ) -> int:
+        # keep pulling payloads from an async source and loading them, like load_sqs does, until
+        # the source runs dry.  on_ack(payload) and on_nack(payload, error) default to the
+        # source's own ack and nack.  See consumer.py.  Returns how many payloads were loaded
+        return await consume_source(
+            self,
+            source,
+            max_in_flight=max_in_flight,
+            on_ack=on_ack,
+            on_nack=on_nack,
+        )
+
+    def _boilerplate_sector(self) -> Sector:
+        # todo hacky - company quotes don't say which sector they're in, so they all go in here
+        # made the first time it's needed and reused after that, so more than one payload can
+        # be loaded into the same collection
+        if "Boilerplate" not in self._sectors:
+            self.add_sector(new_sector=Sector("Boilerplate", "Boilerplate"))
+
+        return self._sectors["Boilerplate"]
+
+    def _apply_sqs(self, parsed_records: List[tuple], on_duplicate: str = None):
+        # the rows out of _parse_sqs, into the collection
+        # the write gate is held for the lot - every quote would take it anyway, and taking it
+        # again is cheap
+        with self._write_gate.read():
+            boilerplate_sector = self._boilerplate_sector()
+
+            # okay so its valid. now you need to loop through
+            for messageType, rows in parsed_records:
+                if messageType == "sector":
+                    # there can be more than one quote object per record
+                    for code, date, open, high, low, close, volume in rows:
+                        # do we already have this sector?
+                        if code in self._sectors:
+                            this_sector = self._sectors[code]
+                        else:
+                            # new sector, so instantiate it as an object and add it to the collection
+                            this_sector = Sector("boilerplate sector name", code)
+                            self.add_sector(new_sector=this_sector)
+
+                        # rows are already typed so they go straight into the quote store
+                        # raises QuoteAlreadyExists if there was already a quote for this date, unless
+                        # on_duplicate says otherwise
+                        this_sector.add_sector_quote(
                             date=date,
                             open=open,
                             high=high,
                             low=low,
                             close=close,
                             volume=volume,
-                        )
-                    except:
-                        # new sector quote is bad - barf? log? not sure what I want to do with this. json.loads barfs so I guess I should too?
-                        raise
-
-                    try:
-                        self.get_sector(
-                            sector_code=this_quote["sector_code"]
-                        ).add_sector_quote_object(new_quote=new_quote)
-                    except:
-                        # barfed because there was already a quote for this date?  bad types?
-                        raise
-
-            # company - stock is an old name I used at the beginning of this whole palava
-            elif messageType == "stock":
-                # there can be more than one quote object per record
-                for this_quote in this_quote_collection["quoteObject"]:
-                    # do we already have this company?
-                    try:
-                        this_company = self.get_company(
-                            company_code=this_quote["stock_code"]
-                        )
-                    except CompanyDoesNotExist:
-                        # new sector, so instantiate it as an object and add it to the collection
-                        this_company = Company(
-                            company_name="boilerplate company name",
-                            company_code=this_quote["stock_code"],
+                            on_duplicate=on_duplicate,
                         )
 
-                        # hacky - company quotes don't specify the sector they belong to, so orphan them
-                        self.get_sector(
-                            sector_code=boilerplate_sector.sector_code
-                        ).add_company(new_company=this_company)
-                    except:
-                        raise
-
-                    # create a quote object
-                    try:
-                        date = this_quote["quote_date"]
-                        open = this_quote["open"]
-                        high = this_quote["high"]
-                        low = this_quote["low"]
-                        close = this_quote["close"]
-                        volume = this_quote["volume"]
-
-                        new_quote = CompanyQuote(
-                            company_object=this_company,
+                # company - stock is an old name I used at the beginning of this whole palava
+                elif messageType == "stock":
+                    # there can be more than one quote object per record
+                    for code, date, open, high, low, close, volume in rows:
+                        # do we already have this company?
+                        if code in self._companies:
+                            this_company = self._companies[code]
+                        else:
+                            # new company, so instantiate it as an object and add it to the collection
+                            this_company = Company(
+                                company_name="boilerplate company name",
+                                company_code=code,
+                            )
+
+                            # hacky - company quotes don't specify the sector they belong to, so orphan them
+                            boilerplate_sector.add_company(new_company=this_company)
+
+                        this_company.add_quote(
                             date=date,
                             open=open,
                             high=high,
                             low=low,
                             close=close,
                             volume=volume,
+                            on_duplicate=on_duplicate,
                         )
-
-                    except:
-                        # new sector quote is bad - barf? log? not sure what I want to do with this. json.loads barfs so I guess I should too?
-                        raise
-
-                    try:
-                        self.get_company(
-                            company_code=this_quote["stock_code"]
-                        ).add_quote_object(new_quote=new_quote)
-                    except:
-                        # barfed because there was already a quote for this date?  bad types?
-                        raise
-                    
-        # if we got here, it was successful
-        return True
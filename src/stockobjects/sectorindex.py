@@ -0,0 +1,144 @@
+from typing import Iterable
+import numpy as np
+
+from stockobjects.sectorquote import SectorQuote
+from stockobjects.quotestore import QuoteStore
+from stockobjects.parsing import parse_quote_date
+
+CONST_INDEX_WEIGHTINGS = ("equal", "volume")
+
+
+# a Sector's own index series, built from its companies' quotes rather than pushed in separately
+# for every day it keeps running totals across the companies that quoted that day: how many
+# there were, the sum of each price, the sum of each price * volume and the total volume.
+# Both weightings fall straight out of those totals:
+#   equal  - each price is the plain average across companies
+#   volume - each price is weighted by that company's volume that day (falls back to equal if
+#            nobody traded)
+# volume is always the total.  The totals are built in one pass over every company's columns,
+# and a new company quote after that just adds itself to its day's totals
+class SectorIndex:
+    _days: np.ndarray
+    _counts: np.ndarray
+    # 4 rows, open/high/low/close
+    _sums: np.ndarray
+    _weighted_sums: np.ndarray
+    _volumes: np.ndarray
+    # built bars by weighting, patched or dropped as the totals change
+    _stores: dict
+
+    def __init__(self, sector, companies: Iterable):
+        self._sector = sector
+        self._stores = {}
+
+        # each company's columns are copied out together, so quotes going in meanwhile can't
+        # leave them out of step
+        stores = [company._quotes.columns() for company in companies]
+        if len(stores) > 0:
+            days = np.concatenate([columns[0] for columns in stores])
+            # open, high, low, close
+            prices = np.array(
+                [
+                    np.concatenate([columns[field] for columns in stores])
+                    for field in range(1, 5)
+                ]
+            ).reshape(4, -1)
+            volume = np.concatenate([columns[5] for columns in stores])
+        else:
+            days = np.empty(0, dtype="datetime64[us]")
+            prices = np.empty((4, 0), dtype=np.float64)
+            volume = np.empty(0, dtype=np.int64)
+
+        # line every quote up with its day, then total each day up with bincount
+        self._days, positions = np.unique(
+            days.astype("datetime64[D]"), return_inverse=True
+        )
+        day_count = len(self._days)
+
+        self._counts = np.bincount(positions, minlength=day_count)
+        self._sums = np.array(
+            [np.bincount(positions, weights=row, minlength=day_count) for row in prices]
+        ).reshape(4, day_count)
+        self._weighted_sums = np.array(
+            [
+                np.bincount(positions, weights=row * volume, minlength=day_count)
+                for row in prices
+            ]
+        ).reshape(4, day_count)
+        self._volumes = np.zeros(day_count, dtype=np.int64)
+        np.add.at(self._volumes, positions, volume)
+
+    @property
+    def length(self) -> int:
+        return len(self._days)
+
+    def add_quote(
+        self, date, open: float, high: float, low: float, close: float, volume: int
+    ):
+        # one more company quote - add it to its day's totals
+        day = parse_quote_date(date).astype("datetime64[D]")
+        position = int(np.searchsorted(self._days, day))
+        prices = np.array([open, high, low, close], dtype=np.float64)
+
+        if position < len(self._days) and self._days[position] == day:
+            self._counts[position] += 1
+            self._sums[:, position] += prices
+            self._weighted_sums[:, position] += prices * volume
+            self._volumes[position] += volume
+
+            # only this day's bar changed, patch it in any store already built
+            for weighting, store in self._stores.items():
+                store.set_position(position, *self._bar(weighting, position))
+            return
+
+        # first quote on this day - a new column in the totals, and the built stores are stale
+        self._days = np.insert(self._days, position, day)
+        self._counts = np.insert(self._counts, position, 1)
+        self._sums = np.insert(self._sums, position, prices, axis=1)
+        self._weighted_sums = np.insert(
+            self._weighted_sums, position, prices * volume, axis=1
+        )
+        self._volumes = np.insert(self._volumes, position, volume)
+        self._stores.clear()
+
+    def _bar(self, weighting: str, position) -> tuple:
+        # open, high, low, close, volume at position - works on a single index or a whole slice
+        counts = self._counts[position]
+        volumes = self._volumes[position]
+        prices = self._sums[:, position] / counts
+
+        if weighting == "volume":
+            traded = volumes > 0
+            prices = np.where(
+                traded,
+                self._weighted_sums[:, position] / np.where(traded, volumes, 1),
+                prices,
+            )
+
+        return prices[0], prices[1], prices[2], prices[3], volumes
+
+    def store(self, weighting: str = "equal") -> QuoteStore:
+        if weighting not in CONST_INDEX_WEIGHTINGS:
+            raise ValueError(
+                f"weighting must be one of {CONST_INDEX_WEIGHTINGS}, instead found {weighting}"
+            )
+
+        if weighting not in self._stores:
+            day_count = len(self._days)
+            store = QuoteStore(
+                parent=self._sector,
+                quote_class=SectorQuote,
+                capacity=max(day_count, 1),
+            )
+            open, high, low, close, volume = self._bar(weighting, slice(0, day_count))
+            store.extend(
+                date=self._days.astype("datetime64[us]"),
+                open=open,
+                high=high,
+                low=low,
+                close=close,
+                volume=volume,
+            )
+            self._stores[weighting] = store
+
+        return self._stores[weighting]
@@ -3,6 +3,8 @@ from datetime import datetime
 
 
 class SectorQuote(BaseQuote):
+    __slots__ = ()
+
     def __init__(
         self,
         sector_object,
@@ -0,0 +1,206 @@
+from typing import Dict, List
+from datetime import datetime
+import multiprocessing
+import os
+
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.sectorquote import SectorQuote
+from stockobjects.companyquote import CompanyQuote
+from stockobjects.parsing import DateParser
+from stockobjects.rwlock import read_all
+
+# SectorCollection that scatters collection-wide queries across worker processes
+# sectors (and the companies in them) are dealt out to shards, each shard is scanned in its own
+# forked process, and the results are gathered back into the usual dict of dicts
+# workers are forked per query so they always see the current data without anything being
+# copied across up front.  They hand back index ranges into the quote stores rather than quote
+# objects, since quotes have to point at this process's Company and Sector objects
+# needs the fork start method - anywhere that doesn't have it, queries just run in process
+# the quote stores being scanned are read locked from before the fork until the quotes have been
+# built back here, so the ranges the workers hand back still point at the same quotes.  Workers
+# never take a lock themselves - one held by another thread at the fork would never be let go
+
+# sector code -> (Sector, [Company, ...]) as they were when the query started - set just before
+# the pool forks so the workers inherit it
+_shard_sectors = None
+
+
+def _scan_company_shard(
+    sector_codes: List[str], company_codes: List[str], date_from, date_to
+) -> Dict[str, tuple]:
+    matched_ranges = {}
+    for sector_code in sector_codes:
+        for company in _shard_sectors[sector_code][1]:
+            if company_codes == None or company.company_code in company_codes:
+                matched_ranges[company.company_code] = company._quotes._index_range(
+                    date_from=date_from, date_to=date_to
+                )
+
+    return matched_ranges
+
+
+def _scan_sector_shard(sector_codes: List[str], date_from, date_to) -> Dict[str, tuple]:
+    return {
+        sector_code: _shard_sectors[sector_code][0]._quotes._index_range(
+            date_from=date_from, date_to=date_to
+        )
+        for sector_code in sector_codes
+    }
+
+
+class ShardedSectorCollection(SectorCollection):
+    _workers: int
+
+    def __init__(self, name: str, workers: int = None):
+        super().__init__(name=name)
+
+        if workers == None:
+            workers = os.cpu_count()
+
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError(f"workers must be a positive int, instead of {workers}")
+
+        self._workers = workers
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def _shards(self, sector_codes: List[str]) -> List[List[str]]:
+        # deal the sectors out round robin, one shard per worker
+        shard_count = min(self._workers, len(sector_codes))
+        return [sector_codes[shard::shard_count] for shard in range(shard_count)]
+
+    def _shard_sectors(self, sector_codes: List[str]) -> Dict[str, tuple]:
+        # what _scatter scans - taken up front so sectors and companies added meanwhile can't
+        # change it partway through
+        with self._lock.read():
+            sectors = [self._sectors[sector_code] for sector_code in sector_codes]
+
+        return {
+            sector.sector_code: (sector, sector._company_list()) for sector in sectors
+        }
+
+    def _scatter(
+        self, scan, shard_arguments: List[tuple], sectors: Dict[str, tuple]
+    ) -> Dict[str, tuple]:
+        # called with the stores being scanned read locked
+        global _shard_sectors
+
+        gathered = {}
+        if (
+            len(shard_arguments) < 2
+            or "fork" not in multiprocessing.get_all_start_methods()
+        ):
+            # not worth a pool - scan in process
+            _shard_sectors = sectors
+            try:
+                for arguments in shard_arguments:
+                    gathered.update(scan(*arguments))
+            finally:
+                _shard_sectors = None
+
+            return gathered
+
+        _shard_sectors = sectors
+        try:
+            with multiprocessing.get_context("fork").Pool(len(shard_arguments)) as pool:
+                for shard_result in pool.starmap(scan, shard_arguments):
+                    gathered.update(shard_result)
+        finally:
+            _shard_sectors = None
+
+        return gathered
+
+    def get_company_quote(
+        self,
+        company_codes: List[str] = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ) -> Dict[datetime, CompanyQuote]:
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+        self._check_company_codes(company_codes)
+
+        # only bother with the sectors that hold companies we care about
+        with self._lock.read():
+            if company_codes == None:
+                sector_codes = list(self._sectors)
+            else:
+                wanted_sectors = {
+                    self._companies[company_code].sector_code
+                    for company_code in company_codes
+                }
+                sector_codes = [
+                    sector_code
+                    for sector_code in self._sectors
+                    if sector_code in wanted_sectors
+                ]
+
+        sectors = self._shard_sectors(sector_codes)
+        stores = [
+            company._quotes
+            for _, companies in sectors.values()
+            for company in companies
+        ]
+        with read_all(store._lock for store in stores):
+            matched_ranges = self._scatter(
+                _scan_company_shard,
+                [
+                    (shard, company_codes, dates.date_from, dates.date_to)
+                    for shard in self._shards(sector_codes)
+                ],
+                sectors,
+            )
+
+            # build the quotes back here, in sector order like SectorCollection does
+            matched_quotes = {}
+            for sector_code in sector_codes:
+                for company in sectors[sector_code][1]:
+                    if company.company_code in matched_ranges:
+                        start, end = matched_ranges[company.company_code]
+                        matched_quotes[company.company_code] = (
+                            company._quotes.get_positions(start=start, end=end)
+                        )
+
+        return matched_quotes
+
+    def get_sector_quote(
+        self,
+        sector_codes: List[str] = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        date: datetime = None,
+    ) -> Dict[datetime, SectorQuote]:
+        dates = DateParser(date_from=date_from, date_to=date_to, date=date)
+
+        # if a sector is specified, make sure it exists
+        self._check_sector_codes(sector_codes)
+
+        with self._lock.read():
+            wanted_sectors = [
+                sector_code
+                for sector_code in self._sectors
+                if sector_codes == None or sector_code in sector_codes
+            ]
+
+        sectors = self._shard_sectors(wanted_sectors)
+        with read_all(sector._quotes._lock for sector, _ in sectors.values()):
+            matched_ranges = self._scatter(
+                _scan_sector_shard,
+                [
+                    (shard, dates.date_from, dates.date_to)
+                    for shard in self._shards(wanted_sectors)
+                ],
+                sectors,
+            )
+
+            matched_quotes = {}
+            for sector_code in wanted_sectors:
+                start, end = matched_ranges[sector_code]
+                sector = sectors[sector_code][0]
+                matched_quotes[sector_code] = sector._quotes.get_positions(
+                    start=start, end=end
+                )
+
+        return matched_quotes
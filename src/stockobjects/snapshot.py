@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Dict, Iterable
+import numpy as np
+
+from stockobjects.parsing import DateParser
+
+CONST_QUOTE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def check_fields(fields) -> tuple:
+    fields = tuple(fields)
+    for field in fields:
+        if field not in CONST_QUOTE_FIELDS:
+            raise ValueError(
+                f"fields must be from {CONST_QUOTE_FIELDS}, instead found {field}"
+            )
+
+    return fields
+
+
+def build_snapshot(
+    companies: Iterable, date: datetime, fields=CONST_QUOTE_FIELDS
+) -> Dict[str, np.ndarray]:
+    # every company's quote on one day, as aligned arrays: snapshot["code"][i] closed at
+    # snapshot["close"][i].  Companies without a quote that day are left out
+    # each company's sorted date column is its row index - finding the row is a bisect, so the
+    # cost is one lookup per company no matter how long the histories are
+    fields = check_fields(fields)
+    day = DateParser(date=date).date_from
+
+    codes = []
+    rows = []
+    for company in companies:
+        store = company._quotes
+        # found and read under the one lock, so a quote going in can't move the row meanwhile
+        with store._lock.read():
+            start, end = store._index_range(date_from=day, date_to=day)
+            if start < end:
+                codes.append(company.company_code)
+                rows.append(
+                    tuple(getattr(store, "_" + field)[start] for field in fields)
+                )
+
+    snapshot = {"code": np.array(codes, dtype=str)}
+    for position, field in enumerate(fields):
+        snapshot[field] = np.fromiter(
+            (row[position] for row in rows),
+            dtype=np.int64 if field == "volume" else np.float64,
+            count=len(rows),
+        )
+
+    return snapshot
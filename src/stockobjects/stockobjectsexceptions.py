@@ -47,3 +47,19 @@ class InvalidDateOptions(Exception):
             self,
             f"Invalid combination of parameters.  Either set date_from and/or date_to, OR set date",
         )
+
+
+class IndicatorAlreadyExists(Exception):
+    def __init__(self, code: str, name: str):
+        super().__init__(
+            self,
+            f"Company {code} already has an indicator called {name}",
+        )
+
+
+class IndicatorDoesNotExist(Exception):
+    def __init__(self, code: str, name: str):
+        super().__init__(
+            self,
+            f"Company {code} does not have an indicator called {name}",
+        )
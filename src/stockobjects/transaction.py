@@ -0,0 +1,149 @@
+from typing import List
+import threading
+import numpy as np
+
+from stockobjects.sectorquote import SectorQuote
+
+# undo journal behind SectorCollection.transaction
+# while a transaction is open, every quote store written to in the collection appends what it did
+# to the journal (see QuoteStore._journal), and the collection adds its own registrations:
+#   (store, dates, None)                  rows inserted into a quote store
+#   (store, dates, previous)              rows overwritten or merged, as they were before
+#   ("sector", sector)                    a sector added to the collection
+#   ("company", sector, company, before)  a company added to a sector, and its sector before that
+#   ("index", company_code)               a company code indexed by the collection for the first time
+# rolling back walks the journal backwards from where the (maybe nested) transaction started, so
+# it costs time in proportion to what changed rather than to the size of the collection
+# quote log records are held back until the outermost transaction commits, so a rolled back
+# transaction never reaches the log
+# a transaction belongs to the thread that opened it - changes other threads make meanwhile
+# aren't journalled, so a rollback leaves them be
+
+
+class Transaction:
+    _journal: List[tuple]
+    _marks: List[tuple]
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._thread = threading.get_ident()
+        self._journal = []
+        # (journal length, held log records) where each open transaction started, innermost last
+        self._marks = []
+        # stores whose changes are being journalled, by id
+        self._watched = {}
+
+    @property
+    def depth(self) -> int:
+        return len(self._marks)
+
+    def begin(self):
+        log = self._collection._log
+        if len(self._marks) == 0 and log != None:
+            log.hold()
+
+        self._marks.append(
+            (len(self._journal), log.pending_length if log != None else 0)
+        )
+
+    def watch(self, store):
+        # start journalling a store - called before anything is written to it
+        if threading.get_ident() != self._thread:
+            return
+
+        if store._journal == None:
+            store._journal = self._journal
+            store._journal_thread = self._thread
+            self._watched[id(store)] = store
+
+    def record(self, entry: tuple):
+        if threading.get_ident() == self._thread:
+            self._journal.append(entry)
+
+    def commit(self):
+        # an inner commit hands its changes on to the transaction around it, the outermost one
+        # makes them permanent
+        self._marks.pop()
+        if len(self._marks) == 0:
+            self._finish()
+
+    def rollback(self):
+        journal_length, pending_length = self._marks.pop()
+        entries = self._journal[journal_length:]
+        del self._journal[journal_length:]
+
+        if self._collection._log != None:
+            self._collection._log.discard(pending_length)
+
+        # strictly newest first, so every change is undone against the state it was made in -
+        # but each run of quote changes between two registrations is undone as one batch
+        quote_entries = []
+        for entry in reversed(entries):
+            if not isinstance(entry[0], str):
+                quote_entries.append(entry)
+                continue
+
+            self._undo_quotes(quote_entries)
+            quote_entries = []
+            if entry[0] == "sector":
+                self._collection._remove_sector(entry[1])
+            elif entry[0] == "company":
+                _, sector, company, before = entry
+                sector._remove_company(company, before)
+            elif entry[0] == "index":
+                self._collection._unindex_company(entry[1])
+
+        self._undo_quotes(quote_entries)
+
+        if len(self._marks) == 0:
+            self._finish()
+
+    def _undo_quotes(self, entries: List[tuple]):
+        # entries newest first.  Replaced rows are put back while every inserted row is still
+        # there to be found by date, then each store has its inserted rows taken out in one go
+        changes = {}
+        for entry in entries:
+            changes.setdefault(id(entry[0]), []).append(entry)
+
+        for key, store_entries in changes.items():
+            store = self._watched[key]
+            # locked like any other write, until the owner has caught up
+            with store._lock.write():
+                self._undo_store(store, store_entries)
+
+    def _undo_store(self, store, entries: List[tuple]):
+        # first position touched by each restore and by the removal
+        positions = []
+        inserted = []
+        for _, dates, previous in entries:
+            if previous == None:
+                inserted.append(np.atleast_1d(dates))
+            else:
+                positions.append(store._restore(previous))
+
+        removed = 0
+        if len(inserted) > 0:
+            dates = np.concatenate(inserted)
+            removed = len(dates)
+            positions.append(store._remove(dates))
+
+        # let the owner drop anything it worked out from the rows that changed
+        if store._quote_class is SectorQuote:
+            store._parent._sector_changed(quotes_added=-removed)
+        else:
+            store._parent._quotes_changed(
+                quotes_added=-removed, rewritten_from=min(positions)
+            )
+
+    def _finish(self):
+        for store in self._watched.values():
+            store._journal = None
+            store._journal_thread = None
+        self._watched.clear()
+        self._journal.clear()
+
+        log = self._collection._log
+        if log != None:
+            log.release()
+
+        self._collection._transaction = None
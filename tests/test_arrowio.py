@@ -0,0 +1,159 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+CONST_START_DATE = datetime(2020, 10, 1)
+CONST_COLUMNS = ("dates", "open", "high", "low", "close", "volume")
+
+
+def build_collection() -> SectorCollection:
+    collection = SectorCollection("asx test")
+    cutlery = Sector(sector_name="Cutlery", sector_code="xcj")
+    crockery = Sector(sector_name="Crockery", sector_code="xcr")
+    collection.add_sector(cutlery)
+    collection.add_sector(crockery)
+
+    for sector, company_code, days in [
+        (cutlery, "kni", range(5)),
+        (cutlery, "spo", range(0, 5, 2)),
+        (crockery, "plt", range(3)),
+    ]:
+        company = Company(company_name=company_code.upper(), company_code=company_code)
+        sector.add_company(company)
+        company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), 1, 2, 0.5, day, 10 + day)
+                for day in days
+            ]
+        )
+    cutlery.add_sector_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+    return collection
+
+
+class TestArrowMissing(unittest.TestCase):
+    @unittest.skipIf(pyarrow != None, "pyarrow is installed")
+    def test_needs_pyarrow(self):
+        collection = build_collection()
+        self.assertRaises(ImportError, collection.to_arrow)
+        self.assertRaises(ImportError, collection.get_company("kni").to_arrow)
+
+
+@unittest.skipIf(pyarrow == None, "pyarrow isn't installed")
+class TestArrow(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = build_collection()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def assertSameQuotes(self, store_a, store_b):
+        for column in CONST_COLUMNS:
+            np.testing.assert_array_equal(
+                getattr(store_a, column), getattr(store_b, column)
+            )
+
+    def test_company_round_trip(self):
+        company = self.test_collection.get_company("kni")
+        table = company.to_arrow()
+
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(
+            table.column_names, ["date", "open", "high", "low", "close", "volume"]
+        )
+
+        result = Company.from_arrow(table)
+        self.assertEqual(result.company_code, "kni")
+        self.assertEqual(result.company_name, "KNI")
+        self.assertSameQuotes(result._quotes, company._quotes)
+        self.assertEqual(
+            [quote.close for quote in result.get_quote().values()],
+            [quote.close for quote in company.get_quote().values()],
+        )
+
+    def test_export_is_zero_copy(self):
+        store = self.test_collection.get_company("kni")._quotes
+        table = self.test_collection.get_company("kni").to_arrow()
+        self.assertEqual(
+            np.shares_memory(table.column("close").chunk(0).to_numpy(), store._close),
+            True,
+        )
+
+    def test_import_is_zero_copy(self):
+        table = self.test_collection.get_company("kni").to_arrow()
+        result = Company.from_arrow(table)
+        self.assertEqual(
+            np.shares_memory(
+                result._quotes._close, table.column("close").chunk(0).to_numpy()
+            ),
+            True,
+        )
+
+        # and it still takes new quotes, copying the columns the first time
+        result.add_quote(CONST_START_DATE + timedelta(days=10), 1, 1, 1, 1, 1)
+        self.assertEqual(result.length, 6)
+
+    def test_sector_round_trip(self):
+        sector = self.test_collection.get_sector("xcj")
+        table = sector.to_arrow()
+        self.assertEqual(len(table.to_batches()), 3)
+
+        result = Sector.from_arrow(table.to_batches())
+        self.assertEqual(result.sector_name, "Cutlery")
+        self.assertEqual(list(result._companies), ["kni", "spo"])
+        self.assertEqual(result.company_quote_length, 8)
+        self.assertSameQuotes(result._quotes, sector._quotes)
+        self.assertSameQuotes(
+            result.get_company("spo")._quotes, sector.get_company("spo")._quotes
+        )
+
+    def test_collection_ipc_file(self):
+        path = os.path.join(self.directory.name, "collection.arrow")
+        self.test_collection.write_arrow(path)
+
+        for mmap in (True, False):
+            result = SectorCollection.read_arrow(path, mmap=mmap)
+            self.assertEqual(result.name, "asx test")
+            self.assertEqual(result.sector_length, 2)
+            self.assertEqual(result.company_quote_length, 11)
+            self.assertEqual(result.sector_quote_length, 1)
+            self.assertEqual(result.get_company("plt").sector_code, "xcr")
+            for company_code in ("kni", "spo", "plt"):
+                self.assertSameQuotes(
+                    result.get_company(company_code)._quotes,
+                    self.test_collection.get_company(company_code)._quotes,
+                )
+
+    def test_rechunked_table(self):
+        table = self.test_collection.to_arrow().combine_chunks()
+        result = SectorCollection.from_arrow(table)
+        self.assertSameQuotes(
+            result.get_company("spo")._quotes,
+            self.test_collection.get_company("spo")._quotes,
+        )
+
+    def test_wrong_shape(self):
+        table = self.test_collection.to_arrow()
+        self.assertRaises(ValueError, Company.from_arrow, table)
+        self.assertRaises(ValueError, Sector.from_arrow, table)
+        self.assertRaises(
+            ValueError,
+            SectorCollection.from_arrow,
+            self.test_collection.get_company("kni").to_arrow(),
+        )
+        self.assertRaises(
+            ValueError, Company.from_arrow, pyarrow.table({"date": [1, 2]})
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,396 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.rwlock import RWLock
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+
+CONST_START_DATE = datetime(2020, 1, 1)
+CONST_COMPANIES = 6
+CONST_DAYS = 120
+
+
+def price(date: datetime) -> float:
+    # every quote's prices come from its date, so a quote read half written shows up
+    return float(date.toordinal() % 997 + 1)
+
+
+def record(code: str, days) -> dict:
+    quotes = [
+        {
+            "quote_date": (CONST_START_DATE + timedelta(days=day)).strftime("%Y-%m-%d"),
+            "stock_code": code,
+            "open": price(CONST_START_DATE + timedelta(days=day)),
+            "high": price(CONST_START_DATE + timedelta(days=day)),
+            "low": price(CONST_START_DATE + timedelta(days=day)),
+            "close": price(CONST_START_DATE + timedelta(days=day)),
+            "volume": day + 1,
+        }
+        for day in days
+    ]
+    return {
+        "messageId": f"{code}-{days[0]}",
+        "body": json.dumps({"quoteObject": quotes}),
+        "messageAttributes": {"QuoteType": {"stringValue": "stock"}},
+    }
+
+
+def run_threads(targets) -> list:
+    # runs every target in its own thread, returns whatever they raised
+    errors = []
+
+    def guarded(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+        if thread.is_alive():
+            errors.append(RuntimeError("thread didn't finish - deadlocked?"))
+
+    return errors
+
+
+class TestRWLock(unittest.TestCase):
+    def setUp(self):
+        self.lock = RWLock()
+
+    def test_readers_share(self):
+        inside = threading.Barrier(3, timeout=5)
+
+        def reader():
+            with self.lock.read():
+                # all three only get past this if they hold the lock together
+                inside.wait()
+
+        self.assertEqual(run_threads([reader, reader, reader]), [])
+
+    def test_writer_excludes(self):
+        holding = []
+        overlaps = []
+
+        def writer():
+            for _ in range(200):
+                with self.lock.write():
+                    holding.append(1)
+                    if len(holding) > 1:
+                        overlaps.append(1)
+                    holding.pop()
+
+        def reader():
+            for _ in range(200):
+                with self.lock.read():
+                    if len(holding) > 0:
+                        overlaps.append(1)
+
+        self.assertEqual(run_threads([writer, writer, reader, reader]), [])
+        self.assertEqual(overlaps, [])
+
+    def test_waiting_writer_goes_first(self):
+        order = []
+        reading = threading.Event()
+        release = threading.Event()
+
+        def first_reader():
+            with self.lock.read():
+                reading.set()
+                release.wait(5)
+            order.append("first reader")
+
+        def writer():
+            with self.lock.write():
+                order.append("writer")
+
+        def late_reader():
+            with self.lock.read():
+                order.append("late reader")
+
+        threads = [threading.Thread(target=first_reader)]
+        threads[0].start()
+        reading.wait(5)
+
+        threads.append(threading.Thread(target=writer))
+        threads[1].start()
+        while self.lock._writers_waiting == 0:
+            time.sleep(0.001)
+
+        threads.append(threading.Thread(target=late_reader))
+        threads[2].start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(order, ["first reader", "writer", "late reader"])
+
+    def test_reentrant(self):
+        with self.lock.write():
+            with self.lock.write():
+                with self.lock.read():
+                    pass
+        with self.lock.read():
+            with self.lock.read():
+                pass
+
+        # everything let go - another thread can write
+        def writer():
+            with self.lock.write():
+                pass
+
+        self.assertEqual(run_threads([writer]), [])
+
+    def test_no_upgrade(self):
+        with self.lock.read():
+            with self.assertRaises(RuntimeError):
+                with self.lock.write():
+                    pass
+
+        with self.lock.write():
+            pass
+
+
+class TestConcurrentCollection(unittest.TestCase):
+    def setUp(self):
+        self.collection = SectorCollection("asx test", cache_size=64)
+        self.sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.collection.add_sector(self.sector)
+        self.codes = [f"c{number}" for number in range(CONST_COMPANIES)]
+        for code in self.codes:
+            self.sector.add_company(Company(company_name=code, company_code=code))
+
+    def check_quotes(self, matched: dict):
+        for code, quotes in matched.items():
+            for date, quote in quotes.items():
+                self.assertEqual(quote.date, date)
+                self.assertEqual(quote.close, price(date))
+                self.assertEqual(quote.open, quote.close)
+
+    def test_queries_during_ingest(self):
+        stop = threading.Event()
+        writers_done = []
+
+        def finished():
+            writers_done.append(1)
+            if len(writers_done) == 2:
+                stop.set()
+
+        # the first half of the companies come in through load_sqs, newest days first so most
+        # quotes land in the middle of the history and shift everything after them along
+        def sqs_writer():
+            try:
+                for chunk in reversed(range(0, CONST_DAYS, 10)):
+                    self.collection.load_sqs(
+                        {
+                            "Records": [
+                                record(code, list(range(chunk, chunk + 10)))
+                                for code in self.codes[: CONST_COMPANIES // 2]
+                            ]
+                        }
+                    )
+            finally:
+                finished()
+
+        # and the rest one quote at a time, alternating ends of the history
+        def quote_writer():
+            days = [
+                day
+                for pair in zip(range(CONST_DAYS // 2), reversed(range(CONST_DAYS)))
+                for day in pair
+            ]
+            try:
+                for day in days:
+                    date = CONST_START_DATE + timedelta(days=day)
+                    for code in self.codes[CONST_COMPANIES // 2 :]:
+                        self.collection.get_company(code).add_quote(
+                            date,
+                            price(date),
+                            price(date),
+                            price(date),
+                            price(date),
+                            day + 1,
+                        )
+            finally:
+                finished()
+
+        def reader():
+            while not stop.is_set():
+                self.check_quotes(self.collection.get_company_quote())
+                self.check_quotes(
+                    self.collection.get_company_quote(
+                        company_codes=[self.codes[0], self.codes[-1]],
+                        date_from=CONST_START_DATE + timedelta(days=20),
+                        date_to=CONST_START_DATE + timedelta(days=40),
+                    )
+                )
+                for code, date, quote in self.collection.iter_company_quotes():
+                    self.assertEqual(quote.close, price(date))
+
+                panel = self.collection.get_panel(field="close")
+                self.assertEqual(
+                    panel.values.shape, (CONST_COMPANIES, len(panel.dates))
+                )
+
+                snapshot = self.collection.get_snapshot(
+                    CONST_START_DATE + timedelta(days=CONST_DAYS - 1)
+                )
+                for close in snapshot["close"]:
+                    self.assertEqual(
+                        close, price(CONST_START_DATE + timedelta(days=CONST_DAYS - 1))
+                    )
+
+                self.sector.get_index()
+                self.collection.correlation()
+
+        errors = run_threads([sqs_writer, quote_writer, reader, reader, reader])
+        self.assertEqual(errors, [])
+
+        # every quote counted once, and nothing stale left in the caches
+        self.assertEqual(
+            self.collection.company_quote_length, CONST_COMPANIES * CONST_DAYS
+        )
+        self.assertEqual(self.sector.company_quote_length, CONST_COMPANIES * CONST_DAYS)
+        for code in self.codes:
+            self.assertEqual(self.collection.get_company(code).length, CONST_DAYS)
+
+        matched = self.collection.get_company_quote()
+        self.assertEqual(
+            sum(len(quotes) for quotes in matched.values()),
+            CONST_COMPANIES * CONST_DAYS,
+        )
+        self.check_quotes(matched)
+        self.assertEqual(
+            self.collection.get_panel(field="close").shape,
+            (CONST_COMPANIES, CONST_DAYS),
+        )
+        self.assertEqual(len(self.sector.get_index()), CONST_DAYS)
+
+    def test_companies_join_during_queries(self):
+        stop = threading.Event()
+
+        def joiner():
+            try:
+                for number in range(50):
+                    sector = Sector(sector_name="New", sector_code=f"n{number}")
+                    company = Company(company_name="New", company_code=f"n{number}")
+                    company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+                    sector.add_company(company)
+                    self.collection.add_sector(sector)
+                    self.sector.add_company(
+                        Company(company_name="New", company_code=f"m{number}")
+                    )
+            finally:
+                stop.set()
+
+        def reader():
+            while not stop.is_set():
+                self.collection.get_company_quote()
+                self.collection.get_sector_quote()
+                list(self.collection.iter_company_quotes())
+                self.collection.get_snapshot(CONST_START_DATE)
+                self.collection.duplicate_counts
+
+        self.assertEqual(run_threads([joiner, reader, reader]), [])
+        self.assertEqual(self.collection.sector_length, 51)
+        self.assertEqual(self.collection.company_length, CONST_COMPANIES + 100)
+        self.assertEqual(self.collection.company_quote_length, 50)
+        self.assertEqual(
+            len(self.collection.get_company_quote()), CONST_COMPANIES + 100
+        )
+
+    def test_rollback_leaves_other_threads_alone(self):
+        company = self.collection.get_company(self.codes[0])
+        other = self.collection.get_company(self.codes[1])
+        added = threading.Event()
+        other_done = threading.Event()
+
+        def transaction():
+            try:
+                with self.collection.transaction():
+                    company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+                    added.set()
+                    other_done.wait(5)
+                    raise QuoteAlreadyExists(code="c0", date=CONST_START_DATE)
+            except QuoteAlreadyExists:
+                pass
+
+        def other_thread():
+            added.wait(5)
+            # straight into a company the transaction wrote to, and one it didn't
+            company.add_quote(CONST_START_DATE + timedelta(days=1), 2, 2, 2, 2, 2)
+            other.add_quote(CONST_START_DATE, 3, 3, 3, 3, 3)
+            other_done.set()
+
+        self.assertEqual(run_threads([transaction, other_thread]), [])
+        self.assertEqual(
+            list(company.get_quote(date_from=CONST_START_DATE)),
+            [CONST_START_DATE + timedelta(days=1)],
+        )
+        self.assertEqual(other.length, 1)
+        self.assertEqual(self.collection.company_quote_length, 2)
+
+    def test_transactions_take_turns(self):
+        inside = []
+        overlaps = []
+
+        def loader(code: str):
+            def load():
+                for chunk in range(0, 40, 10):
+                    with self.collection.transaction():
+                        inside.append(code)
+                        if len(inside) > 1:
+                            overlaps.append(code)
+                        self.collection.load_sqs(
+                            {"Records": [record(code, list(range(chunk, chunk + 10)))]}
+                        )
+                        inside.remove(code)
+
+            return load
+
+        self.assertEqual(run_threads([loader(code) for code in self.codes]), [])
+        self.assertEqual(overlaps, [])
+        self.assertEqual(self.collection.company_quote_length, CONST_COMPANIES * 40)
+
+    def test_log_during_ingest(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.collection.attach_log(os.path.join(path, "wal"))
+
+            def writer(code: str):
+                def write():
+                    for day in range(CONST_DAYS):
+                        date = CONST_START_DATE + timedelta(days=day)
+                        self.collection.get_company(code).add_quote(
+                            date, price(date), price(date), price(date), price(date), 1
+                        )
+
+                return write
+
+            def compactor():
+                for _ in range(5):
+                    self.collection.compact()
+
+            errors = run_threads([writer(code) for code in self.codes] + [compactor])
+            self.assertEqual(errors, [])
+            self.collection.close_log()
+
+            recovered = SectorCollection.recover(os.path.join(path, "wal"))
+            self.assertEqual(
+                recovered.company_quote_length, CONST_COMPANIES * CONST_DAYS
+            )
+            self.check_quotes(recovered.get_company_quote())
+            recovered.close_log()
+
+
+if __name__ == "__main__":
+    unittest.main()
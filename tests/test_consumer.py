@@ -0,0 +1,145 @@
+import unittest
+import asyncio
+import json
+
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.consumer import QueueSource
+
+
+def make_payload(code: str, day: int, message_type: str = "stock") -> dict:
+    code_key = "stock_code" if message_type == "stock" else "sector_code"
+    return {
+        "Records": [
+            {
+                "messageId": f"{code}-{day}",
+                "body": json.dumps(
+                    {
+                        "quoteObject": [
+                            {
+                                "quote_date": f"2021-03-{day:02d}",
+                                code_key: code,
+                                "open": 1,
+                                "high": 1,
+                                "low": 1,
+                                "close": day,
+                                "volume": 0,
+                            }
+                        ]
+                    }
+                ),
+                "messageAttributes": {"QuoteType": {"stringValue": message_type}},
+            }
+        ]
+    }
+
+
+class SlowSource(QueueSource):
+    # acks take a while, and it keeps track of how many payloads are out at once
+    def __init__(self):
+        super().__init__()
+        self.out = 0
+        self.most_out = 0
+
+    async def receive(self):
+        payload = await super().receive()
+        if payload != None:
+            self.out += 1
+            self.most_out = max(self.most_out, self.out)
+        return payload
+
+    async def ack(self, payload):
+        await asyncio.sleep(0.01)
+        self.out -= 1
+        await super().ack(payload)
+
+
+class TestConsumer(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+
+    def consume(self, payloads, source=None, **kwargs) -> int:
+        source = source or QueueSource()
+        self.source = source
+
+        async def run():
+            for payload in payloads:
+                await source.put(payload)
+            await source.close()
+            return await self.test_collection.consume(source, **kwargs)
+
+        return asyncio.run(run())
+
+    def test_consume(self):
+        payloads = [make_payload("8ec", day) for day in range(1, 6)]
+        payloads.append(make_payload("xmj", 1, message_type="sector"))
+
+        self.assertEqual(self.consume(payloads), 6)
+        self.assertEqual(self.source.acked, payloads)
+        self.assertEqual(self.source.nacked, [])
+
+        # every stock payload landed in the one Boilerplate sector
+        self.assertEqual(self.test_collection.get_company("8ec").length, 5)
+        self.assertEqual(self.test_collection.get_sector("xmj").sector_quote_length, 1)
+        self.assertEqual(
+            list(self.test_collection.get_sector("Boilerplate")._companies), ["8ec"]
+        )
+
+    def test_bad_payload_is_nacked(self):
+        payloads = [
+            make_payload("8ec", 1),
+            make_payload("8ec", 1),
+            make_payload("8ec", 2),
+        ]
+
+        self.assertEqual(self.consume(payloads), 2)
+        self.assertEqual(self.source.acked, [payloads[0], payloads[2]])
+        self.assertEqual(len(self.source.nacked), 1)
+        self.assertEqual(self.source.nacked[0][0], payloads[1])
+
+    def test_backpressure(self):
+        payloads = [make_payload("8ec", day) for day in range(1, 21)]
+        source = SlowSource()
+
+        self.assertEqual(self.consume(payloads, source=source, max_in_flight=3), 20)
+        self.assertEqual(source.most_out, 3)
+        self.assertEqual(len(source.acked), 20)
+
+    def test_callbacks(self):
+        acked = []
+        nacked = []
+        payloads = [make_payload("8ec", 1), make_payload("8ec", 1)]
+
+        self.consume(
+            payloads,
+            on_ack=acked.append,
+            on_nack=lambda payload, error: nacked.append(payload),
+        )
+        self.assertEqual(acked, [payloads[0]])
+        self.assertEqual(nacked, [payloads[1]])
+        self.assertEqual(self.source.acked, [])
+
+    def test_source_error(self):
+        class BrokenSource:
+            async def receive(self):
+                raise ConnectionError("gone")
+
+        self.assertRaises(
+            ConnectionError,
+            asyncio.run,
+            self.test_collection.consume(BrokenSource()),
+        )
+
+    def test_ack_error(self):
+        def on_ack(payload):
+            raise RuntimeError("ack failed")
+
+        self.assertRaises(
+            RuntimeError, self.consume, [make_payload("8ec", 1)], on_ack=on_ack
+        )
+
+    def test_bad_max_in_flight(self):
+        self.assertRaises(ValueError, self.consume, [], max_in_flight=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
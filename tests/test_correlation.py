@@ -0,0 +1,118 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.correlation import correlate
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestCorrelation(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.other_sector = Sector(sector_name="Crockery", sector_code="xcr")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_collection.add_sector(self.other_sector)
+
+        generator = np.random.default_rng(1)
+        self.closes = {}
+        for sector, company_code in [
+            (self.test_sector, "kni"),
+            (self.test_sector, "spo"),
+            (self.test_sector, "frk"),
+            (self.other_sector, "plt"),
+        ]:
+            closes = 100 * np.exp(np.cumsum(generator.normal(0, 0.01, 30)))
+            self.closes[company_code] = closes
+            company = Company(company_name=company_code, company_code=company_code)
+            sector.add_company(company)
+            company.add_quotes(
+                date=[CONST_START_DATE + timedelta(days=day) for day in range(30)],
+                open=closes,
+                high=closes,
+                low=closes,
+                close=closes,
+                volume=np.ones(30),
+            )
+
+    def test_matches_corrcoef(self):
+        result = self.test_sector.correlation()
+        expected = np.corrcoef(
+            [np.diff(np.log(self.closes[code])) for code in ("kni", "spo", "frk")]
+        )
+
+        self.assertEqual(list(result.codes), ["kni", "spo", "frk"])
+        np.testing.assert_allclose(result.values, expected)
+        self.assertAlmostEqual(result.get("spo", "frk"), expected[1, 2])
+        self.assertAlmostEqual(result.get("kni", "kni"), 1)
+
+    def test_blocks_give_the_same_answer(self):
+        panel = self.test_collection.get_panel()
+        np.testing.assert_allclose(
+            correlate(panel, block_size=1).values,
+            correlate(panel, block_size=1000).values,
+        )
+        self.assertRaises(ValueError, correlate, panel, 0)
+
+    def test_date_range(self):
+        result = self.test_sector.correlation(
+            date_from=CONST_START_DATE, date_to=CONST_START_DATE + timedelta(days=9)
+        )
+        expected = np.corrcoef(
+            [np.diff(np.log(self.closes[code][:10])) for code in ("kni", "spo")]
+        )
+        self.assertAlmostEqual(result.get("kni", "spo"), expected[0, 1])
+
+    def test_gaps_use_shared_days(self):
+        # frk misses a day - its returns either side are dropped, just for pairs with frk
+        company = Company(company_name="Ladles", company_code="ldl")
+        self.test_sector.add_company(company)
+        closes = self.closes["kni"] * 2
+        for day in range(30):
+            if day != 10:
+                company.add_quote(
+                    CONST_START_DATE + timedelta(days=day), 1, 1, 1, closes[day], 1
+                )
+
+        result = self.test_sector.correlation()
+        self.assertAlmostEqual(result.get("kni", "ldl"), 1)
+        self.assertEqual(np.isnan(result.values).any(), False)
+
+    def test_too_little_data(self):
+        result = self.test_sector.correlation(
+            date_from=CONST_START_DATE, date_to=CONST_START_DATE
+        )
+        self.assertEqual(result.shape, (3, 3))
+        self.assertEqual(np.isnan(result.values).all(), True)
+
+    def test_cached_until_new_quote(self):
+        first = self.test_sector.correlation()
+        self.assertEqual(self.test_sector.correlation() is first, True)
+        self.assertEqual(first.values.flags.writeable, False)
+
+        self.test_collection.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=30), 1, 1, 1, 1, 1
+        )
+        self.assertEqual(self.test_sector.correlation() is first, False)
+
+    def test_collection(self):
+        result = self.test_collection.correlation()
+        self.assertEqual(list(result.codes), ["kni", "spo", "frk", "plt"])
+        self.assertAlmostEqual(
+            result.get("kni", "spo"), self.test_sector.correlation().get("kni", "spo")
+        )
+
+        first = result
+        self.assertEqual(self.test_collection.correlation() is first, True)
+        self.test_collection.get_company("plt").add_quote(
+            CONST_START_DATE + timedelta(days=30), 1, 1, 1, 1, 1
+        )
+        self.assertEqual(self.test_collection.correlation() is first, False)
+
+
+if __name__ == "__main__":
+    unittest.main()
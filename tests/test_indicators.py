@@ -0,0 +1,173 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.indicators import SMA, EMA, VWAP, ATR
+from stockobjects.stockobjectsexceptions import (
+    IndicatorAlreadyExists,
+    IndicatorDoesNotExist,
+)
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+def make_row(day: int) -> tuple:
+    close = 10 + (day * 7 % 5)
+    return (
+        CONST_START_DATE + timedelta(days=day),
+        close - 0.5,
+        close + day % 3,
+        close - 1,
+        close,
+        day % 4 + 1,
+    )
+
+
+def add_all(company: Company):
+    company.add_indicator("sma", SMA(3))
+    company.add_indicator("ema", EMA(3))
+    company.add_indicator("vwap", VWAP())
+    company.add_indicator("atr", ATR(3))
+
+
+class TestIndicators(unittest.TestCase):
+    def setUp(self):
+        self.test_company = Company(company_name="Knives", company_code="kni")
+
+    def test_sma(self):
+        self.test_company.add_quotes(rows=[make_row(day) for day in range(6)])
+        sma = self.test_company.add_indicator("sma", SMA(3))
+
+        closes = self.test_company._quotes.close
+        self.assertEqual(list(np.isnan(sma.history[:2])), [True, True])
+        self.assertAlmostEqual(sma.history[2], closes[:3].mean())
+        self.assertAlmostEqual(sma.value, closes[3:].mean())
+        self.assertEqual(list(sma.dates), list(self.test_company._quotes.dates))
+
+    def test_ema(self):
+        self.test_company.add_quotes(rows=[make_row(day) for day in range(3)])
+        ema = self.test_company.add_indicator("ema", EMA(3))
+
+        closes = self.test_company._quotes.close
+        expected = closes[0]
+        for close in closes[1:]:
+            expected = 0.5 * close + 0.5 * expected
+        self.assertAlmostEqual(ema.value, expected)
+
+    def test_vwap(self):
+        self.test_company.add_quotes(rows=[make_row(day) for day in range(5)])
+        vwap = self.test_company.add_indicator("vwap", VWAP())
+
+        store = self.test_company._quotes
+        typical = (store.high + store.low + store.close) / 3
+        self.assertAlmostEqual(
+            vwap.value, (typical * store.volume).sum() / store.volume.sum()
+        )
+
+    def test_atr(self):
+        self.test_company.add_quotes(rows=[make_row(day) for day in range(5)])
+        atr = self.test_company.add_indicator("atr", ATR(3))
+
+        store = self.test_company._quotes
+        true_range = [store.high[0] - store.low[0]] + [
+            max(
+                store.high[i] - store.low[i],
+                abs(store.high[i] - store.close[i - 1]),
+                abs(store.low[i] - store.close[i - 1]),
+            )
+            for i in range(1, 5)
+        ]
+        expected = sum(true_range[:3]) / 3
+        self.assertEqual(list(np.isnan(atr.history[:2])), [True, True])
+        self.assertAlmostEqual(atr.history[2], expected)
+        for tr in true_range[3:]:
+            expected = (expected * 2 + tr) / 3
+        self.assertAlmostEqual(atr.value, expected)
+
+    def test_appends_match_from_scratch(self):
+        add_all(self.test_company)
+        for day in range(20):
+            self.test_company.add_quote(*make_row(day))
+
+        rebuilt = Company(company_name="Knives", company_code="kni")
+        rebuilt.add_quotes(rows=[make_row(day) for day in range(20)])
+        add_all(rebuilt)
+
+        for name in ("sma", "ema", "vwap", "atr"):
+            np.testing.assert_allclose(
+                self.test_company.get_indicator(name).history,
+                rebuilt.get_indicator(name).history,
+            )
+
+    def test_out_of_order_insert(self):
+        add_all(self.test_company)
+        days = [day for day in range(20) if day not in (5, 12, 13)]
+        for day in days:
+            self.test_company.add_quote(*make_row(day))
+
+        # history before the insert stays as it was
+        before = self.test_company.get_indicator("ema").history[:5].copy()
+
+        self.test_company.add_quote(*make_row(5))
+        self.test_company.add_quotes(rows=[make_row(12), make_row(13)])
+        np.testing.assert_array_equal(
+            self.test_company.get_indicator("ema").history[:5], before
+        )
+
+        rebuilt = Company(company_name="Knives", company_code="kni")
+        rebuilt.add_quotes(rows=[make_row(day) for day in range(20)])
+        add_all(rebuilt)
+
+        for name in ("sma", "ema", "vwap", "atr"):
+            indicator = self.test_company.get_indicator(name)
+            self.assertEqual(indicator.length, 20)
+            np.testing.assert_allclose(
+                indicator.history, rebuilt.get_indicator(name).history
+            )
+
+    def test_empty(self):
+        sma = self.test_company.add_indicator("sma", SMA(3))
+        self.assertEqual(sma.length, 0)
+        self.assertEqual(np.isnan(sma.value), True)
+
+    def test_registry(self):
+        sma = self.test_company.add_indicator("sma", SMA(3))
+        self.assertEqual(self.test_company.get_indicator("sma") is sma, True)
+        self.assertEqual(list(self.test_company.indicators), ["sma"])
+
+        self.assertRaises(
+            IndicatorAlreadyExists, self.test_company.add_indicator, "sma", SMA(5)
+        )
+        self.assertRaises(TypeError, self.test_company.add_indicator, "x", "sma")
+        self.assertRaises(ValueError, SMA, 0)
+
+        self.test_company.remove_indicator("sma")
+        self.assertRaises(IndicatorDoesNotExist, self.test_company.get_indicator, "sma")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestIndicatorsRewritten(unittest.TestCase):
+    def test_overwritten_quote_is_recomputed(self):
+        test_company = Company(company_name="Knives", company_code="kni")
+        test_company.add_quotes(rows=[make_row(day) for day in range(6)])
+        add_all(test_company)
+
+        # change a close in the middle, then build the same thing from scratch to compare against
+        row = list(make_row(2))
+        row[4] = 30
+        test_company.add_quote(*row, on_duplicate="overwrite")
+
+        fresh = Company(company_name="Knives", company_code="kni")
+        fresh.add_quotes(rows=[make_row(day) for day in range(6)])
+        fresh.add_quote(*row, on_duplicate="overwrite")
+        add_all(fresh)
+
+        for name in ("sma", "ema", "vwap", "atr"):
+            np.testing.assert_allclose(
+                test_company.get_indicator(name).history,
+                fresh.get_indicator(name).history,
+            )
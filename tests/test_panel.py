@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.panel import build_panel
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestPanel(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+
+        # kni trades every day, spo only on even days
+        for company_code, days in [("kni", range(6)), ("spo", range(0, 6, 2))]:
+            company = Company(company_name=company_code, company_code=company_code)
+            self.test_sector.add_company(company)
+            company.add_quotes(
+                rows=[
+                    (CONST_START_DATE + timedelta(days=day, hours=16), 1, 1, 1, day, 1)
+                    for day in days
+                ]
+            )
+
+    def test_full_panel(self):
+        result = self.test_collection.get_panel()
+
+        self.assertEqual(list(result.codes), ["kni", "spo"])
+        self.assertEqual(result.shape, (2, 6))
+        self.assertEqual(result.dates[0], np.datetime64("2020-10-01"))
+        self.assertEqual(list(result.values[0]), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(list(np.isnan(result.values[1])), [False, True] * 3)
+
+    def test_range_is_a_view(self):
+        full = self.test_collection.get_panel(field="close")
+        result = self.test_collection.get_panel(
+            field="close",
+            date_from=CONST_START_DATE + timedelta(days=2),
+            date_to=CONST_START_DATE + timedelta(days=3),
+        )
+
+        self.assertEqual(result.shape, (2, 2))
+        self.assertEqual(list(result.values[0]), [2, 3])
+        self.assertEqual(np.shares_memory(result.values, full.values), True)
+        self.assertEqual(result.codes is full.codes, True)
+
+    def test_read_only(self):
+        result = self.test_collection.get_panel()
+        self.assertRaises(ValueError, result.values.__setitem__, (0, 0), 100)
+
+    def test_new_quote_rebuilds_panel(self):
+        first = self.test_sector.get_panel()
+        self.test_collection.get_company("spo").add_quote(
+            CONST_START_DATE + timedelta(days=1), 1, 1, 1, 10, 1
+        )
+        second = self.test_sector.get_panel()
+
+        self.assertEqual(np.isnan(first.values[1, 1]), True)
+        self.assertEqual(second.values[1, 1], 10)
+
+    def test_panel_reused_between_calls(self):
+        first = self.test_collection.get_panel(date=CONST_START_DATE)
+        second = self.test_collection.get_panel(
+            date=CONST_START_DATE + timedelta(days=1)
+        )
+
+        self.assertEqual(first.dates.base is second.dates.base, True)
+
+    def test_empty(self):
+        result = build_panel([], field="volume")
+        self.assertEqual(result.shape, (0, 0))
+
+    def test_bad_field(self):
+        self.assertRaises(ValueError, self.test_collection.get_panel, field="price")
@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime, date
+import numpy as np
+
+from stockobjects.parsing import (
+    DateParser,
+    parse_quote_date,
+    parse_quote_dates,
+    _parse_quote_date_string,
+)
+from stockobjects.stockobjectsexceptions import InvalidDateOptions
+
+
+class TestDateParser(unittest.TestCase):
+    def test_date_trims_time(self):
+        dates = DateParser(date=datetime(2020, 10, 1, 13, 30))
+        self.assertEqual(dates.date_from, date(2020, 10, 1))
+        self.assertEqual(dates.date_to, date(2020, 10, 1))
+
+    def test_invalid_options(self):
+        self.assertRaises(
+            InvalidDateOptions,
+            DateParser,
+            date_from=datetime(2020, 10, 1),
+            date=datetime(2020, 10, 1),
+        )
+
+
+class TestParseQuoteDate(unittest.TestCase):
+    def test_string(self):
+        self.assertEqual(
+            parse_quote_date("2021-03-30"), np.datetime64("2021-03-30T00:00", "us")
+        )
+
+    def test_datetime(self):
+        self.assertEqual(
+            parse_quote_date(datetime(2021, 3, 30, 9, 15)),
+            np.datetime64("2021-03-30T09:15", "us"),
+        )
+
+    def test_string_is_cached(self):
+        _parse_quote_date_string.cache_clear()
+        for _ in range(5):
+            parse_quote_date("2021-03-30")
+
+        self.assertEqual(_parse_quote_date_string.cache_info().misses, 1)
+        self.assertEqual(_parse_quote_date_string.cache_info().hits, 4)
+
+    def test_bad_string(self):
+        self.assertRaises(TypeError, parse_quote_date, "not a date")
+
+    def test_column_of_strings(self):
+        _parse_quote_date_string.cache_clear()
+        result = parse_quote_dates(["2021-03-31", "2021-03-30", "2021-03-31"])
+
+        self.assertEqual(
+            list(result),
+            [
+                np.datetime64("2021-03-31", "us"),
+                np.datetime64("2021-03-30", "us"),
+                np.datetime64("2021-03-31", "us"),
+            ],
+        )
+        # only the distinct strings get parsed
+        self.assertEqual(_parse_quote_date_string.cache_info().misses, 2)
+
+    def test_column_of_datetimes(self):
+        result = parse_quote_dates([datetime(2021, 3, 30), datetime(2021, 3, 31)])
+        self.assertEqual(result.dtype, np.dtype("datetime64[us]"))
+        self.assertEqual(len(result), 2)
@@ -0,0 +1,141 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.shardedsectorcollection import ShardedSectorCollection
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestPersistence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "collection")
+
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.empty_sector = Sector(sector_name="Crockery", sector_code="xcr")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_collection.add_sector(self.empty_sector)
+
+        for company_code, days in [("kni", range(5)), ("spo", range(0, 5, 2))]:
+            company = Company(
+                company_name=company_code.upper(), company_code=company_code
+            )
+            self.test_sector.add_company(company)
+            company.add_quotes(
+                rows=[
+                    (
+                        CONST_START_DATE + timedelta(days=day, hours=16),
+                        1,
+                        2,
+                        0.5,
+                        day,
+                        10,
+                    )
+                    for day in days
+                ]
+            )
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.test_collection.save(self.path)
+        result = SectorCollection.open(self.path)
+
+        self.assertEqual(result.name, "asx test")
+        self.assertEqual(result.sector_length, 2)
+        self.assertEqual(result.company_length, 2)
+        self.assertEqual(result.company_quote_length, 8)
+        self.assertEqual(result.sector_quote_length, 1)
+        self.assertEqual(result.get_sector("xcj").sector_name, "Cutlery")
+        self.assertEqual(result.get_company("spo").company_name, "SPO")
+        self.assertEqual(result.get_company("spo").sector_code, "xcj")
+        for company_code in ("kni", "spo"):
+            original = self.test_collection.get_company(company_code)._quotes
+            reopened = result.get_company(company_code)._quotes
+            for column in ("dates", "open", "high", "low", "close", "volume"):
+                np.testing.assert_array_equal(
+                    getattr(reopened, column), getattr(original, column)
+                )
+
+        quote = result.get_sector("xcj").get_sector_quote(date=CONST_START_DATE)
+        self.assertEqual(quote[CONST_START_DATE].sector_code, "xcj")
+
+    def test_memory_mapped(self):
+        self.test_collection.save(self.path)
+        result = SectorCollection.open(self.path)
+        self.assertEqual(
+            isinstance(result.get_company("kni")._quotes._close, np.memmap), True
+        )
+
+        result = SectorCollection.open(self.path, mmap=False)
+        self.assertEqual(
+            isinstance(result.get_company("kni")._quotes._close, np.memmap), False
+        )
+
+    def test_writes_dont_reach_the_files(self):
+        self.test_collection.save(self.path)
+        result = SectorCollection.open(self.path)
+
+        company = result.get_company("kni")
+        company.add_quote(CONST_START_DATE + timedelta(days=10), 1, 1, 1, 99, 1)
+        self.assertEqual(company.length, 6)
+        self.assertEqual(result.company_quote_length, 9)
+        self.assertEqual(company._quotes.close[-1], 99)
+
+        self.assertEqual(SectorCollection.open(self.path).get_company("kni").length, 5)
+
+    def test_save_over_open_copy(self):
+        self.test_collection.save(self.path)
+        result = SectorCollection.open(self.path)
+        result.get_sector("xcj").add_company(Company("Forks", "frk"))
+        result.save(self.path)
+
+        # the first copy's maps still see the old files
+        self.assertEqual(result.get_company("kni").length, 5)
+        reopened = SectorCollection.open(self.path)
+        self.assertEqual(reopened.company_length, 3)
+
+    def test_smaller_save_tidies_up(self):
+        self.test_collection.save(self.path)
+        SectorCollection("empty").save(self.path)
+
+        self.assertEqual(os.listdir(os.path.join(self.path, "quotes")), [])
+        self.assertEqual(SectorCollection.open(self.path).sector_length, 0)
+
+    def test_company_in_two_sectors(self):
+        knives = self.test_collection.get_company("kni")
+        self.empty_sector.add_company(knives)
+        self.test_collection.save(self.path)
+
+        result = SectorCollection.open(self.path)
+        self.assertEqual(
+            result.get_sector("xcj").get_company("kni")
+            is result.get_sector("xcr").get_company("kni"),
+            True,
+        )
+
+    def test_opens_subclass(self):
+        self.test_collection.save(self.path)
+        result = ShardedSectorCollection.open(self.path)
+        self.assertEqual(isinstance(result, ShardedSectorCollection), True)
+        self.assertEqual(len(result.get_company_quote()["kni"]), 5)
+
+    def test_bad_format(self):
+        self.test_collection.save(self.path)
+        with open(os.path.join(self.path, "index.json"), "w") as file:
+            file.write('{"format": 999}')
+
+        self.assertRaises(ValueError, SectorCollection.open, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from datetime import datetime, timedelta
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.querycache import QueryCache
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        test_cache = QueryCache(maxsize=2)
+
+        self.assertEqual(test_cache.get(("a",)), None)
+        test_cache.put(("a",), {"x": 1}, tags=[("company", "x")])
+        self.assertEqual(test_cache.get(("a",)), {"x": 1})
+
+        self.assertEqual(test_cache.stats["hits"], 1)
+        self.assertEqual(test_cache.stats["misses"], 1)
+
+    def test_lru_eviction(self):
+        test_cache = QueryCache(maxsize=2)
+        test_cache.put(("a",), {}, tags=[])
+        test_cache.put(("b",), {}, tags=[])
+        test_cache.get(("a",))
+        test_cache.put(("c",), {}, tags=[])
+
+        self.assertEqual(test_cache.get(("b",)), None)
+        self.assertEqual(test_cache.get(("a",)), {})
+        self.assertEqual(test_cache.length, 2)
+
+    def test_invalidate_only_matching_tags(self):
+        test_cache = QueryCache()
+        test_cache.put(("x",), {}, tags=[("company", "x")])
+        test_cache.put(("y",), {}, tags=[("company", "y")])
+        test_cache.put(("all",), {}, tags=[("company", None)])
+        test_cache.put(("sector",), {}, tags=[("sector", "x")])
+
+        test_cache.invalidate("company", "x")
+
+        self.assertEqual(test_cache.get(("x",)), None)
+        self.assertEqual(test_cache.get(("all",)), None)
+        self.assertEqual(test_cache.get(("y",)), {})
+        self.assertEqual(test_cache.get(("sector",)), {})
+        self.assertEqual(test_cache.stats["invalidations"], 2)
+
+    def test_bad_maxsize(self):
+        self.assertRaises(ValueError, QueryCache, maxsize=0)
+
+
+class TestSectorCollectionQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test", cache_size=16)
+        self.test_sector = Sector(
+            sector_name="Cutlery", sector_code="xcj", cache_size=16
+        )
+        self.test_collection.add_sector(self.test_sector)
+
+        for company_code in ["kni", "spo"]:
+            company = Company(company_name=company_code, company_code=company_code)
+            self.test_sector.add_company(company)
+            company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+    def test_repeat_query_is_a_hit(self):
+        first = self.test_collection.get_company_quote(company_codes=["kni"])
+        second = self.test_collection.get_company_quote(company_codes=["kni"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.test_collection.cache_stats["hits"], 1)
+        self.assertEqual(self.test_collection.cache_stats["misses"], 1)
+
+    def test_results_are_copies(self):
+        first = self.test_collection.get_company_quote(company_codes=["kni"])
+        first["kni"].clear()
+
+        second = self.test_collection.get_company_quote(company_codes=["kni"])
+        self.assertEqual(len(second["kni"]), 1)
+
+    def test_add_quote_invalidates_affected_company(self):
+        self.test_collection.get_company_quote(company_codes=["kni"])
+        self.test_collection.get_company_quote(company_codes=["spo"])
+
+        self.test_collection.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=1), 2, 2, 2, 2, 2
+        )
+
+        result = self.test_collection.get_company_quote(company_codes=["kni"])
+        self.assertEqual(len(result["kni"]), 2)
+        self.test_collection.get_company_quote(company_codes=["spo"])
+
+        # kni was rebuilt, spo came from the cache
+        self.assertEqual(self.test_collection.cache_stats["misses"], 3)
+        self.assertEqual(self.test_collection.cache_stats["hits"], 1)
+
+    def test_add_company_invalidates_unfiltered_query(self):
+        self.test_collection.get_company_quote()
+
+        self.test_sector.add_company(Company(company_name="forks", company_code="for"))
+
+        result = self.test_collection.get_company_quote()
+        self.assertEqual(set(result), {"kni", "spo", "for"})
+
+    def test_add_sector_quote_invalidates_sector_queries(self):
+        self.test_collection.get_sector_quote()
+        self.test_sector.get_sector_quote()
+
+        self.test_sector.add_sector_quote(
+            CONST_START_DATE + timedelta(days=1), 2, 2, 2, 2, 2
+        )
+
+        self.assertEqual(len(self.test_collection.get_sector_quote()["xcj"]), 2)
+        self.assertEqual(len(self.test_sector.get_sector_quote()), 2)
+        self.assertEqual(self.test_sector.cache_stats["misses"], 2)
+
+    def test_sector_cache_invalidated_by_company_quote(self):
+        self.test_sector.get_company_quote(company_codes=["spo"])
+
+        self.test_sector.get_company("spo").add_quotes(
+            rows=[(CONST_START_DATE + timedelta(days=1), 2, 2, 2, 2, 2)]
+        )
+
+        result = self.test_sector.get_company_quote(company_codes=["spo"])
+        self.assertEqual(len(result["spo"]), 2)
+
+    def test_load_sqs_invalidates(self):
+        self.test_collection.get_company_quote()
+
+        self.test_collection.load_sqs(
+            {
+                "Records": [
+                    {
+                        "body": '{"quoteObject": [{"quote_date": "2021-03-30", "stock_code": "8ec", "open": 1, "high": 1, "low": 1, "close": 1, "volume": 0}]}',
+                        "messageAttributes": {"QuoteType": {"stringValue": "stock"}},
+                    }
+                ]
+            }
+        )
+
+        self.assertEqual("8ec" in self.test_collection.get_company_quote(), True)
+
+    def test_cache_disabled_by_default(self):
+        self.assertEqual(SectorCollection("asx test").cache_stats, None)
+        self.assertEqual(Sector(sector_name="a", sector_code="a").cache_stats, None)
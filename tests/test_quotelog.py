@@ -0,0 +1,198 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.quotelog import (
+    read_log,
+    replay_log,
+    CONST_LOG_FILE,
+    CONST_LOG_SECTOR,
+    CONST_LOG_COMPANY,
+    CONST_LOG_COMPANY_QUOTES,
+    CONST_LOG_COMPANY_REPLACED,
+)
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+def state(collection: SectorCollection) -> dict:
+    # everything that matters about a collection, in a form assertEqual can compare
+    return {
+        sector_code: (
+            sector.sector_name,
+            [(str(quote.date), quote.close) for quote in sector._quotes.values()],
+            {
+                company_code: (
+                    company.company_name,
+                    [
+                        (str(quote.date), quote.close)
+                        for quote in company._quotes.values()
+                    ],
+                )
+                for company_code, company in sector._companies.items()
+            },
+        )
+        for sector_code, sector in collection._sectors.items()
+    }
+
+
+class TestQuoteLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log")
+        self.log_file = os.path.join(self.path, CONST_LOG_FILE)
+
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_company = Company(company_name="Knives", company_code="kni")
+        self.test_sector.add_company(self.test_company)
+        self.test_company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+        self.test_collection.attach_log(self.path)
+
+    def tearDown(self):
+        self.test_collection.close_log()
+        self.directory.cleanup()
+
+    def add_some(self):
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=1), 1, 1, 1, 2, 1)
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 5, 1)
+
+        spoons = Company(company_name="Spoons", company_code="spo")
+        self.test_sector.add_company(spoons)
+        spoons.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), 1, 1, 1, day, 1)
+                for day in range(3)
+            ]
+        )
+
+        # a sector that shows up with companies and quotes already in it
+        crockery = Sector(sector_name="Crockery", sector_code="xcr")
+        plates = Company(company_name="Plates", company_code="plt")
+        crockery.add_company(plates)
+        plates.add_quote(CONST_START_DATE, 1, 1, 1, 7, 1)
+        crockery.add_sector_quote(CONST_START_DATE, 1, 1, 1, 8, 1)
+        self.test_collection.add_sector(crockery)
+        plates.add_quote(CONST_START_DATE + timedelta(days=1), 1, 1, 1, 9, 1)
+
+    def recover(self) -> SectorCollection:
+        self.test_collection.close_log()
+        recovered = SectorCollection.recover(self.path)
+        self.addCleanup(recovered.close_log)
+        return recovered
+
+    def test_attach_snapshots_existing_state(self):
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+        self.assertEqual(state(self.recover()), state(self.test_collection))
+
+    def test_recover_replays_log(self):
+        self.add_some()
+        self.assertEqual(state(self.recover()), state(self.test_collection))
+
+    def test_records(self):
+        self.test_sector.add_company(Company(company_name="Forks", company_code="frk"))
+        self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE, 1, 1, 1, 1, 1),
+                (CONST_START_DATE + timedelta(days=1), 1, 1, 1, 2, 1),
+            ],
+            on_duplicate="skip",
+        )
+
+        records = list(read_log(self.log_file))
+        self.assertEqual(records[0], (CONST_LOG_COMPANY, "xcj", "frk", "Forks"))
+
+        # only the quote that actually went in is logged
+        record_type, code, columns = records[1]
+        self.assertEqual((record_type, code), (CONST_LOG_COMPANY_QUOTES, "kni"))
+        self.assertEqual(list(columns[4]), [2])
+        self.assertEqual(len(records), 2)
+
+    def test_replaced_quotes(self):
+        self.test_company.add_quote(CONST_START_DATE, 1, 4, 1, 3, 1, "merge")
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 5, 1)
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 6, 1, "overwrite")
+
+        record_type, code, columns = list(read_log(self.log_file))[0]
+        self.assertEqual((record_type, code), (CONST_LOG_COMPANY_REPLACED, "kni"))
+        self.assertEqual((list(columns[2]), list(columns[4])), ([4], [3]))
+        self.assertEqual(state(self.recover()), state(self.test_collection))
+
+    def test_torn_record_is_dropped(self):
+        self.add_some()
+        expected = state(self.test_collection)
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=2), 1, 1, 1, 3, 1)
+        self.test_collection.close_log()
+
+        # lose the end of the last record, like a crash mid-write
+        with open(self.log_file, "r+b") as file:
+            file.truncate(os.path.getsize(self.log_file) - 5)
+
+        recovered = self.recover()
+        self.assertEqual(state(recovered), expected)
+
+        # and the log carries on cleanly after the good records
+        recovered.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=3), 1, 1, 1, 4, 1
+        )
+        expected = state(recovered)
+        recovered.close_log()
+        self.assertEqual(state(SectorCollection.recover(self.path)), expected)
+
+    def test_compact(self):
+        self.add_some()
+        self.test_collection.compact()
+
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+        self.assertEqual(
+            sorted(os.listdir(self.path)), ["CURRENT", "quotes.log", "snapshot-2"]
+        )
+
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=5), 1, 1, 1, 6, 1)
+        self.assertEqual(state(self.recover()), state(self.test_collection))
+
+    def test_replay_is_idempotent(self):
+        self.add_some()
+        recovered = self.recover()
+
+        # as if a compaction died after writing its snapshot but before emptying the log
+        replay_log(recovered, self.log_file)
+        self.assertEqual(state(recovered), state(self.test_collection))
+        self.assertEqual(recovered.company_quote_length, 7)
+
+    def test_load_sqs(self):
+        payload = {
+            "Records": [
+                {
+                    "messageId": "1",
+                    "body": '{"quoteObject": [{"quote_date": "2021-01-01", "stock_code": "abc", "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}]}',
+                    "messageAttributes": {"QuoteType": {"stringValue": "stock"}},
+                }
+            ]
+        }
+        self.test_collection.load_sqs(payload)
+        recovered = self.recover()
+        self.assertEqual(recovered.get_company("abc").length, 1)
+        self.assertEqual(state(recovered), state(self.test_collection))
+
+    def test_attach_errors(self):
+        self.assertRaises(ValueError, self.test_collection.attach_log, self.path)
+        self.assertRaises(ValueError, SectorCollection("other").attach_log, self.path)
+        self.assertRaises(ValueError, SectorCollection("other").compact)
+        self.assertRaises(ValueError, SectorCollection.recover, self.directory.name)
+
+    def test_close_stops_logging(self):
+        self.test_collection.close_log()
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=9), 1, 1, 1, 1, 1)
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
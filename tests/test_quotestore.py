@@ -0,0 +1,282 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.companyquote import CompanyQuote
+from stockobjects.quotestore import QuoteStore
+from stockobjects.sector import Sector
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+
+CONST_COMPANY_NAME = "Knives Inc"
+CONST_COMPANY_CODE = "kni"
+CONST_START_DATE = datetime.strptime("01/10/20", "%d/%m/%y")
+
+
+class TestQuoteStore(unittest.TestCase):
+    def setUp(self):
+        self.test_company = Company(
+            company_name=CONST_COMPANY_NAME, company_code=CONST_COMPANY_CODE
+        )
+        self.test_store = QuoteStore(
+            parent=self.test_company, quote_class=CompanyQuote, capacity=2
+        )
+
+    def test_add_keeps_dates_sorted(self):
+        for day in [5, 1, 3, 2, 4]:
+            self.test_store.add(
+                date=CONST_START_DATE + timedelta(days=day),
+                open=day,
+                high=day,
+                low=day,
+                close=day,
+                volume=day,
+            )
+
+        self.assertEqual(len(self.test_store), 5)
+        self.assertEqual(list(self.test_store.close), [1, 2, 3, 4, 5])
+        self.assertEqual(
+            list(self.test_store),
+            [CONST_START_DATE + timedelta(days=day) for day in range(1, 6)],
+        )
+
+    def test_add_duplicate_returns_false(self):
+        self.assertEqual(self.test_store.add(CONST_START_DATE, 1, 1, 1, 1, 1), True)
+        self.assertEqual(self.test_store.add(CONST_START_DATE, 2, 2, 2, 2, 2), False)
+        self.assertEqual(len(self.test_store), 1)
+        self.assertEqual(self.test_store[CONST_START_DATE].open, 1)
+
+    def test_getitem_materialises_quote(self):
+        self.test_store.add(CONST_START_DATE, 10, 12, 8, 11, 2000)
+        result = self.test_store[CONST_START_DATE]
+
+        self.assertEqual(isinstance(result, CompanyQuote), True)
+        self.assertEqual(result.date, CONST_START_DATE)
+        self.assertEqual(result.code, CONST_COMPANY_CODE)
+        self.assertEqual(result.open, 10)
+        self.assertEqual(result.high, 12)
+        self.assertEqual(result.low, 8)
+        self.assertEqual(result.close, 11)
+        self.assertEqual(result.volume, 2000)
+
+    def test_missing_date(self):
+        self.assertEqual(CONST_START_DATE in self.test_store, False)
+        self.assertRaises(KeyError, self.test_store.__getitem__, CONST_START_DATE)
+
+    def test_string_dates(self):
+        self.test_store.add("2021-03-30", 1, 1, 1, 1, 0)
+
+        self.assertEqual(datetime(2021, 3, 30) in self.test_store, True)
+        self.assertEqual(self.test_store["2021-03-30"].date, datetime(2021, 3, 30))
+
+    def test_columns_are_numpy_arrays(self):
+        self.test_store.add(CONST_START_DATE, 10, 12, 8, 11, 2000)
+
+        self.assertEqual(isinstance(self.test_store.close, np.ndarray), True)
+        self.assertEqual(self.test_store.dates.dtype, np.dtype("datetime64[us]"))
+        self.assertEqual(self.test_store.volume.dtype, np.int64)
+
+    def test_get_range(self):
+        # quotes at midday so the time has to be ignored at both ends of the window
+        for day in range(10):
+            self.test_store.add(
+                CONST_START_DATE + timedelta(days=day, hours=12), 1, 1, 1, 1, 1
+            )
+
+        result = self.test_store.get_range(
+            date_from=(CONST_START_DATE + timedelta(days=3)).date(),
+            date_to=(CONST_START_DATE + timedelta(days=5)).date(),
+        )
+
+        self.assertEqual(
+            list(result),
+            [CONST_START_DATE + timedelta(days=day, hours=12) for day in range(3, 6)],
+        )
+        self.assertEqual(
+            self.test_store.get_range(
+                date_from=datetime(2030, 1, 1), date_to=datetime(2030, 2, 1)
+            ),
+            {},
+        )
+
+
+class TestCompanyQuoteStore(unittest.TestCase):
+    def test_add_quote_duplicate(self):
+        test_company = Company(
+            company_name=CONST_COMPANY_NAME, company_code=CONST_COMPANY_CODE
+        )
+        test_company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+        self.assertRaises(
+            QuoteAlreadyExists,
+            test_company.add_quote_object,
+            CompanyQuote(test_company, CONST_START_DATE, 2, 2, 2, 2, 2),
+        )
+        self.assertEqual(test_company.length, 1)
+
+
+class TestQuoteStoreExtend(unittest.TestCase):
+    def setUp(self):
+        self.test_company = Company(
+            company_name=CONST_COMPANY_NAME, company_code=CONST_COMPANY_CODE
+        )
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=5), 5, 5, 5, 5, 5)
+
+    def test_add_quotes_columns_merge_sorted(self):
+        days = [3, 1, 7, 6]
+        result = self.test_company.add_quotes(
+            date=[CONST_START_DATE + timedelta(days=day) for day in days],
+            open=days,
+            high=days,
+            low=days,
+            close=days,
+            volume=days,
+        )
+
+        self.assertEqual(result, 4)
+        self.assertEqual(self.test_company.length, 5)
+        self.assertEqual(list(self.test_company._quotes.close), [1, 3, 5, 6, 7])
+
+    def test_add_quotes_rows(self):
+        result = self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=6), 6, 6, 6, 6, 6),
+                {
+                    "date": CONST_START_DATE + timedelta(days=7),
+                    "open": 7,
+                    "high": 7,
+                    "low": 7,
+                    "close": 7,
+                    "volume": 7,
+                },
+            ]
+        )
+
+        self.assertEqual(result, 2)
+        self.assertEqual(list(self.test_company._quotes.volume), [5, 6, 7])
+
+    def test_add_quotes_duplicate_raises_before_inserting(self):
+        self.assertRaises(
+            QuoteAlreadyExists,
+            self.test_company.add_quotes,
+            rows=[
+                (CONST_START_DATE + timedelta(days=6), 6, 6, 6, 6, 6),
+                (CONST_START_DATE + timedelta(days=5), 1, 1, 1, 1, 1),
+            ],
+        )
+        self.assertEqual(self.test_company.length, 1)
+
+    def test_add_quotes_duplicate_inside_batch(self):
+        self.assertRaises(
+            QuoteAlreadyExists,
+            self.test_company.add_quotes,
+            rows=[
+                (CONST_START_DATE + timedelta(days=6), 6, 6, 6, 6, 6),
+                (CONST_START_DATE + timedelta(days=6), 1, 1, 1, 1, 1),
+            ],
+        )
+
+    def test_add_quotes_skip_duplicates(self):
+        result = self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=6), 6, 6, 6, 6, 6),
+                (CONST_START_DATE + timedelta(days=5), 1, 1, 1, 1, 1),
+                (CONST_START_DATE + timedelta(days=6), 1, 1, 1, 1, 1),
+            ],
+            on_duplicate="skip",
+        )
+
+        self.assertEqual(result, 1)
+        self.assertEqual(list(self.test_company._quotes.open), [5, 6])
+
+    def test_add_sector_quotes(self):
+        test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        result = test_sector.add_sector_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), 1, 1, 1, 1, 1)
+                for day in range(5)
+            ]
+        )
+
+        self.assertEqual(result, 5)
+        self.assertEqual(test_sector.sector_quote_length, 5)
+
+
+class TestQuoteStoreDuplicatePolicy(unittest.TestCase):
+    def setUp(self):
+        self.test_company = Company(
+            company_name=CONST_COMPANY_NAME, company_code=CONST_COMPANY_CODE
+        )
+        self.test_company.add_quote(CONST_START_DATE, 5, 6, 4, 5, 10)
+        self.store = self.test_company._quotes
+
+    def test_unknown_policy(self):
+        self.assertRaises(
+            ValueError, self.store.add, CONST_START_DATE, 1, 1, 1, 1, 1, "ignore"
+        )
+
+    def test_add_skip_counts(self):
+        self.assertEqual(
+            self.test_company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1, "skip"), False
+        )
+        self.assertEqual(list(self.store.close), [5])
+        self.assertEqual(self.test_company.duplicate_counts["skipped"], 1)
+
+    def test_add_overwrite(self):
+        self.test_company.add_quote(CONST_START_DATE, 1, 2, 1, 2, 3, "overwrite")
+        self.assertEqual(list(self.store.high), [2])
+        self.assertEqual(list(self.store.volume), [3])
+        self.assertEqual(self.test_company.duplicate_counts["overwritten"], 1)
+
+    def test_add_merge(self):
+        self.test_company.add_quote(CONST_START_DATE, 1, 8, 3, 7, 2, "merge")
+        quote = self.store[CONST_START_DATE]
+        self.assertEqual(
+            (quote.open, quote.high, quote.low, quote.close, quote.volume),
+            (5, 8, 3, 7, 10),
+        )
+        self.assertEqual(self.test_company.duplicate_counts["merged"], 1)
+
+    def test_extend_overwrite_last_one_wins(self):
+        result = self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE, 1, 1, 1, 1, 1),
+                (CONST_START_DATE + timedelta(days=1), 1, 1, 1, 1, 1),
+                (CONST_START_DATE, 2, 2, 2, 2, 2),
+                (CONST_START_DATE + timedelta(days=1), 3, 3, 3, 3, 3),
+            ],
+            on_duplicate="overwrite",
+        )
+
+        self.assertEqual(result, 1)
+        self.assertEqual(list(self.store.close), [2, 3])
+        # two collapsed inside the batch, one written over the quote already here
+        self.assertEqual(self.test_company.duplicate_counts["overwritten"], 3)
+
+    def test_extend_merge(self):
+        result = self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE, 9, 7, 4, 6, 1),
+                (CONST_START_DATE, 9, 9, 2, 8, 20),
+                (CONST_START_DATE + timedelta(days=1), 1, 2, 1, 2, 1),
+            ],
+            on_duplicate="merge",
+        )
+
+        self.assertEqual(result, 1)
+        self.assertEqual(
+            [
+                list(getattr(self.store, field))
+                for field in ("open", "high", "low", "close", "volume")
+            ],
+            [[5, 1], [9, 2], [2, 1], [8, 2], [20, 1]],
+        )
+        self.assertEqual(self.test_company.duplicate_counts["merged"], 2)
+
+    def test_read_only_columns_are_copied(self):
+        for column in self.store._columns():
+            column.flags.writeable = False
+        self.assertRaises(ValueError, self.store._close.__setitem__, 0, 1)
+
+        self.test_company.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1, "overwrite")
+        self.assertEqual(list(self.store.close), [1])
@@ -0,0 +1,117 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.resample import period_starts
+
+# a thursday
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_company = Company(company_name="Knives", company_code="kni")
+        self.test_sector.add_company(self.test_company)
+
+        # 40 days of quotes, open/close are the day number, high/low either side of it
+        self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), day, day + 1, day - 1, day, 10)
+                for day in range(40)
+            ]
+        )
+
+    def test_period_starts(self):
+        dates = np.array(
+            ["2020-10-01", "2020-10-04", "2020-10-05", "2020-11-30"],
+            dtype="datetime64[us]",
+        )
+        self.assertEqual(
+            list(period_starts(dates, "W").astype(str)),
+            ["2020-09-28", "2020-09-28", "2020-10-05", "2020-11-30"],
+        )
+        self.assertEqual(
+            list(period_starts(dates, "M").astype(str)),
+            ["2020-10-01", "2020-10-01", "2020-10-01", "2020-11-01"],
+        )
+        self.assertRaises(ValueError, period_starts, dates, "Q")
+
+    def test_weekly(self):
+        result = self.test_company.resample("W")
+
+        # thu-sun, then 5 full weeks, then the leftover 1 day
+        self.assertEqual(len(result), 7)
+        self.assertEqual(result.dates[0], np.datetime64("2020-09-28"))
+        self.assertEqual(result.dates[1], np.datetime64("2020-10-05"))
+        self.assertEqual(list(result.open[:2]), [0, 4])
+        self.assertEqual(list(result.high[:2]), [4, 11])
+        self.assertEqual(list(result.low[:2]), [-1, 3])
+        self.assertEqual(list(result.close[:2]), [3, 10])
+        self.assertEqual(list(result.volume[:2]), [40, 70])
+        self.assertEqual(int(result.volume.sum()), 400)
+
+    def test_monthly(self):
+        result = self.test_company.resample("M")
+
+        self.assertEqual(
+            list(result.dates.astype("datetime64[D]").astype(str)),
+            [
+                "2020-10-01",
+                "2020-11-01",
+            ],
+        )
+        self.assertEqual(list(result.open), [0, 31])
+        self.assertEqual(list(result.close), [30, 39])
+        self.assertEqual(list(result.volume), [310, 90])
+
+        # quotes come back the same way get_quote hands them out
+        quote = result[datetime(2020, 11, 1)]
+        self.assertEqual(quote.company_code, "kni")
+        self.assertEqual(quote.high, 40)
+
+    def test_empty(self):
+        self.assertEqual(len(Company("Forks", "frk").resample("W")), 0)
+
+    def test_bad_freq(self):
+        self.assertRaises(ValueError, self.test_company.resample, "fortnightly")
+
+    def test_cached_until_new_quote(self):
+        first = self.test_company.resample("M")
+        self.assertEqual(self.test_company.resample("M") is first, True)
+
+        self.test_company.add_quote(
+            CONST_START_DATE + timedelta(days=40), 40, 100, 40, 40, 10
+        )
+        second = self.test_company.resample("M")
+        self.assertEqual(second is first, False)
+        self.assertEqual(second.high[-1], 100)
+        self.assertEqual(second.volume[-1], 100)
+
+    def test_sector(self):
+        for day in range(10):
+            self.test_sector.add_sector_quote(
+                CONST_START_DATE + timedelta(days=day), day, day, day, day, 1
+            )
+
+        first = self.test_sector.resample("W")
+        self.assertEqual(list(first.close), [3, 9])
+        self.assertEqual(first[datetime(2020, 9, 28)].sector_code, "xcj")
+
+        self.test_sector.add_sector_quote(
+            CONST_START_DATE + timedelta(days=10), 10, 10, 10, 10, 1
+        )
+        second = self.test_sector.resample("W")
+        self.assertEqual(list(second.close), [3, 10])
+
+        # a company's new quote doesn't touch the sector's own bars
+        self.test_company.add_quote(
+            CONST_START_DATE + timedelta(days=50), 1, 1, 1, 1, 1
+        )
+        self.assertEqual(self.test_sector.resample("W") is second, True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestSectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+
+        # kni trades every day at 10 with volume 1, spo every second day at 20 with volume 3
+        for company_code, days, price, volume in [
+            ("kni", range(4), 10, 1),
+            ("spo", range(0, 4, 2), 20, 3),
+        ]:
+            company = Company(company_name=company_code, company_code=company_code)
+            self.test_sector.add_company(company)
+            company.add_quotes(
+                rows=[
+                    (
+                        CONST_START_DATE + timedelta(days=day, hours=16),
+                        price,
+                        price + 1,
+                        price - 1,
+                        price,
+                        volume,
+                    )
+                    for day in days
+                ]
+            )
+
+    def test_equal_weight(self):
+        result = self.test_sector.get_index()
+
+        self.assertEqual(len(result), 4)
+        self.assertEqual(result.dates[0], np.datetime64("2020-10-01"))
+        self.assertEqual(list(result.close), [15, 10, 15, 10])
+        self.assertEqual(list(result.high), [16, 11, 16, 11])
+        self.assertEqual(list(result.volume), [4, 1, 4, 1])
+        self.assertEqual(result[CONST_START_DATE].sector_code, "xcj")
+
+    def test_volume_weight(self):
+        result = self.test_sector.get_index(weighting="volume")
+        self.assertEqual(list(result.close), [17.5, 10, 17.5, 10])
+
+    def test_no_volume_falls_back_to_equal(self):
+        self.test_collection.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=10), 10, 10, 10, 10, 0
+        )
+        self.test_collection.get_company("spo").add_quote(
+            CONST_START_DATE + timedelta(days=10), 20, 20, 20, 20, 0
+        )
+        result = self.test_sector.get_index(weighting="volume")
+        self.assertEqual(result.close[-1], 15)
+
+    def test_bad_weighting(self):
+        self.assertRaises(ValueError, self.test_sector.get_index, "price")
+
+    def test_empty_sector(self):
+        self.assertEqual(len(Sector("Forks", "frk").get_index()), 0)
+
+    def test_doesnt_touch_sector_quotes(self):
+        self.test_sector.get_index()
+        self.assertEqual(self.test_sector.sector_quote_length, 0)
+
+    def test_new_quote_on_built_day_patches_in_place(self):
+        equal = self.test_sector.get_index()
+        weighted = self.test_sector.get_index(weighting="volume")
+
+        # spo's missing day 1
+        self.test_collection.get_company("spo").add_quote(
+            CONST_START_DATE + timedelta(days=1, hours=16), 20, 21, 19, 20, 3
+        )
+
+        # same stores, just the one bar changed
+        self.assertEqual(self.test_sector.get_index() is equal, True)
+        self.assertEqual(
+            self.test_sector.get_index(weighting="volume") is weighted, True
+        )
+        self.assertEqual(list(equal.close), [15, 15, 15, 10])
+        self.assertEqual(list(equal.volume), [4, 4, 4, 1])
+        self.assertEqual(list(weighted.close), [17.5, 17.5, 17.5, 10])
+
+    def test_new_quote_on_new_day(self):
+        first = self.test_sector.get_index()
+        self.test_collection.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=-1), 30, 30, 30, 30, 1
+        )
+
+        result = self.test_sector.get_index()
+        self.assertEqual(result is first, False)
+        self.assertEqual(list(result.close), [30, 15, 10, 15, 10])
+
+    def test_matches_rebuild(self):
+        self.test_sector.get_index()
+        self.test_collection.get_company("spo").add_quote(
+            CONST_START_DATE + timedelta(days=3), 25, 26, 24, 25, 7
+        )
+        self.test_collection.get_company("kni").add_quote(
+            CONST_START_DATE + timedelta(days=6), 11, 12, 10, 11, 2
+        )
+        incremental = self.test_sector.get_index(weighting="volume")
+
+        self.test_sector._index = None
+        rebuilt = self.test_sector.get_index(weighting="volume")
+        for field in ("dates", "open", "high", "low", "close", "volume"):
+            self.assertEqual(
+                list(getattr(incremental, field)), list(getattr(rebuilt, field))
+            )
+
+    def test_new_company_rebuilds(self):
+        self.test_sector.get_index()
+        company = Company(company_name="Forks", company_code="frk")
+        company.add_quote(CONST_START_DATE, 0, 0, 0, 0, 2)
+        self.test_sector.add_company(company)
+
+        self.assertEqual(self.test_sector.get_index().close[0], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from datetime import datetime, timedelta
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.shardedsectorcollection import ShardedSectorCollection
+from stockobjects.stockobjectsexceptions import (
+    CompanyDoesNotExist,
+    SectorDoesNotExist,
+)
+
+CONST_TEST_SECTOR_COUNT = 5
+CONST_TEST_COMPANY_COUNT = 4
+CONST_TEST_QUOTES = 10
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+def populate(collection: SectorCollection) -> SectorCollection:
+    for sector_number in range(CONST_TEST_SECTOR_COUNT):
+        sector = Sector(
+            sector_name=f"sector {sector_number}", sector_code=f"s{sector_number}"
+        )
+        collection.add_sector(sector)
+        sector.add_sector_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), day, day, day, day, day)
+                for day in range(CONST_TEST_QUOTES)
+            ]
+        )
+
+        for company_number in range(CONST_TEST_COMPANY_COUNT):
+            company = Company(
+                company_name=f"company {company_number}",
+                company_code=f"s{sector_number}c{company_number}",
+            )
+            sector.add_company(company)
+            company.add_quotes(
+                rows=[
+                    (CONST_START_DATE + timedelta(days=day), day, day, day, day, day)
+                    for day in range(CONST_TEST_QUOTES)
+                ]
+            )
+
+    return collection
+
+
+class TestShardedSectorCollection(unittest.TestCase):
+    def setUp(self):
+        self.plain_collection = populate(SectorCollection("plain"))
+        self.sharded_collection = populate(
+            ShardedSectorCollection("sharded", workers=3)
+        )
+
+    def assertSameQuotes(self, expected, result):
+        self.assertEqual(list(expected), list(result))
+        for code in expected:
+            self.assertEqual(list(expected[code]), list(result[code]))
+            for quote_date in expected[code]:
+                self.assertEqual(
+                    expected[code][quote_date].get_quote(),
+                    result[code][quote_date].get_quote(),
+                )
+
+    def test_get_company_quote_no_filter(self):
+        self.assertSameQuotes(
+            self.plain_collection.get_company_quote(),
+            self.sharded_collection.get_company_quote(),
+        )
+
+    def test_get_company_quote_filtered(self):
+        arguments = {
+            "company_codes": ["s1c2", "s4c0"],
+            "date_from": CONST_START_DATE + timedelta(days=2),
+            "date_to": CONST_START_DATE + timedelta(days=4),
+        }
+        result = self.sharded_collection.get_company_quote(**arguments)
+
+        self.assertSameQuotes(
+            self.plain_collection.get_company_quote(**arguments), result
+        )
+        self.assertEqual(len(result["s1c2"]), 3)
+        self.assertEqual(
+            result["s1c2"][CONST_START_DATE + timedelta(days=2)].company_code, "s1c2"
+        )
+
+    def test_get_sector_quote(self):
+        self.assertSameQuotes(
+            self.plain_collection.get_sector_quote(date=CONST_START_DATE),
+            self.sharded_collection.get_sector_quote(date=CONST_START_DATE),
+        )
+
+    def test_sees_writes_made_after_creation(self):
+        self.sharded_collection.get_company("s0c0").add_quote(
+            CONST_START_DATE + timedelta(days=100), 1, 1, 1, 1, 1
+        )
+
+        result = self.sharded_collection.get_company_quote(
+            date=CONST_START_DATE + timedelta(days=100)
+        )
+        self.assertEqual(len(result["s0c0"]), 1)
+        self.assertEqual(len(result["s0c1"]), 0)
+
+    def test_invalid_codes(self):
+        self.assertRaises(
+            CompanyDoesNotExist,
+            self.sharded_collection.get_company_quote,
+            company_codes=["nope"],
+        )
+        self.assertRaises(
+            SectorDoesNotExist,
+            self.sharded_collection.get_sector_quote,
+            sector_codes=["nope"],
+        )
+
+    def test_invalid_workers(self):
+        self.assertRaises(ValueError, ShardedSectorCollection, "sharded", workers=0)
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        for sector_code in ["xcj", "xmj"]:
+            self.test_collection.add_sector(
+                Sector(sector_name=sector_code, sector_code=sector_code)
+            )
+
+        # kni and spo trade every day, for only trades on odd days
+        for sector_code, company_code, days in [
+            ("xcj", "kni", range(10)),
+            ("xcj", "spo", range(10)),
+            ("xmj", "for", range(1, 10, 2)),
+        ]:
+            company = Company(company_name=company_code, company_code=company_code)
+            self.test_collection.get_sector(sector_code).add_company(company)
+            company.add_quotes(
+                rows=[
+                    (
+                        CONST_START_DATE + timedelta(days=day, hours=10),
+                        day,
+                        day + 1,
+                        day - 1,
+                        day + 0.5,
+                        day * 100,
+                    )
+                    for day in days
+                ]
+            )
+
+    def test_all_companies(self):
+        result = self.test_collection.get_snapshot(CONST_START_DATE + timedelta(days=3))
+
+        self.assertEqual(list(result["code"]), ["kni", "spo", "for"])
+        self.assertEqual(list(result["close"]), [3.5, 3.5, 3.5])
+        self.assertEqual(list(result["volume"]), [300, 300, 300])
+        self.assertEqual(result["volume"].dtype, np.int64)
+        self.assertEqual(result["high"].dtype, np.float64)
+
+    def test_missing_companies_left_out(self):
+        result = self.test_collection.get_snapshot(
+            CONST_START_DATE + timedelta(days=2), fields=["close"]
+        )
+
+        self.assertEqual(list(result["code"]), ["kni", "spo"])
+        self.assertEqual(set(result), {"code", "close"})
+
+    def test_no_quotes(self):
+        result = self.test_collection.get_snapshot(datetime(2030, 1, 1))
+
+        self.assertEqual(len(result["code"]), 0)
+        self.assertEqual(len(result["close"]), 0)
+
+    def test_sector_snapshot(self):
+        result = self.test_collection.get_sector("xmj").get_snapshot(
+            CONST_START_DATE + timedelta(days=1), fields=("open",)
+        )
+
+        self.assertEqual(list(result["code"]), ["for"])
+        self.assertEqual(list(result["open"]), [1])
+
+    def test_bad_field(self):
+        self.assertRaises(
+            ValueError,
+            self.test_collection.get_snapshot,
+            CONST_START_DATE,
+            fields=["price"],
+        )
+
+    def test_bad_date(self):
+        self.assertRaises(TypeError, self.test_collection.get_snapshot, "2020-10-01")
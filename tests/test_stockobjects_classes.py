@@ -3,6 +3,7 @@ from unittest.mock import patch
 from datetime import datetime, timedelta
 from stockobjects.stockobjectsexceptions import (
     QuoteAlreadyExists,
+    CompanyAlreadyExists,
     CompanyDoesNotExist,
     SectorDoesNotExist,
 )
@@ -16,6 +17,7 @@ from stockobjects.sectorcollection import SectorCollection
 from datetime import datetime
 import string
 import random
+import json
 
 # todo: for when I'm randomly generating entire structures.  If I was clever I'd probably use a test fixture
 CONST_TEST_SECTOR_COUNT = 3
@@ -1862,3 +1864,489 @@ class TestSectorCollectionLoad(unittest.TestCase):  # done
             len(self.test_collection._sectors["Boilerplate"]._companies["8ec"]._quotes),
             3,
         )
+
+    def test_load_sqs_dates_are_queryable(self):
+        self.test_collection.load_sqs(payload=self.payload)
+
+        result = self.test_collection.get_company("8ec").get_quote(
+            date=datetime(2021, 3, 30)
+        )
+        self.assertEqual(list(result), [datetime(2021, 3, 30)])
+        self.assertEqual(
+            len(self.test_collection.get_sector("xmj").get_sector_quote()), 3
+        )
+
+    def test_load_sqs_decodes_each_body_once(self):
+        with patch(
+            "stockobjects.sectorcollection.json.loads",
+            wraps=json.loads,
+        ) as mock_loads:
+            self.test_collection.load_sqs(payload=self.payload)
+
+        self.assertEqual(mock_loads.call_count, len(self.payload["Records"]))
+
+    def test_load_sqs_bad_quote_applies_nothing(self):
+        self.payload["Records"][1]["body"] = (
+            '{"quoteObject": [{"quote_date": "2021-03-30", "sector_code": "xmj", '
+            '"open": "not a number", "high": 1, "low": 1, "close": 1, "volume": 0}]}'
+        )
+
+        self.assertRaises(Exception, self.test_collection.load_sqs, self.payload)
+        self.assertEqual(len(self.test_collection._sectors), CONST_TEST_SECTOR_COUNT)
+        self.assertEqual("8ec" in self.test_collection._companies, False)
+
+
+class TestSectorCollectionCompanyIndex(unittest.TestCase):
+    def test_company_added_before_sector_attached(self):
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_company = Company(
+            company_name=CONST_COMPANY1_COMPANY_NAME,
+            company_code=CONST_COMPANY1_COMPANY_CODE,
+        )
+        test_sector.add_company(test_company)
+
+        test_collection = SectorCollection("asx test")
+        test_collection.add_sector(test_sector)
+
+        self.assertEqual(
+            test_collection._companies, {CONST_COMPANY1_COMPANY_CODE: test_company}
+        )
+        self.assertEqual(
+            test_collection.get_company(CONST_COMPANY1_COMPANY_CODE), test_company
+        )
+
+    def test_company_added_after_sector_attached(self):
+        test_collection = SectorCollection("asx test")
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_collection.add_sector(test_sector)
+
+        test_company = Company(
+            company_name=CONST_COMPANY2_COMPANY_NAME,
+            company_code=CONST_COMPANY2_COMPANY_CODE,
+        )
+        test_collection.get_sector(CONST_SECTOR1_CODE).add_company(test_company)
+
+        self.assertEqual(
+            test_collection.get_company(CONST_COMPANY2_COMPANY_CODE), test_company
+        )
+        self.assertRaises(
+            CompanyDoesNotExist,
+            test_collection.get_company,
+            CONST_COMPANY1_COMPANY_CODE,
+        )
+
+    def test_add_company_duplicate(self):
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_sector.add_company(
+            Company(
+                company_name=CONST_COMPANY1_COMPANY_NAME,
+                company_code=CONST_COMPANY1_COMPANY_CODE,
+            )
+        )
+
+        self.assertRaises(
+            CompanyAlreadyExists,
+            test_sector.add_company,
+            Company(
+                company_name=CONST_COMPANY1_COMPANY_NAME,
+                company_code=CONST_COMPANY1_COMPANY_CODE,
+            ),
+        )
+
+
+class TestIterQuotes(unittest.TestCase):
+    def setUp(self):
+        self.setup = SetupObject()
+        self.test_collection = self.setup.generate_sector_collection(
+            sector_count=CONST_TEST_SECTOR_COUNT,
+            company_count=CONST_TEST_COMPANY_COUNT,
+            sector_quotes=CONST_TEST_SECTOR_QUOTES,
+            company_quotes=CONST_TEST_COMPANY_QUOTES,
+        )
+
+    def test_iter_company_quotes_matches_get_company_quote(self):
+        expected = self.test_collection.get_company_quote(
+            date_from=datetime.strptime("02/10/20", "%d/%m/%y"),
+            date_to=datetime.strptime("04/10/20", "%d/%m/%y"),
+        )
+        result = list(
+            self.test_collection.iter_company_quotes(
+                date_from=datetime.strptime("02/10/20", "%d/%m/%y"),
+                date_to=datetime.strptime("04/10/20", "%d/%m/%y"),
+            )
+        )
+
+        self.assertEqual(
+            len(result), CONST_TEST_SECTOR_COUNT * CONST_TEST_COMPANY_COUNT * 3
+        )
+        for company_code, quote_date, quote in result:
+            self.assertEqual(quote, expected[company_code][quote_date])
+            self.assertEqual(quote.company_code, company_code)
+
+    def test_iter_company_quotes_one_company(self):
+        company_code = list(self.test_collection._companies)[-1]
+        result = list(
+            self.test_collection.iter_company_quotes(company_codes=[company_code])
+        )
+
+        self.assertEqual(len(result), CONST_TEST_COMPANY_QUOTES)
+        self.assertEqual({code for code, _, _ in result}, {company_code})
+
+    def test_iter_company_quotes_is_lazy(self):
+        result = self.test_collection.iter_company_quotes()
+        company_code, quote_date, quote = next(result)
+
+        self.assertEqual(isinstance(quote, CompanyQuote), True)
+
+    def test_iter_company_quotes_invalid_code_raises_straight_away(self):
+        self.assertRaises(
+            CompanyDoesNotExist,
+            self.test_collection.iter_company_quotes,
+            company_codes=["not a company"],
+        )
+
+    def test_iter_sector_quotes(self):
+        sector_code = list(self.test_collection._sectors)[0]
+        result = list(
+            self.test_collection.iter_sector_quotes(
+                sector_codes=[sector_code],
+                date=datetime.strptime("01/10/20", "%d/%m/%y"),
+            )
+        )
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0][0], sector_code)
+        self.assertEqual(isinstance(result[0][2], SectorQuote), True)
+
+    def test_iter_sector_quotes_invalid_code(self):
+        self.assertRaises(
+            SectorDoesNotExist,
+            self.test_collection.iter_sector_quotes,
+            sector_codes=["not a sector"],
+        )
+
+    def test_sector_iter_company_quotes(self):
+        test_sector = list(self.test_collection._sectors.values())[0]
+        result = list(test_sector.iter_company_quotes())
+
+        self.assertEqual(
+            len(result), CONST_TEST_COMPANY_COUNT * CONST_TEST_COMPANY_QUOTES
+        )
+
+
+class TestLengthCounters(unittest.TestCase):
+    def test_generated_collection(self):
+        setup = SetupObject()
+        test_collection = setup.generate_sector_collection(
+            sector_count=CONST_TEST_SECTOR_COUNT,
+            company_count=CONST_TEST_COMPANY_COUNT,
+            sector_quotes=CONST_TEST_SECTOR_QUOTES,
+            company_quotes=CONST_TEST_COMPANY_QUOTES,
+        )
+
+        self.assertEqual(test_collection.sector_length, CONST_TEST_SECTOR_COUNT)
+        self.assertEqual(
+            test_collection.sector_quote_length,
+            CONST_TEST_SECTOR_COUNT * CONST_TEST_SECTOR_QUOTES,
+        )
+        self.assertEqual(
+            test_collection.company_length,
+            CONST_TEST_SECTOR_COUNT * CONST_TEST_COMPANY_COUNT,
+        )
+        self.assertEqual(
+            test_collection.company_quote_length,
+            CONST_TEST_SECTOR_COUNT
+            * CONST_TEST_COMPANY_COUNT
+            * CONST_TEST_COMPANY_QUOTES,
+        )
+
+    def test_sector_built_before_joining_collection(self):
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_company = Company(
+            company_name=CONST_COMPANY1_COMPANY_NAME,
+            company_code=CONST_COMPANY1_COMPANY_CODE,
+        )
+        # quotes before the company joins the sector
+        test_company.add_quote(CONST_QUOTE1_DATE, 1, 1, 1, 1, 1)
+        test_sector.add_company(test_company)
+        test_company.add_quote(CONST_QUOTE3_DATE, 1, 1, 1, 1, 1)
+        test_sector.add_sector_quote(CONST_QUOTE1_DATE, 1, 1, 1, 1, 1)
+
+        self.assertEqual(test_sector.company_quote_length, 2)
+
+        test_collection = SectorCollection("asx test")
+        test_collection.add_sector(test_sector)
+
+        self.assertEqual(test_collection.company_length, 1)
+        self.assertEqual(test_collection.company_quote_length, 2)
+        self.assertEqual(test_collection.sector_quote_length, 1)
+
+        test_company.add_quotes(
+            rows=[
+                (CONST_QUOTE3_DATE + timedelta(days=1), 1, 1, 1, 1, 1),
+                (CONST_QUOTE3_DATE + timedelta(days=2), 1, 1, 1, 1, 1),
+            ]
+        )
+        test_sector.add_sector_quotes(
+            rows=[(CONST_QUOTE3_DATE, 1, 1, 1, 1, 1)], on_duplicate="skip"
+        )
+
+        self.assertEqual(test_sector.company_quote_length, 4)
+        self.assertEqual(test_collection.company_quote_length, 4)
+        self.assertEqual(test_collection.sector_quote_length, 2)
+
+    def test_duplicate_quote_not_counted(self):
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_company = Company(
+            company_name=CONST_COMPANY1_COMPANY_NAME,
+            company_code=CONST_COMPANY1_COMPANY_CODE,
+        )
+        test_sector.add_company(test_company)
+        test_company.add_quote(CONST_QUOTE1_DATE, 1, 1, 1, 1, 1)
+
+        self.assertRaises(
+            QuoteAlreadyExists,
+            test_company.add_quote,
+            CONST_QUOTE2_DATE,
+            1,
+            1,
+            1,
+            1,
+            1,
+        )
+        self.assertEqual(test_sector.company_quote_length, 1)
+
+    def test_company_pointing_at_sector_it_never_joined(self):
+        test_sector = Sector(
+            sector_name=CONST_SECTOR1_NAME, sector_code=CONST_SECTOR1_CODE
+        )
+        test_company = Company(
+            company_name=CONST_COMPANY1_COMPANY_NAME,
+            company_code=CONST_COMPANY1_COMPANY_CODE,
+            sector_object=test_sector,
+        )
+        test_company.add_quote(CONST_QUOTE1_DATE, 1, 1, 1, 1, 1)
+
+        self.assertEqual(test_sector.company_quote_length, 0)
+
+
+def make_sqs_record(message_id: str, message_type: str, quotes: list) -> dict:
+    return {
+        "messageId": message_id,
+        "body": json.dumps({"quoteObject": quotes}),
+        "messageAttributes": {"QuoteType": {"stringValue": message_type}},
+    }
+
+
+def make_sqs_quote(code_key: str, code: str, date: str, close: float = 1) -> dict:
+    return {
+        "quote_date": date,
+        code_key: code,
+        "open": 1,
+        "high": 1,
+        "low": 1,
+        "close": close,
+        "volume": 0,
+    }
+
+
+class TestSectorCollectionLoadPartial(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        self.payload = {
+            "Records": [
+                make_sqs_record(
+                    "good-stock",
+                    "stock",
+                    [
+                        make_sqs_quote("stock_code", "8ec", "2021-03-29"),
+                        make_sqs_quote("stock_code", "8ec", "2021-03-30"),
+                    ],
+                ),
+                make_sqs_record(
+                    "bad-value",
+                    "stock",
+                    [make_sqs_quote("stock_code", "abc", "2021-03-29", "x")],
+                ),
+                make_sqs_record(
+                    "bad-type",
+                    "bond",
+                    [make_sqs_quote("stock_code", "abc", "2021-03-29")],
+                ),
+                make_sqs_record(
+                    "good-sector",
+                    "sector",
+                    [
+                        make_sqs_quote("sector_code", "xmj", "2021-03-29"),
+                        make_sqs_quote("sector_code", "xzz", "2021-03-29"),
+                    ],
+                ),
+            ]
+        }
+
+    def test_keeps_going_past_bad_records(self):
+        result = self.test_collection.load_sqs(self.payload, partial=True)
+
+        self.assertEqual(
+            [failure["itemIdentifier"] for failure in result["batchItemFailures"]],
+            ["bad-value", "bad-type"],
+        )
+        self.assertIn("bad value", result["batchItemFailures"][0]["reason"])
+        self.assertIn("quoteType is invalid", result["batchItemFailures"][1]["reason"])
+
+        self.assertEqual(self.test_collection.get_company("8ec").length, 2)
+        self.assertEqual(self.test_collection.get_sector("xzz").sector_quote_length, 1)
+        self.assertEqual("abc" in self.test_collection._companies, False)
+
+    def test_redelivery_is_idempotent(self):
+        self.test_collection.load_sqs(self.payload, partial=True)
+        result = self.test_collection.load_sqs(self.payload, partial=True)
+
+        # same two failures, nothing else - the good records and Boilerplate go through again
+        self.assertEqual(len(result["batchItemFailures"]), 2)
+        self.assertEqual(self.test_collection.get_company("8ec").length, 2)
+        self.assertEqual(self.test_collection.company_quote_length, 2)
+        self.assertEqual(self.test_collection.sector_quote_length, 2)
+        self.assertEqual(self.test_collection.sector_length, 3)
+
+    def test_conflicting_duplicate_fails_the_record(self):
+        self.test_collection.load_sqs(self.payload, partial=True)
+        payload = {
+            "Records": [
+                make_sqs_record(
+                    "clash",
+                    "stock",
+                    [
+                        make_sqs_quote("stock_code", "8ec", "2021-03-31"),
+                        make_sqs_quote("stock_code", "8ec", "2021-03-30", close=2),
+                    ],
+                ),
+                make_sqs_record(
+                    "clash-in-record",
+                    "stock",
+                    [
+                        make_sqs_quote("stock_code", "new", "2021-03-31"),
+                        make_sqs_quote("stock_code", "new", "2021-03-31", close=2),
+                    ],
+                ),
+            ]
+        }
+
+        result = self.test_collection.load_sqs(payload, partial=True)
+        self.assertEqual(
+            [failure["itemIdentifier"] for failure in result["batchItemFailures"]],
+            ["clash", "clash-in-record"],
+        )
+        self.assertIn("already has a quote", result["batchItemFailures"][0]["reason"])
+
+        # nothing from either record went in
+        self.assertEqual(self.test_collection.get_company("8ec").length, 2)
+        self.assertEqual("new" in self.test_collection._companies, False)
+
+    def test_all_good(self):
+        del self.payload["Records"][1:3]
+        self.assertEqual(
+            self.test_collection.load_sqs(self.payload, partial=True),
+            {"batchItemFailures": []},
+        )
+
+    def test_default_still_raises(self):
+        self.assertRaises(Exception, self.test_collection.load_sqs, self.payload)
+        self.assertRaises(
+            Exception, self.test_collection.load_sqs, {"records": []}, partial=True
+        )
+
+
+class TestDuplicatePolicy(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test", on_duplicate="skip")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_company = Company(company_name="Knives", company_code="kni")
+        self.test_sector.add_company(self.test_company)
+        self.date = datetime(2021, 3, 29)
+        self.test_company.add_quote(self.date, 1, 1, 1, 1, 1)
+        self.test_sector.add_sector_quote(self.date, 1, 1, 1, 1, 1)
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, SectorCollection, "asx test", 0, "ignore")
+        with self.assertRaises(ValueError):
+            self.test_collection.on_duplicate = "ignore"
+
+    def test_collection_policy_is_inherited(self):
+        self.assertEqual(self.test_company.add_quote(self.date, 2, 2, 2, 2, 2), False)
+        self.assertEqual(
+            self.test_sector.add_sector_quote(self.date, 2, 2, 2, 2, 2), False
+        )
+        self.assertEqual(self.test_company._quotes.close[0], 1)
+
+        self.test_collection.on_duplicate = "raise"
+        self.assertRaises(
+            QuoteAlreadyExists, self.test_company.add_quote, self.date, 2, 2, 2, 2, 2
+        )
+
+    def test_call_overrides_collection(self):
+        self.test_company.add_quote(self.date, 2, 2, 2, 2, 2, on_duplicate="overwrite")
+        self.assertEqual(self.test_company._quotes.close[0], 2)
+        self.assertRaises(
+            QuoteAlreadyExists,
+            self.test_sector.add_sector_quotes,
+            rows=[(self.date, 2, 2, 2, 2, 2)],
+            on_duplicate="raise",
+        )
+
+    def test_counts(self):
+        self.test_company.add_quote(self.date, 2, 2, 2, 2, 2)
+        self.test_company.add_quote(self.date, 2, 2, 2, 2, 2, "merge")
+        self.test_sector.add_sector_quotes(
+            rows=[(self.date, 2, 2, 2, 2, 2)] * 3, on_duplicate="overwrite"
+        )
+
+        self.assertEqual(
+            self.test_collection.duplicate_counts,
+            {"skipped": 1, "overwritten": 3, "merged": 1},
+        )
+        self.assertEqual(self.test_collection.company_quote_length, 1)
+        self.assertEqual(self.test_collection.sector_quote_length, 1)
+
+    def test_overwrite_clears_cached_results(self):
+        self.test_sector.get_index()
+        self.test_sector.resample("W")
+        self.test_collection.get_panel()
+
+        self.test_company.add_quote(self.date, 2, 2, 2, 9, 2, on_duplicate="overwrite")
+        self.assertEqual(self.test_sector.get_index().close[0], 9)
+        self.assertEqual(self.test_collection.get_panel().values[0, 0], 9)
+
+    def test_load_sqs(self):
+        payload = {
+            "Records": [
+                make_sqs_record(
+                    "1",
+                    "stock",
+                    [
+                        make_sqs_quote("stock_code", "8ec", "2021-03-29"),
+                        make_sqs_quote("stock_code", "8ec", "2021-03-29", close=2),
+                    ],
+                )
+            ]
+        }
+
+        self.assertEqual(
+            self.test_collection.load_sqs(payload, partial=True),
+            {"batchItemFailures": []},
+        )
+        self.test_collection.load_sqs(payload, on_duplicate="overwrite")
+        self.assertEqual(self.test_collection.get_company("8ec")._quotes.close[0], 2)
+        self.assertEqual(self.test_collection.duplicate_counts["skipped"], 1)
+        self.assertEqual(self.test_collection.duplicate_counts["overwritten"], 2)
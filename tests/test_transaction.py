@@ -0,0 +1,220 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+
+from stockobjects.company import Company
+from stockobjects.sector import Sector
+from stockobjects.sectorcollection import SectorCollection
+from stockobjects.indicators import SMA
+from stockobjects.quotelog import read_log, CONST_LOG_FILE
+from stockobjects.stockobjectsexceptions import QuoteAlreadyExists
+
+CONST_START_DATE = datetime(2020, 10, 1)
+
+
+def state(collection: SectorCollection) -> dict:
+    return {
+        "sectors": {
+            sector_code: (
+                [(str(quote.date), quote.close) for quote in sector._quotes.values()],
+                {
+                    company_code: [
+                        (str(quote.date), quote.high, quote.close)
+                        for quote in company._quotes.values()
+                    ]
+                    for company_code, company in sector._companies.items()
+                },
+            )
+            for sector_code, sector in collection._sectors.items()
+        },
+        "index": {code: id(company) for code, company in collection._companies.items()},
+        "lengths": (
+            collection.sector_length,
+            collection.sector_quote_length,
+            collection.company_length,
+            collection.company_quote_length,
+        ),
+        "sector_lengths": {
+            sector_code: sector.company_quote_length
+            for sector_code, sector in collection._sectors.items()
+        },
+    }
+
+
+class TestTransaction(unittest.TestCase):
+    def setUp(self):
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_company = Company(company_name="Knives", company_code="kni")
+        self.test_sector.add_company(self.test_company)
+        self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day * 2), 1, 2, 1, day, 1)
+                for day in range(5)
+            ]
+        )
+        self.test_sector.add_sector_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+    def change_everything(self):
+        # every kind of write a transaction has to be able to take back
+        self.test_company.add_quote(CONST_START_DATE + timedelta(days=1), 1, 1, 1, 9, 1)
+        self.test_company.add_quotes(
+            rows=[
+                (CONST_START_DATE + timedelta(days=day), 1, 1, 1, 9, 1)
+                for day in range(20, 25)
+            ]
+        )
+        self.test_company.add_quote(CONST_START_DATE, 1, 5, 1, 8, 1, "merge")
+        self.test_company.add_quote(
+            CONST_START_DATE + timedelta(days=1), 1, 1, 1, 7, 1, "overwrite"
+        )
+        self.test_sector.add_sector_quote(CONST_START_DATE, 2, 2, 2, 2, 2, "overwrite")
+
+        spoons = Company(company_name="Spoons", company_code="spo")
+        self.test_sector.add_company(spoons)
+        spoons.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+        crockery = Sector(sector_name="Crockery", sector_code="xcr")
+        crockery.add_company(Company(company_name="Plates", company_code="plt"))
+        self.test_collection.add_sector(crockery)
+        crockery.add_sector_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+        # already in Cutlery, so joining Crockery too doesn't index it again
+        crockery.add_company(self.test_company)
+
+    def test_commit(self):
+        with self.test_collection.transaction():
+            self.change_everything()
+
+        self.assertEqual(self.test_company.length, 11)
+        self.assertEqual(self.test_collection.sector_length, 2)
+        self.assertEqual(self.test_collection._transaction, None)
+        self.assertEqual(self.test_company._quotes._journal, None)
+
+    def test_rollback(self):
+        before = state(self.test_collection)
+        with self.assertRaises(ZeroDivisionError):
+            with self.test_collection.transaction():
+                self.change_everything()
+                1 / 0
+
+        self.assertEqual(state(self.test_collection), before)
+        self.assertEqual(self.test_company.sector_object, self.test_sector)
+        self.assertEqual(self.test_collection._transaction, None)
+
+    def test_rollback_new_company_lets_go_of_sector(self):
+        spoons = Company(company_name="Spoons", company_code="spo")
+        with self.assertRaises(QuoteAlreadyExists):
+            with self.test_collection.transaction():
+                self.test_sector.add_company(spoons)
+                spoons.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+                spoons.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+
+        self.assertEqual(spoons.sector_object, None)
+        self.assertEqual(spoons.length, 0)
+        self.assertRaises(Exception, self.test_collection.get_company, "spo")
+
+    def test_nested(self):
+        before = state(self.test_collection)
+        with self.test_collection.transaction():
+            self.test_company.add_quote(
+                CONST_START_DATE + timedelta(days=3), 1, 1, 1, 1, 1
+            )
+            inner_before = state(self.test_collection)
+
+            with self.assertRaises(ZeroDivisionError):
+                with self.test_collection.transaction():
+                    self.change_everything()
+                    1 / 0
+
+            self.assertEqual(state(self.test_collection), inner_before)
+
+        self.assertNotEqual(state(self.test_collection), before)
+        self.assertEqual(self.test_company.length, 6)
+        self.assertEqual(self.test_collection._transaction, None)
+
+    def test_derived_results_are_rebuilt(self):
+        sma = self.test_company.add_indicator("sma", SMA(2))
+        history = list(sma.history)
+        index_close = list(self.test_sector.get_index().close)
+        panel = self.test_collection.get_panel().values.copy()
+
+        with self.assertRaises(ZeroDivisionError):
+            with self.test_collection.transaction():
+                self.change_everything()
+                self.test_sector.get_index()
+                self.test_collection.get_panel()
+                1 / 0
+
+        np.testing.assert_allclose(sma.history, history)
+        self.assertEqual(list(self.test_sector.get_index().close), index_close)
+        np.testing.assert_allclose(self.test_collection.get_panel().values, panel)
+
+    def test_load_sqs_is_all_or_nothing(self):
+        before = state(self.test_collection)
+        payload = {
+            "Records": [
+                {
+                    "messageId": "1",
+                    "body": '{"quoteObject": [{"quote_date": "2021-01-01", "stock_code": "abc", "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}, {"quote_date": "2021-01-01", "stock_code": "abc", "open": 2, "high": 2, "low": 2, "close": 2, "volume": 2}]}',
+                    "messageAttributes": {"QuoteType": {"stringValue": "stock"}},
+                }
+            ]
+        }
+
+        self.assertRaises(QuoteAlreadyExists, self.test_collection.load_sqs, payload)
+        self.assertEqual(state(self.test_collection), before)
+        self.assertEqual("Boilerplate" in self.test_collection._sectors, False)
+
+
+class TestTransactionLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log")
+        self.log_file = os.path.join(self.path, CONST_LOG_FILE)
+
+        self.test_collection = SectorCollection("asx test")
+        self.test_sector = Sector(sector_name="Cutlery", sector_code="xcj")
+        self.test_collection.add_sector(self.test_sector)
+        self.test_collection.attach_log(self.path)
+
+    def tearDown(self):
+        self.test_collection.close_log()
+        self.directory.cleanup()
+
+    def test_only_committed_changes_are_logged(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.test_collection.transaction():
+                self.test_sector.add_company(Company("Forks", "frk"))
+                1 / 0
+        self.assertEqual(os.path.getsize(self.log_file), 0)
+
+        with self.test_collection.transaction():
+            knives = Company(company_name="Knives", company_code="kni")
+            self.test_sector.add_company(knives)
+            with self.assertRaises(ZeroDivisionError):
+                with self.test_collection.transaction():
+                    knives.add_quote(CONST_START_DATE, 1, 1, 1, 2, 1)
+                    1 / 0
+            knives.add_quote(CONST_START_DATE, 1, 1, 1, 1, 1)
+            self.assertEqual(os.path.getsize(self.log_file), 0)
+
+        self.assertEqual(len(list(read_log(self.log_file))), 2)
+
+        self.test_collection.close_log()
+        recovered = SectorCollection.recover(self.path)
+        self.addCleanup(recovered.close_log)
+        self.assertEqual(
+            state(recovered)["sectors"], state(self.test_collection)["sectors"]
+        )
+
+    def test_log_changes_inside_transaction(self):
+        with self.test_collection.transaction():
+            self.assertRaises(ValueError, self.test_collection.compact)
+            self.assertRaises(ValueError, self.test_collection.close_log)
+
+
+if __name__ == "__main__":
+    unittest.main()